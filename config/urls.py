@@ -15,12 +15,17 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path
+from django.urls import include, path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from ezygrocery.admin import sql_profile_view
+
 urlpatterns = [
+    # Extra admin pages, ahead of admin.site.urls so its catch-all does not swallow them
+    path('admin/sql-profile/', admin.site.admin_view(sql_profile_view), name='sql_profile'),
     path('admin/', admin.site.urls),
+    path('', include('ezygrocery.urls')),
 ]
 
 # Serve media files in development
@@ -10,10 +10,11 @@ from django.utils.translation import gettext_lazy as _
 from .models import (
     Moholla, Shop, Category, MasterProduct, ShopProduct, MasterProductReview,
     Cart, CartItem, Customer, Rider, Order, OrderItem, RefundRequest,
-    ShopSalesReport, RiderCashDeposit, RiderEarning, DeliveryZone, DistanceSlab, SurgePolicy,
+    ShopSalesReport, ProductSalesReport, SalesCube, RiderCashDeposit, RiderEarning, DeliveryZone, DistanceSlab, SurgePolicy,
     Coupon, Promotion, HeroSlider, SearchQuery, SpecialOffer, StoreSettings, 
     ContactMessage, BlogPost, FAQ, SitemapConfig
 )
+from .images import preset_url
 
 # ==================== FORM CLASSES WITH ENHANCED TEXTAREA ====================
 
@@ -347,7 +348,7 @@ class OrderAdmin(ModelAdmin):
     ]
     list_editable = ['status']
     inlines = [OrderItemInline]
-    actions = ['mark_as_viewed', 'mark_as_processing', 'mark_as_delivered']
+    actions = ['mark_as_viewed', 'mark_as_processing', 'mark_as_delivered', 'export_as_csv', 'export_as_xlsx']
     
     fieldsets = (
         ('Order Information', {
@@ -394,21 +395,81 @@ class OrderAdmin(ModelAdmin):
     
     @admin.action(description='Mark selected orders as viewed')
     def mark_as_viewed(self, request, queryset):
-        updated = queryset.update(is_viewed=True)
+        updated = queryset.mark_viewed()
         self.message_user(request, f'{updated} orders marked as viewed.')
     
     @admin.action(description='Mark selected orders as processing')
     def mark_as_processing(self, request, queryset):
-        updated = queryset.update(status='processing')
+        updated = queryset.set_status('processing')
         self.message_user(request, f'{updated} orders marked as processing.')
     
     @admin.action(description='Mark selected orders as delivered')
     def mark_as_delivered(self, request, queryset):
-        updated = queryset.update(status='delivered')
+        updated = queryset.set_status('delivered')
         self.message_user(request, f'{updated} orders marked as delivered.')
+    
+    @admin.action(description='Export selected orders as CSV')
+    def export_as_csv(self, request, queryset):
+        from .exports import ORDER_EXPORT_COLUMNS, export_response
+        return export_response(queryset, ORDER_EXPORT_COLUMNS, 'orders', 'csv')
+    
+    @admin.action(description='Export selected orders as XLSX')
+    def export_as_xlsx(self, request, queryset):
+        from .exports import ORDER_EXPORT_COLUMNS, export_response
+        return export_response(queryset, ORDER_EXPORT_COLUMNS, 'orders', 'xlsx')
+    
+    def get_urls(self):
+        urls = super().get_urls()
+        from django.urls import path
+        custom_urls = [
+            path('new-orders/counts/', self.admin_site.admin_view(self.new_orders_counts), name='ezygrocery_order_new_orders_counts'),
+        ]
+        return custom_urls + urls
+    
+    def new_orders_counts(self, request):
+        """Unviewed-order counters as JSON; the sidebar badge script polls this"""
+        from django.http import JsonResponse
+        from django.utils.cache import add_never_cache_headers
+        from .counters import get_unviewed_counts
+        
+        response = JsonResponse(get_unviewed_counts(), json_dumps_params={'ensure_ascii': False})
+        add_never_cache_headers(response)
+        return response
+
+class AnalyticsChangelistMixin:
+    """Changelist pages read from the analytics database (see ezygrocery.routers); edits stay on the primary"""
+    
+    def get_queryset(self, request):
+        from .routers import analytics_database
+        
+        queryset = super().get_queryset(request)
+        match = request.resolver_match
+        if request.method == 'GET' and match and match.url_name.endswith('_changelist'):
+            return queryset.using(analytics_database())
+        return queryset
+
+
+class ImagePreviewChangelistMixin:
+    """Load the thumbnail manifests (ezygrocery.images) of a changelist page in one go"""
+    
+    preview_image_fields = ('image',)
+    
+    def get_changelist_instance(self, request):
+        from .images import prefetch_derivatives
+        
+        changelist = super().get_changelist_instance(request)
+        files = []
+        for obj in changelist.result_list:
+            for path in self.preview_image_fields:
+                value = obj
+                for attribute in path.split('.'):
+                    value = getattr(value, attribute)
+                files.append(value)
+        prefetch_derivatives(files)
+        return changelist
 
 @admin.register(ShopSalesReport)
-class ShopSalesReportAdmin(ModelAdmin):
+class ShopSalesReportAdmin(AnalyticsChangelistMixin, ModelAdmin):
     list_display = ['shop', 'date', 'total_orders', 'total_sales', 'total_items_sold']
     list_filter = ['shop', 'date']
     
@@ -422,6 +483,35 @@ class ShopSalesReportAdmin(ModelAdmin):
         }),
     )
 
+@admin.register(ProductSalesReport)
+class ProductSalesReportAdmin(AnalyticsChangelistMixin, ModelAdmin):
+    list_display = ['date', 'master_product', 'shop', 'quantity_sold', 'total_sales']
+    list_filter = ['date', 'shop']
+    search_fields = ['master_product__name']
+    list_select_related = ['master_product', 'shop__moholla']
+    date_hierarchy = 'date'
+    
+    def has_add_permission(self, request):
+        # Rows are materialized from delivered orders and rebuild_sales_reports
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(SalesCube)
+class SalesCubeAdmin(AnalyticsChangelistMixin, ModelAdmin):
+    list_display = ['period_start', 'granularity', 'shop', 'moholla', 'category', 'total_orders', 'total_sales', 'total_items_sold']
+    list_filter = ['granularity', 'moholla', 'category', 'period_start']
+    list_select_related = ['shop__moholla', 'moholla', 'category']
+    date_hierarchy = 'period_start'
+    
+    def has_add_permission(self, request):
+        # Cells are maintained from order events and rebuild_sales_cubes
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
 @admin.register(Coupon)
 class CouponAdmin(ModelAdmin):
     list_display = [
@@ -460,7 +550,7 @@ class CouponAdmin(ModelAdmin):
             return '❌ Expired'
 
 @admin.register(Promotion)
-class PromotionAdmin(ModelAdmin):
+class PromotionAdmin(ImagePreviewChangelistMixin, ModelAdmin):
     form = PromotionAdminForm
     list_display = [
         'title', 'image_preview', 'is_active', 'is_valid', 
@@ -518,7 +608,7 @@ class PromotionAdmin(ModelAdmin):
     @display(description='Image')
     def image_preview(self, obj):
         if obj.image:
-            return format_html('<img src="{}" width="50" height="50" style="object-fit: cover;" />', obj.image.url)
+            return format_html('<img src="{}" width="50" height="50" style="object-fit: cover;" />', preset_url(obj.image, 'thumb'))
         return "-"
     
     @display(description='Valid', boolean=True)
@@ -536,7 +626,7 @@ class PromotionAdmin(ModelAdmin):
             return '❌ Expired'
 
 @admin.register(HeroSlider)
-class HeroSliderAdmin(ModelAdmin):
+class HeroSliderAdmin(ImagePreviewChangelistMixin, ModelAdmin):
     form = HeroSliderAdminForm
     list_display = [
         'title', 'image_preview', 'is_active', 'serial', 
@@ -562,7 +652,7 @@ class HeroSliderAdmin(ModelAdmin):
     @display(description='Image')
     def image_preview(self, obj):
         if obj.image:
-            return format_html('<img src="{}" width="80" height="40" style="object-fit: cover;" />', obj.image.url)
+            return format_html('<img src="{}" width="80" height="40" style="object-fit: cover;" />', preset_url(obj.image, 'thumb'))
         return "-"
 
 @admin.register(SpecialOffer)
@@ -967,7 +1057,7 @@ class MasterProductReviewInline(TabularInline):
 
 # Master Product Admin
 @admin.register(MasterProduct)
-class MasterProductAdmin(ModelAdmin):
+class MasterProductAdmin(ImagePreviewChangelistMixin, ModelAdmin):
     form = MasterProductAdminForm
     list_display = ['display_image', 'name', 'sku', 'category', 'brand', 'mrp', 'total_shops', 'price_range', 'is_active']
     list_filter = ['category', 'brand', 'is_active', 'created_at']
@@ -1013,7 +1103,7 @@ class MasterProductAdmin(ModelAdmin):
     @display(description="ছবি")
     def display_image(self, obj):
         if obj.image:
-            return format_html('<img src="{}" style="width: 60px; height: 60px; object-fit: cover; border-radius: 8px;" />', obj.image.url)
+            return format_html('<img src="{}" style="width: 60px; height: 60px; object-fit: cover; border-radius: 8px;" />', preset_url(obj.image, 'thumb'))
         return "No image"
     
     @display(description="দোকান সংখ্যা")
@@ -1033,8 +1123,9 @@ class MasterProductAdmin(ModelAdmin):
 
 # Shop Product Admin
 @admin.register(ShopProduct)
-class ShopProductAdmin(ModelAdmin):
+class ShopProductAdmin(ImagePreviewChangelistMixin, ModelAdmin):
     form = ShopProductAdminForm
+    preview_image_fields = ('master_product.image',)
     list_display = ['display_image', 'product_name', 'shop_name', 'sku_display', 'stock_status', 'price_display', 'profit_display', 'is_active']
     list_filter = ['shop', 'master_product__category', 'is_active', 'is_featured', 'created_at']
     search_fields = ['master_product__name', 'master_product__sku', 'shop_sku', 'shop__name']
@@ -1059,7 +1150,7 @@ class ShopProductAdmin(ModelAdmin):
     @display(description="ছবি")
     def display_image(self, obj):
         if obj.master_product.image:
-            return format_html('<img src="{}" style="width: 50px; height: 50px; object-fit: cover; border-radius: 8px;" />', obj.master_product.image.url)
+            return format_html('<img src="{}" style="width: 50px; height: 50px; object-fit: cover; border-radius: 8px;" />', preset_url(obj.master_product.image, 'thumb'))
         return "No image"
     
     @display(description="পণ্যের নাম")
@@ -1109,9 +1200,41 @@ class ShopProductAdmin(ModelAdmin):
         from django.urls import path
         custom_urls = [
             path('bulk-add/', self.admin_site.admin_view(self.bulk_add_products), name='ezygrocery_shopproduct_bulk_add'),
+            path('scan/', self.admin_site.admin_view(self.scan_stock), name='ezygrocery_shopproduct_scan'),
         ]
         return custom_urls + urls
     
+    def scan_stock(self, request):
+        """
+        Batch scan-to-stock: POST {"shop": <id>, "scans": [{"code": "...", "delta": 1}, ...]}.
+        Codes are barcodes, GTINs or shop SKUs; delta defaults to 1.
+        """
+        import json
+        from django.http import JsonResponse
+        from .barcodes import SCAN_BATCH_LIMIT, SCAN_MAX_DELTA, apply_scans
+        
+        if request.method != 'POST':
+            return JsonResponse({'error': 'POST a JSON body'}, status=405)
+        if not self.has_change_permission(request):
+            return JsonResponse({'error': 'Permission denied'}, status=403)
+        try:
+            payload = json.loads(request.body)
+            shop_id = int(payload['shop'])
+            scans = [(str(scan['code']), scan.get('delta', 1)) for scan in payload['scans']]
+        except (ValueError, TypeError, KeyError, AttributeError):
+            return JsonResponse({'error': 'Expected {"shop": id, "scans": [{"code": str, "delta": int}]}'}, status=400)
+        if len(scans) > SCAN_BATCH_LIMIT:
+            return JsonResponse({'error': f'At most {SCAN_BATCH_LIMIT} scans per request'}, status=400)
+        # Whole numbers only (not 1.5 or "3"), and small enough for the stock column
+        if any(type(delta) is not int or not 0 < abs(delta) <= SCAN_MAX_DELTA for code, delta in scans):
+            return JsonResponse({'error': f'delta must be a non-zero whole number between -{SCAN_MAX_DELTA} and {SCAN_MAX_DELTA}'}, status=400)
+        if not Shop.objects.filter(pk=shop_id).exists():
+            return JsonResponse({'error': 'Shop not found'}, status=404)
+        
+        results = apply_scans(shop_id, scans)
+        applied = sum(1 for result in results if result['status'] == 'ok')
+        return JsonResponse({'applied': applied, 'rejected': len(results) - applied, 'results': results})
+    
     def bulk_add_products(self, request):
         from django.shortcuts import render, redirect
         from django.contrib import messages
@@ -1250,6 +1373,7 @@ class OrderItemAdmin(ModelAdmin):
     list_filter = ['order__status', 'order__created_at']
     search_fields = ['order__order_number', 'shop_product__master_product__name']
     readonly_fields = ['subtotal_display']
+    actions = ['export_as_csv', 'export_as_xlsx']
     
     fieldsets = (
         ('Order Item Details', {
@@ -1268,6 +1392,20 @@ class OrderItemAdmin(ModelAdmin):
     @display(description="Subtotal")
     def subtotal_display(self, obj):
         return f"৳{obj.subtotal}"
+    
+    def get_export_queryset(self, queryset):
+        from .cubes import ITEM_REVENUE
+        return queryset.annotate(subtotal=ITEM_REVENUE)
+    
+    @admin.action(description='Export selected order items as CSV')
+    def export_as_csv(self, request, queryset):
+        from .exports import ORDER_ITEM_EXPORT_COLUMNS, export_response
+        return export_response(self.get_export_queryset(queryset), ORDER_ITEM_EXPORT_COLUMNS, 'order-items', 'csv')
+    
+    @admin.action(description='Export selected order items as XLSX')
+    def export_as_xlsx(self, request, queryset):
+        from .exports import ORDER_ITEM_EXPORT_COLUMNS, export_response
+        return export_response(self.get_export_queryset(queryset), ORDER_ITEM_EXPORT_COLUMNS, 'order-items', 'xlsx')
 
 
 # ==================== REFUND REQUEST ADMIN ====================
@@ -1378,4 +1516,78 @@ class SurgePolicyAdmin(ModelAdmin):
             ),
             'classes': ['tab'],
         }),
-    )
\ No newline at end of file
+    )
+
+# ==================== DASHBOARD ====================
+
+# Unfold's admin/index.html shadows app templates, so the dashboard uses its own
+# template; the data comes from DASHBOARD_CALLBACK (ezygrocery.dashboard)
+admin.site.index_template = 'admin/dashboard.html'
+
+
+# ==================== SQL PROFILER ====================
+
+# Distinct statements listed per sampled request
+SQL_PROFILE_GROUPS = 50
+
+
+def sql_profile_view(request):
+    """Per-view query/DB time totals and sampled slow or N+1 requests (superusers only; routed in config/urls.py)"""
+    from django.contrib import messages
+    from django.core.exceptions import PermissionDenied
+    from django.shortcuts import redirect
+    from django.template.response import TemplateResponse
+    from django.utils.text import Truncator
+    from .profiling import profiler_settings, recent_samples, reset_profile, view_stats
+    
+    if not request.user.is_superuser:
+        raise PermissionDenied
+    if request.method == 'POST' and 'reset' in request.POST:
+        reset_profile()
+        messages.success(request, "SQL প্রোফাইল রিসেট করা হয়েছে")
+        return redirect('sql_profile')
+    
+    samples = []
+    for sample in recent_samples():
+        # Identical statements grouped, most expensive first
+        grouped = {}
+        for sql, elapsed, alias, many in sample['queries']:
+            count, total = grouped.get((sql, alias), (0, 0))
+            grouped[(sql, alias)] = (count + 1, total + elapsed)
+        top = f"{sample['duplicates'][0][1]}×" if sample['duplicates'] else ""
+        samples.append({
+            'cols': [
+                timezone.localtime(sample['at']).strftime('%d %b %H:%M:%S'),
+                f"{sample['method']} {sample['path']}",
+                sample['status'],
+                sample['duration_ms'],
+                sample['db_ms'],
+                sample['query_count'],
+                top,
+            ],
+            'table': {
+                'headers': ["SQL", "বার", "মোট ms", "DB"],
+                'rows': [
+                    [Truncator(sql).chars(300), count, f"{total:.2f}", alias]
+                    for (sql, alias), (count, total) in sorted(grouped.items(), key=lambda item: -item[1][1])[:SQL_PROFILE_GROUPS]
+                ],
+            },
+        })
+    context = {
+        **admin.site.each_context(request),
+        'title': "SQL প্রোফাইলার",
+        'config': profiler_settings(),
+        'views': {
+            'headers': ["ভিউ", "রিকোয়েস্ট", "গড় কোয়েরি", "গড় DB (ms)", "গড় সময় (ms)", "ধীর", "N+1"],
+            'rows': [
+                [row['view'], row['requests'], f"{row['avg_queries']:.1f}", f"{row['avg_db_ms']:.1f}",
+                 f"{row['avg_ms']:.1f}", row['slow'], row['duplicates']]
+                for row in view_stats()
+            ],
+        },
+        'samples': {
+            'headers': ["সময়", "রিকোয়েস্ট", "স্ট্যাটাস", "সময় (ms)", "DB (ms)", "কোয়েরি", "N+1"],
+            'rows': samples,
+        },
+    }
+    return TemplateResponse(request, 'admin/sql_profile.html', context)
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class EzygroceryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ezygrocery'
+    
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from .db import configure_connection
+        from .metrics import instrument_caches, metrics_settings
+        
+        connection_created.connect(configure_connection, dispatch_uid='ezygrocery.db.configure_connection')
+        if metrics_settings()['ENABLED']:
+            instrument_caches()
@@ -0,0 +1,179 @@
+"""
+Barcode / GTIN / shop SKU resolution and scan-to-stock
+
+A scanned code is resolved per shop to a ShopProduct by master barcode,
+then GTIN, then the shop's own SKU. Resolutions (including misses) are
+cached per shop and code, so a batch of scans costs one cache round trip
+plus at most three indexed queries for the codes not seen before.
+
+Saving or deleting a product drops the cached resolutions of the codes it
+had or has, and only when a barcode, GTIN, shop SKU or the product's shop
+changed (see the receivers in models.py); bulk imports start a new catalog
+version instead. The invalidation only reaches other processes through a
+shared cache: with several workers, set REDIS_URL.
+"""
+import time
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+CODE_CACHE_PREFIX = 'ezygrocery:codes:'
+CODE_VERSION_KEY = 'ezygrocery:codes:version'
+CODE_CACHE_TIMEOUT = 60 * 60
+
+# Cached resolution results besides a ShopProduct id
+UNKNOWN = 0
+AMBIGUOUS = -1
+
+SCAN_BATCH_LIMIT = 1000
+# Largest stock change a single scan may carry
+SCAN_MAX_DELTA = 10000
+
+
+def _version():
+    version = cache.get(CODE_VERSION_KEY)
+    if version is None:
+        cache.add(CODE_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(CODE_VERSION_KEY)
+    return version
+
+
+def invalidate_codes():
+    """Start a new cache generation after barcodes, GTINs or shop SKUs changed"""
+    cache.set(CODE_VERSION_KEY, time.time_ns(), None)
+
+
+def product_codes(model_name, pks):
+    """{(shop_id, code)} under which the given MasterProducts or ShopProducts resolve"""
+    from .models import ShopProduct
+
+    lookup = 'master_product__in' if model_name == 'masterproduct' else 'pk__in'
+    codes = set()
+    for shop_id, barcode, gtin, shop_sku in ShopProduct.objects.filter(**{lookup: pks}).values_list(
+        'shop_id', 'master_product__barcode', 'master_product__gtin', 'shop_sku'
+    ):
+        codes.update((shop_id, code) for code in (barcode, gtin, shop_sku) if code)
+    return codes
+
+
+def forget_codes(codes):
+    """Drop the cached resolutions of {(shop_id, code)} once the current transaction commits"""
+    if not codes:
+        return
+
+    def delete():
+        version = _version()
+        cache.delete_many([f"{CODE_CACHE_PREFIX}{version}:{shop_id}:{code}" for shop_id, code in codes])
+    transaction.on_commit(delete)
+
+
+def lookup_codes(shop_id, codes):
+    """Resolve codes from the database: {code: shop_product_id or AMBIGUOUS}; unknown codes are left out"""
+    from .models import ShopProduct
+
+    products = ShopProduct.objects.filter(shop_id=shop_id)
+    resolved = {}
+    for field in ('master_product__barcode', 'master_product__gtin', 'shop_sku'):
+        remaining = [code for code in codes if code not in resolved]
+        if not remaining:
+            break
+        matches = defaultdict(set)
+        for pk, code in products.filter(**{f'{field}__in': remaining}).values_list('pk', field):
+            matches[code].add(pk)
+        for code, pks in matches.items():
+            resolved[code] = pks.pop() if len(pks) == 1 else AMBIGUOUS
+    return resolved
+
+
+def resolve_codes(shop_id, codes):
+    """Return {code: shop_product_id | UNKNOWN | AMBIGUOUS} for a shop, through the cache"""
+    codes = {str(code).strip() for code in codes if str(code).strip()}
+    if not codes:
+        return {}
+    prefix = f"{CODE_CACHE_PREFIX}{_version()}:{shop_id}:"
+    keys = {prefix + code: code for code in codes}
+    resolved = {keys[key]: value for key, value in cache.get_many(keys).items()}
+
+    missing = codes - resolved.keys()
+    if missing:
+        found = lookup_codes(shop_id, missing)
+        fresh = {code: found.get(code, UNKNOWN) for code in missing}
+        cache.set_many({prefix + code: value for code, value in fresh.items()}, CODE_CACHE_TIMEOUT)
+        resolved.update(fresh)
+    return resolved
+
+
+def apply_scans(shop_id, scans):
+    """
+    Apply [(code, delta), ...] stock changes to a shop's products in one transaction.
+
+    Deltas for the same product are summed. A product whose summed decrement is
+    larger than its stock is left unchanged and its scans are reported as
+    'insufficient'. Returns one result per scan:
+    {'code', 'delta', 'status', 'shop_product', 'stock'} with status 'ok',
+    'insufficient', 'unknown' or 'ambiguous'.
+    """
+    from .metrics import STOCK_FAILURES
+    from .models import ShopProduct
+    from .page_cache import UNTAGGED_TAG, invalidate_tags
+    from .structured_data import invalidate_json_ld
+
+    resolved = resolve_codes(shop_id, [code for code, delta in scans])
+    totals = defaultdict(int)
+    for code, delta in scans:
+        pk = resolved.get(str(code).strip(), UNKNOWN)
+        if pk > 0:
+            totals[pk] += delta
+
+    stock = {}
+    short = set()
+    if totals:
+        with transaction.atomic():
+            products = ShopProduct.objects.filter(shop_id=shop_id)
+            decrements = [pk for pk, delta in totals.items() if delta < 0]
+            if decrements:
+                for pk, current in products.filter(pk__in=decrements).select_for_update().values_list('pk', 'stock'):
+                    if current + totals[pk] < 0:
+                        short.add(pk)
+                        stock[pk] = current
+            by_delta = defaultdict(list)
+            for pk, delta in totals.items():
+                if pk not in short:
+                    by_delta[delta].append(pk)
+            if by_delta:
+                change = Case(
+                    *[When(pk__in=pks, then=Value(delta)) for delta, pks in by_delta.items()],
+                    default=Value(0),
+                    output_field=IntegerField(),
+                )
+                products = products.filter(pk__in=[pk for pks in by_delta.values() for pk in pks])
+                # Greatest() only guards against a concurrent decrement the check above missed
+                products.update(stock=Greatest(F('stock') + change, Value(0)), updated_at=timezone.now())
+                rows = list(products.values_list('pk', 'stock', 'master_product_id'))
+                stock.update((pk, current) for pk, current, master_product_id in rows)
+                # update() sends no signals
+                tags = [f"shop:{shop_id}", 'shopproduct', UNTAGGED_TAG]
+                tags += [f"shopproduct:{pk}" for pk, current, master_product_id in rows]
+                transaction.on_commit(lambda: invalidate_tags(tags))
+                # Offer availability
+                invalidate_json_ld(*{f"product:{master_product_id}" for pk, current, master_product_id in rows})
+
+    results = []
+    for code, delta in scans:
+        pk = resolved.get(str(code).strip(), UNKNOWN)
+        if pk > 0 and pk in stock:
+            status = 'insufficient' if pk in short else 'ok'
+        else:
+            status = 'ambiguous' if pk == AMBIGUOUS else 'unknown'
+        if status != 'ok':
+            STOCK_FAILURES.inc(status)
+        found = status in ('ok', 'insufficient')
+        results.append({
+            'code': code, 'delta': delta, 'status': status,
+            'shop_product': pk if found else None, 'stock': stock[pk] if found else None,
+        })
+    return results
@@ -0,0 +1,365 @@
+"""
+Query-count and latency benchmarks for the admin and storefront hot paths
+
+run_benchmarks() measures every admin changelist, every ezygrocery context
+processor, the cart summary and the per-object aggregate model methods
+against a fixed seeded dataset (see seed_dataset()), recording the number of
+queries and the wall time of each case. Results are plain JSON so runs can be
+compared across commits with compare_results().
+"""
+import random
+import statistics
+import subprocess
+import time
+from datetime import date
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models.query import QuerySet
+from django.utils import timezone
+
+# Small enough to seed in seconds; the end date is fixed so the dataset does
+# not depend on the day the benchmark runs
+BENCHMARK_DATASET = {
+    'shops': 10,
+    'products': 500,
+    'orders': 5000,
+    'products_per_shop': 100,
+    'days': 60,
+    'seed': 42,
+    'end_date': date(2025, 6, 30),
+}
+BENCHMARK_USERNAME = 'benchmark_admin'
+MODEL_SAMPLE_SIZE = 20
+CART_SIZE = 10
+REVIEWED_PRODUCTS = 50
+
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.2
+DEFAULT_MIN_DELTA_MS = 1.0
+
+
+class QueryCounter:
+    """connection.execute_wrapper counting statements without recording SQL"""
+    
+    def __init__(self):
+        self.count = 0
+    
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def seed_dataset():
+    """Fill an empty database with the benchmark dataset; returns the staff user the cases run as"""
+    from django.contrib.auth.models import User
+    from .demo_data import DemoDataGenerator
+    from .models import Cart, CartItem, MasterProduct, MasterProductReview, ShopProduct
+    
+    DemoDataGenerator(**BENCHMARK_DATASET).generate()
+    user = User.objects.create_superuser(BENCHMARK_USERNAME, f'{BENCHMARK_USERNAME}@example.com', None)
+    
+    rng = random.Random(BENCHMARK_DATASET['seed'])
+    customers = list(User.objects.filter(customer_profile__isnull=False).order_by('pk').values_list('pk', flat=True))
+    products = MasterProduct.objects.order_by('pk').values_list('pk', flat=True)[:REVIEWED_PRODUCTS]
+    MasterProductReview.objects.bulk_create([
+        MasterProductReview(
+            master_product_id=product_id, user_id=user_id, rating=rng.randint(1, 5),
+            title="রিভিউ", comment="ভালো পণ্য", is_approved=rng.random() < 0.8,
+        )
+        for product_id in products
+        for user_id in rng.sample(customers, rng.randint(1, 8))
+    ])
+    
+    cart = Cart.objects.create(user=user)
+    CartItem.objects.bulk_create([
+        CartItem(cart=cart, shop_product_id=pk, quantity=rng.randint(1, 3))
+        for pk in ShopProduct.objects.order_by('pk').values_list('pk', flat=True)[:CART_SIZE]
+    ])
+    return user
+
+
+def measure(function, repeat=DEFAULT_REPEAT):
+    """Run `function` once to warm up and `repeat` more times, each with a cold cache"""
+    timings = []
+    queries = 0
+    for run in range(repeat + 1):
+        cache.clear()
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            started = time.perf_counter()
+            function()
+            elapsed = (time.perf_counter() - started) * 1000
+        if run:
+            timings.append(elapsed)
+            queries = max(queries, counter.count)
+    return {
+        'queries': queries,
+        'median_ms': round(statistics.median(timings), 3),
+        'min_ms': round(min(timings), 3),
+        'max_ms': round(max(timings), 3),
+    }
+
+
+def admin_cases(user):
+    """(name, callable) for the changelist of every registered ModelAdmin"""
+    from django.contrib import admin
+    from django.test import Client
+    from django.urls import reverse
+    
+    client = Client()
+    client.force_login(user)
+    
+    def get(url):
+        def run():
+            response = client.get(url)
+            if response.status_code != 200:
+                raise AssertionError(f"GET {url} returned {response.status_code}")
+        return run
+    
+    cases = []
+    for model in sorted(admin.site._registry, key=lambda model: model._meta.label):
+        opts = model._meta
+        url = reverse(f'admin:{opts.app_label}_{opts.model_name}_changelist')
+        cases.append((f'admin.{opts.label_lower}.changelist', get(url)))
+    return cases
+
+
+def _evaluate(context):
+    # Processors hand back lazy querysets; evaluate them as a template would
+    for value in context.values():
+        if isinstance(value, QuerySet):
+            list(value)
+
+
+def context_processor_cases(user):
+    """(name, callable) for every ezygrocery context processor in TEMPLATES"""
+    from django.test import RequestFactory
+    from django.utils.module_loading import import_string
+    
+    request = RequestFactory().get('/')
+    request.user = user
+    cases = []
+    for template in settings.TEMPLATES:
+        for path in template.get('OPTIONS', {}).get('context_processors', []):
+            if path.startswith('ezygrocery.'):
+                processor = import_string(path)
+                cases.append((f'context.{processor.__name__}', lambda processor=processor: _evaluate(processor(request))))
+    return cases
+
+
+def storefront_cases(user):
+    """(name, callable) for the cart summary and the per-object aggregate model methods"""
+    from .models import Cart, MasterProduct, Shop
+    
+    def cart_summary():
+        cart = Cart.objects.get(user=user)
+        cart.total_items
+        cart.total_price
+        [item.total_price for item in cart.items.all()]
+    
+    shops = list(Shop.objects.order_by('pk')[:MODEL_SAMPLE_SIZE])
+    products = list(MasterProduct.objects.order_by('pk')[:MODEL_SAMPLE_SIZE])
+    return [
+        ('cart.summary', cart_summary),
+        ('model.Shop.total_sales', lambda: [shop.total_sales() for shop in shops]),
+        ('model.MasterProduct.lowest_price', lambda: [product.lowest_price() for product in products]),
+        ('model.MasterProduct.average_rating', lambda: [product.average_rating() for product in products]),
+    ]
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_benchmarks(user, repeat=DEFAULT_REPEAT, only=None, progress=None):
+    """Measure every case (optionally only names containing `only`); returns the JSON-ready results"""
+    cases = admin_cases(user) + context_processor_cases(user) + storefront_cases(user)
+    results = {}
+    for name, function in cases:
+        if only and only not in name:
+            continue
+        try:
+            results[name] = measure(function, repeat)
+        except Exception as error:
+            results[name] = {'error': f"{type(error).__name__}: {error}"}
+        if progress:
+            progress(name, results[name])
+    return {
+        'meta': {
+            'commit': _commit(),
+            'created_at': timezone.now().isoformat(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'repeat': repeat,
+            'dataset': {key: str(value) if isinstance(value, date) else value for key, value in BENCHMARK_DATASET.items()},
+        },
+        'results': results,
+    }
+
+
+def compare_results(baseline, current, threshold=DEFAULT_THRESHOLD, min_delta_ms=DEFAULT_MIN_DELTA_MS):
+    """
+    Compare two run_benchmarks() outputs case by case.
+    
+    A case regresses when it issues more queries, starts failing, or its
+    median time grows by more than `threshold` (a fraction) and at least
+    `min_delta_ms`. Returns [(name, baseline, current, regressions)].
+    """
+    rows = []
+    for name, now in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            continue
+        regressions = []
+        if 'error' in now and 'error' not in before:
+            regressions.append("fails")
+        elif 'error' not in now and 'error' not in before:
+            if now['queries'] > before['queries']:
+                regressions.append(f"queries {before['queries']} -> {now['queries']}")
+            delta = now['median_ms'] - before['median_ms']
+            if delta > min_delta_ms and delta > before['median_ms'] * threshold:
+                regressions.append(f"median {before['median_ms']:.1f}ms -> {now['median_ms']:.1f}ms")
+        rows.append((name, before, now, regressions))
+    return rows
+
+
+# ---------- SQLite concurrency ----------
+
+SQLITE_BENCHMARK_ALIAS = 'sqlite_benchmark'
+SQLITE_BENCHMARK_ROWS = 20000
+SQLITE_BENCHMARK_SHOPS = 50
+
+
+def sqlite_profiles():
+    """Stock Django SQLite setup vs. the configured default database"""
+    from django.db import connections
+    
+    configured = connections['default'].settings_dict
+    if configured['ENGINE'] != 'django.db.backends.sqlite3':
+        configured = {'OPTIONS': {}, 'PRAGMAS': {'journal_mode': 'WAL'}}
+    return {
+        'rollback journal (defaults)': {'OPTIONS': {}, 'PRAGMAS': {'journal_mode': 'DELETE', 'synchronous': 'FULL'}},
+        'configured': {'OPTIONS': dict(configured.get('OPTIONS', {})), 'PRAGMAS': dict(configured.get('PRAGMAS', {}))},
+    }
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def _sqlite_setup(cursor):
+    cursor.execute("CREATE TABLE bench_stock (id INTEGER PRIMARY KEY, shop INTEGER NOT NULL, quantity INTEGER NOT NULL)")
+    cursor.execute("CREATE INDEX bench_stock_shop ON bench_stock (shop)")
+    cursor.execute(
+        "CREATE TABLE bench_movement (id INTEGER PRIMARY KEY, stock_id INTEGER NOT NULL, delta INTEGER NOT NULL, note TEXT)"
+    )
+    cursor.executemany(
+        "INSERT INTO bench_stock (id, shop, quantity) VALUES (%s, %s, %s)",
+        [(row, row % SQLITE_BENCHMARK_SHOPS, 1000) for row in range(1, SQLITE_BENCHMARK_ROWS + 1)],
+    )
+
+
+def run_sqlite_concurrency(path, profile, seconds=5, readers=8, writers=4):
+    """
+    Concurrent readers and writers against a scratch SQLite file.
+    
+    Writers run the read-then-update transaction of a stock adjustment,
+    readers the shop summary / recent movements queries of the admin. Every
+    thread has its own Django connection with the profile's OPTIONS and
+    PRAGMAS. Returns counts, errors and read/write latency percentiles.
+    """
+    import os
+    import threading
+    from django.db import OperationalError, connections, transaction
+    
+    for suffix in ('', '-wal', '-shm', '-journal'):
+        if os.path.exists(f"{path}{suffix}"):
+            os.remove(f"{path}{suffix}")
+    connections.settings[SQLITE_BENCHMARK_ALIAS] = {
+        **connections['default'].settings_dict,
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': str(path),
+        'OPTIONS': profile['OPTIONS'],
+        'PRAGMAS': profile['PRAGMAS'],
+    }
+    stats = {'read': [], 'write': [], 'read_errors': 0, 'write_errors': 0}
+    lock = threading.Lock()
+    barrier = threading.Barrier(readers + writers)
+    try:
+        with transaction.atomic(using=SQLITE_BENCHMARK_ALIAS):
+            _sqlite_setup(connections[SQLITE_BENCHMARK_ALIAS].cursor())
+        connections[SQLITE_BENCHMARK_ALIAS].close()
+        
+        def write(rng, cursor):
+            stock = rng.randint(1, SQLITE_BENCHMARK_ROWS)
+            with transaction.atomic(using=SQLITE_BENCHMARK_ALIAS):
+                cursor.execute("SELECT quantity FROM bench_stock WHERE id = %s", [stock])
+                quantity = cursor.fetchone()[0]
+                cursor.execute("UPDATE bench_stock SET quantity = %s WHERE id = %s", [quantity - 1, stock])
+                cursor.execute(
+                    "INSERT INTO bench_movement (stock_id, delta, note) VALUES (%s, -1, %s)", [stock, 'x' * 200],
+                )
+        
+        def read(rng, cursor):
+            cursor.execute(
+                "SELECT COUNT(*), SUM(quantity) FROM bench_stock WHERE shop = %s", [rng.randrange(SQLITE_BENCHMARK_SHOPS)],
+            )
+            cursor.fetchall()
+            cursor.execute("SELECT stock_id, delta FROM bench_movement ORDER BY id DESC LIMIT 20")
+            cursor.fetchall()
+        
+        def worker(kind, seed):
+            rng = random.Random(seed)
+            operation = write if kind == 'write' else read
+            timings, errors = [], 0
+            try:
+                cursor = connections[SQLITE_BENCHMARK_ALIAS].cursor()
+                barrier.wait()
+                deadline = time.perf_counter() + seconds
+                while time.perf_counter() < deadline:
+                    started = time.perf_counter()
+                    try:
+                        operation(rng, cursor)
+                    except OperationalError:
+                        errors += 1
+                        continue
+                    timings.append((time.perf_counter() - started) * 1000)
+            finally:
+                connections[SQLITE_BENCHMARK_ALIAS].close()
+            with lock:
+                stats[kind].extend(timings)
+                stats[f'{kind}_errors'] += errors
+        
+        threads = [threading.Thread(target=worker, args=('write', index)) for index in range(writers)]
+        threads += [threading.Thread(target=worker, args=('read', 1000 + index)) for index in range(readers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        connections[SQLITE_BENCHMARK_ALIAS].close()
+        del connections.settings[SQLITE_BENCHMARK_ALIAS]
+    
+    result = {}
+    for kind in ('read', 'write'):
+        timings = stats[kind]
+        result[kind] = {
+            'count': len(timings),
+            'per_second': round(len(timings) / seconds, 1),
+            'errors': stats[f'{kind}_errors'],
+            'p50_ms': round(_percentile(timings, 0.5), 2),
+            'p99_ms': round(_percentile(timings, 0.99), 2),
+            'max_ms': round(max(timings, default=0.0), 2),
+        }
+    return result
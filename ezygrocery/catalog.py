@@ -0,0 +1,421 @@
+"""
+Bulk catalog import and shop price/stock sync
+
+Supplier files (CSV or JSON lines) are streamed row by row, validated,
+deduplicated by SKU and upserted in batches with
+bulk_create(update_conflicts=True). Categories and slugs are resolved from
+in-memory maps, so each batch costs a fixed number of queries regardless of
+its size. Existing products keep their slug, and only the columns the file
+has are updated: a partial file leaves the other fields as they are.
+
+Shop POS exports are matched against an in-memory index of the shop's
+products (by shop SKU, master SKU or barcode) and only rows whose prices or
+stock actually changed are written, with bulk_update in batches.
+"""
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+IMPORT_BATCH_SIZE = 1000
+SYNC_BATCH_SIZE = 1000
+
+REQUIRED_FIELDS = ('sku', 'name', 'category', 'mrp')
+
+# Optional text columns copied as-is (stripped, length-checked)
+TEXT_FIELDS = (
+    'description', 'short_description', 'features', 'barcode', 'gtin', 'brand',
+    'model_number', 'weight', 'dimensions', 'mpn', 'product_image_url',
+)
+
+# Upserted fields, in this order; optional ones only when the row has the column
+UPDATE_FIELDS = ['name', 'category', 'mrp', 'is_active', *TEXT_FIELDS, 'updated_at']
+OPTIONAL_FIELDS = {'is_active', *TEXT_FIELDS}
+
+SYNC_FIELDS = ('cost_price', 'selling_price', 'discount_price', 'stock')
+SYNC_KEYS = ('shop_sku', 'sku', 'barcode')
+
+# Cell values that clear the (nullable) discount price
+CLEAR_VALUES = {'none', 'null', '-'}
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'active'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'inactive'}
+
+
+class RowError(ValueError):
+    """A row that cannot be imported; the message goes to the rejects file"""
+
+
+def detect_format(path):
+    return 'jsonl' if path.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def read_rows(handle, file_format):
+    """Yield (line_number, row) from an open CSV or JSON-lines file; unparseable JSON lines yield the raw text"""
+    if file_format == 'jsonl':
+        for number, line in enumerate(handle, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield number, json.loads(line)
+            except ValueError:
+                yield number, line
+    else:
+        reader = csv.DictReader(handle)
+        for row in reader:
+            yield reader.line_num, row
+
+
+class RejectsFile:
+    """Rejected rows with their line number and reason, in the input's format; opened on first write"""
+
+    def __init__(self, path, file_format):
+        self.path = path
+        self.file_format = file_format
+        self.handle = None
+        self.writer = None
+
+    def write(self, number, row, error):
+        if self.handle is None:
+            self.handle = open(self.path, 'w', newline='', encoding='utf-8')
+        if self.file_format == 'jsonl':
+            record = dict(row) if isinstance(row, dict) else {'raw': row}
+            self.handle.write(json.dumps({'line': number, 'error': error, **record}, ensure_ascii=False, default=str) + '\n')
+        else:
+            if self.writer is None:
+                self.writer = csv.writer(self.handle)
+                self.writer.writerow(['line', 'error', *row.keys()])
+            self.writer.writerow([number, error, *row.values()])
+
+    def close(self):
+        if self.handle is not None:
+            self.handle.close()
+
+
+def parse_decimal(value, field, max_digits=None, decimal_places=2):
+    try:
+        number = Decimal(str(value).replace(',', '').strip())
+    except InvalidOperation:
+        raise RowError(f"{field}: not a number ({value!r})")
+    if not number.is_finite() or number < 0:
+        raise RowError(f"{field}: must be zero or more ({value!r})")
+    # Checked per row: one value the column cannot hold would fail the whole batch
+    try:
+        number = number.quantize(Decimal(1).scaleb(-decimal_places))
+    except InvalidOperation:
+        raise RowError(f"{field}: too large ({value!r})")
+    if max_digits is not None and number.adjusted() >= max_digits - decimal_places:
+        raise RowError(f"{field}: more than {max_digits - decimal_places} digits before the decimal point ({value!r})")
+    return number
+
+
+def decimal_limits(model):
+    """{field name: (max_digits, decimal_places)} of a model's DecimalFields"""
+    return {
+        field.name: (field.max_digits, field.decimal_places)
+        for field in model._meta.concrete_fields if field.get_internal_type() == 'DecimalField'
+    }
+
+
+def parse_stock(value, field='stock'):
+    try:
+        number = Decimal(str(value).replace(',', '').strip())
+    except InvalidOperation:
+        raise RowError(f"{field}: not a number ({value!r})")
+    if not number.is_finite() or number < 0 or number != number.to_integral_value():
+        raise RowError(f"{field}: must be a whole number, zero or more ({value!r})")
+    return int(number)
+
+
+def parse_bool(value, field):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise RowError(f"{field}: expected yes/no ({value!r})")
+
+
+def unique_slug(base, taken, fallback, max_length=50):
+    """First free slug from base, base-fallback, base-2, ...; reserves it in `taken`"""
+    base = base[:max_length].strip('-') or fallback[:max_length]
+    candidate = base
+    if candidate in taken and fallback and fallback != base:
+        candidate = f"{base[:max_length - len(fallback) - 1]}-{fallback}".strip('-')
+    number = 2
+    while candidate in taken:
+        suffix = f"-{number}"
+        candidate = f"{base[:max_length - len(suffix)]}{suffix}"
+        number += 1
+    taken.add(candidate)
+    return candidate
+
+
+class CatalogImporter:
+    """Validate and upsert catalog rows; call feed() per row and finish() at the end"""
+
+    def __init__(self, batch_size=IMPORT_BATCH_SIZE, create_categories=True, dry_run=False, on_reject=None, on_batch=None):
+        from .models import Category, MasterProduct
+
+        self.batch_size = batch_size
+        self.create_categories = create_categories
+        self.dry_run = dry_run
+        self.on_reject = on_reject
+        self.on_batch = on_batch
+        self.max_lengths = {
+            field.name: field.max_length for field in MasterProduct._meta.concrete_fields if field.max_length
+        }
+        self.decimal_limits = decimal_limits(MasterProduct)
+
+        self.categories = {}
+        self.category_slugs = set()
+        for pk, name, slug in Category.objects.values_list('pk', 'name', 'slug'):
+            self.categories[name.casefold()] = pk
+            self.categories[slug] = pk
+            self.category_slugs.add(slug)
+        self.slugs = set(MasterProduct.objects.values_list('slug', flat=True))
+
+        self.batch = {}
+        self.stats = {'read': 0, 'created': 0, 'updated': 0, 'rejected': 0, 'duplicates': 0, 'categories_created': 0}
+
+    def clean(self, row):
+        if not isinstance(row, dict):
+            raise RowError("Invalid JSON line")
+        row = {key.strip().lower(): value.strip() if isinstance(value, str) else value for key, value in row.items() if key}
+        missing = [field for field in REQUIRED_FIELDS if row.get(field) in (None, '')]
+        if missing:
+            raise RowError(f"Missing {', '.join(missing)}")
+
+        data = {
+            'sku': str(row['sku']),
+            'name': str(row['name']),
+            'category': str(row['category']),
+            'mrp': parse_decimal(row['mrp'], 'mrp', *self.decimal_limits['mrp']),
+        }
+        # A missing column (or an empty is_active cell) is left out: new products get
+        # the model default and existing ones keep their value
+        if row.get('is_active') not in (None, ''):
+            data['is_active'] = parse_bool(row['is_active'], 'is_active')
+        for field in TEXT_FIELDS:
+            if field in row:
+                value = row[field]
+                data[field] = '' if value is None else str(value)
+        for field, value in data.items():
+            max_length = self.max_lengths.get(field)
+            if max_length and isinstance(value, str) and len(value) > max_length:
+                raise RowError(f"{field}: longer than {max_length} characters")
+        return data
+
+    def resolve_category(self, value):
+        from .models import Category
+
+        key = value.casefold()
+        for candidate in (key, slugify(value)):
+            if candidate in self.categories:
+                return self.categories[candidate]
+        if not self.create_categories:
+            raise RowError(f"Unknown category {value!r}")
+
+        slug = unique_slug(slugify(value), self.category_slugs, 'category')
+        pk = None if self.dry_run else Category.objects.create(name=value, slug=slug).pk
+        self.categories[key] = self.categories[slug] = pk
+        self.stats['categories_created'] += 1
+        return pk
+
+    def feed(self, number, row):
+        self.stats['read'] += 1
+        try:
+            data = self.clean(row)
+            data['category_id'] = self.resolve_category(data.pop('category'))
+        except RowError as error:
+            self.stats['rejected'] += 1
+            if self.on_reject:
+                self.on_reject(number, row, str(error))
+            return
+        if data['sku'] in self.batch:
+            # Later rows win; upserting the same SKU twice in one statement is an error
+            self.stats['duplicates'] += 1
+        self.batch[data['sku']] = data
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        from .barcodes import invalidate_codes
+        from .models import MasterProduct
+        from .page_cache import SITE_TAG, invalidate_tags
+        from .sitemaps import MODEL_SECTIONS, schedule_rebuild
+        from .structured_data import invalidate_structured_data
+
+        if not self.batch:
+            return
+        batch, self.batch = self.batch, {}
+        existing = dict(MasterProduct.objects.filter(sku__in=batch).values_list('sku', 'slug'))
+        now = timezone.now()
+        # One upsert per set of columns; a CSV file has a single one
+        groups = {}
+        for sku, data in batch.items():
+            slug = existing.get(sku) or unique_slug(slugify(data['name']), self.slugs, slugify(sku) or 'product')
+            fields = tuple(field for field in UPDATE_FIELDS if field not in OPTIONAL_FIELDS or field in data)
+            groups.setdefault(fields, []).append(MasterProduct(slug=slug, created_at=now, updated_at=now, **data))
+
+        if not self.dry_run:
+            with transaction.atomic():
+                for fields, products in groups.items():
+                    MasterProduct.objects.bulk_create(
+                        products, update_conflicts=True, unique_fields=['sku'], update_fields=list(fields),
+                    )
+                # bulk_create sends no signals; barcodes and GTINs may have changed, and
+                # any cached page may list one of the products
+                transaction.on_commit(invalidate_codes)
+                transaction.on_commit(lambda: invalidate_tags([SITE_TAG]))
+                schedule_rebuild(MODEL_SECTIONS['masterproduct'])
+                transaction.on_commit(invalidate_structured_data)
+        self.stats['updated'] += len(existing)
+        self.stats['created'] += len(batch) - len(existing)
+        if self.on_batch:
+            self.on_batch(self.stats)
+
+    def finish(self):
+        self.flush()
+        return self.stats
+
+
+class ShopProductSync:
+    """Diff a shop's POS rows against its current prices/stock and bulk_update the changed products"""
+
+    def __init__(self, shop, key='auto', batch_size=SYNC_BATCH_SIZE, dry_run=False, on_reject=None, on_change=None, on_batch=None):
+        from .models import ShopProduct
+
+        self.shop = shop
+        self.key = key
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.on_reject = on_reject
+        self.on_change = on_change
+        self.on_batch = on_batch
+        self.decimal_limits = decimal_limits(ShopProduct)
+
+        self.current = {}
+        self.names = {}
+        self.index = {name: {} for name in SYNC_KEYS}
+        ambiguous = {name: set() for name in SYNC_KEYS}
+        for pk, name, shop_sku, sku, barcode, *values in ShopProduct.objects.filter(shop=shop).values_list(
+            'pk', 'master_product__name', 'shop_sku', 'master_product__sku', 'master_product__barcode', *SYNC_FIELDS
+        ):
+            self.current[pk] = dict(zip(SYNC_FIELDS, values))
+            self.names[pk] = name
+            for key_name, value in (('shop_sku', shop_sku), ('sku', sku), ('barcode', barcode)):
+                if not value:
+                    continue
+                if value in self.index[key_name]:
+                    ambiguous[key_name].add(value)
+                self.index[key_name][value] = pk
+        for key_name, values in ambiguous.items():
+            for value in values:
+                self.index[key_name][value] = None
+
+        self.pending = {}
+        self.changed_fields = set()
+        self.stats = {'read': 0, 'matched': 0, 'changed': 0, 'unchanged': 0, 'rejected': 0, 'updated': 0}
+
+    def resolve(self, row):
+        key_names = SYNC_KEYS if self.key == 'auto' else (self.key,)
+        # In auto mode a key that matches nothing (or several products) falls through to the next one
+        errors = []
+        for key_name in key_names:
+            value = row.get(key_name)
+            if value in (None, ''):
+                continue
+            value = str(value)
+            pk = self.index[key_name].get(value)
+            if pk is not None:
+                return key_name, value, pk
+            if value in self.index[key_name]:
+                errors.append(f"{key_name} {value!r} matches several products in this shop")
+            else:
+                errors.append(f"No product with {key_name} {value!r} in this shop")
+        if errors:
+            raise RowError('; '.join(errors))
+        raise RowError(f"Missing {' / '.join(key_names)}")
+
+    def clean(self, row, current):
+        values = dict(current)
+        for field in SYNC_FIELDS:
+            value = row.get(field)
+            if value in (None, ''):
+                continue
+            if field == 'stock':
+                values[field] = parse_stock(value)
+            elif field == 'discount_price' and str(value).strip().lower() in CLEAR_VALUES:
+                values[field] = None
+            else:
+                values[field] = parse_decimal(value, field, *self.decimal_limits[field])
+        return values
+
+    def feed(self, number, row):
+        self.stats['read'] += 1
+        try:
+            if not isinstance(row, dict):
+                raise RowError("Invalid JSON line")
+            row = {key.strip().lower(): value.strip() if isinstance(value, str) else value for key, value in row.items() if key}
+            key_name, key_value, pk = self.resolve(row)
+            values = self.clean(row, self.pending.get(pk, self.current[pk]))
+        except RowError as error:
+            self.stats['rejected'] += 1
+            if self.on_reject:
+                self.on_reject(number, row, str(error))
+            return
+
+        self.stats['matched'] += 1
+        changes = {
+            field: (self.current[pk][field], value)
+            for field, value in values.items()
+            if value != self.current[pk][field]
+        }
+        if not changes:
+            self.stats['unchanged'] += 1
+            self.pending.pop(pk, None)
+            return
+        self.stats['changed'] += 1
+        if self.on_change:
+            self.on_change(number, key_value, self.names[pk], changes)
+        self.pending[pk] = values
+        self.changed_fields.update(changes)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        from .models import ShopProduct
+        from .page_cache import UNTAGGED_TAG, invalidate_tags
+        from .structured_data import invalidate_structured_data
+
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, {}
+        # Only the columns that changed somewhere in the batch; bulk_update cost grows with each column
+        fields = [field for field in SYNC_FIELDS if field in self.changed_fields] + ['updated_at']
+        self.changed_fields = set()
+        now = timezone.now()
+        products = [ShopProduct(pk=pk, updated_at=now, **values) for pk, values in pending.items()]
+        if not self.dry_run:
+            with transaction.atomic():
+                ShopProduct.objects.bulk_update(products, fields, batch_size=self.batch_size)
+                # bulk_update sends no signals
+                transaction.on_commit(lambda: invalidate_tags([f"shop:{self.shop.pk}", 'shopproduct', UNTAGGED_TAG]))
+                # Product offers (prices) in the JSON-LD
+                transaction.on_commit(invalidate_structured_data)
+        for pk, values in pending.items():
+            self.current[pk] = values
+        self.stats['updated'] += len(products)
+        if self.on_batch:
+            self.on_batch(self.stats)
+
+    def finish(self):
+        self.flush()
+        return self.stats
@@ -0,0 +1,160 @@
+"""
+HTTP conditional GET for model-backed pages
+
+A page declares the querysets it renders. page_state() reads MAX(updated_at)
+and COUNT(*) of each of them - plus of the models every page shows through
+the context processors (site_dependencies()) - as scalar subqueries of a
+single SELECT, and derives Last-Modified and a weak ETag from them (the
+count catches deletions, which leave the maximum unchanged). When the
+browser's or CDN's validators match, a 304 is returned before the view runs.
+
+The page is tagged with the models of those querysets for the page cache
+(ezygrocery.page_cache). Anonymous responses get a public Cache-Control for
+shared caches and a Surrogate-Key header (the page's tags) for purging by
+tag; pages for visitors with a session stay private. Pages differ by the
+language and moholla cookies, so every response varies on Cookie.
+"""
+import hashlib
+from datetime import datetime, timezone as dt_timezone
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count, IntegerField, Max, Value
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date
+
+DEFAULT_MAX_AGE = 0
+DEFAULT_SHARED_MAX_AGE = 300
+DEFAULT_STALE_WHILE_REVALIDATE = 60
+
+
+def site_dependencies():
+    """What the context processors render on every page"""
+    from .models import Category, Coupon, HeroSlider, Promotion, SpecialOffer, StoreSettings
+    return [model.objects.all() for model in (StoreSettings, Category, Promotion, SpecialOffer, Coupon, HeroSlider)]
+
+
+def _aggregate_sql(queryset, aggregate, using):
+    if queryset.query.is_sliced:
+        queryset = queryset.model._base_manager.filter(pk__in=queryset.values('pk'))
+    query = (
+        queryset.order_by()
+        .annotate(_page_state=Value(1, output_field=IntegerField()))
+        .values('_page_state')
+        .annotate(value=aggregate)
+        .values('value')
+        .query
+    )
+    return query.get_compiler(using=using).as_sql()
+
+
+def _to_datetime(value):
+    if value is None or isinstance(value, datetime):
+        return value
+    value = parse_datetime(str(value))
+    if value is not None and value.tzinfo is None and settings.USE_TZ:
+        value = value.replace(tzinfo=dt_timezone.utc)
+    return value
+
+
+def page_state(querysets, extra=()):
+    """(last_modified, etag) of the data behind a page, in one query"""
+    querysets = list(querysets)
+    using = querysets[0].db
+    columns, params = [], []
+    for queryset in querysets:
+        for aggregate in (Max('updated_at'), Count('pk')):
+            sql, sql_params = _aggregate_sql(queryset, aggregate, using)
+            columns.append(f"({sql})")
+            params.extend(sql_params)
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"SELECT {', '.join(columns)}", params)
+        row = cursor.fetchone()
+    stamps = [_to_datetime(value) for value in row[0::2]]
+    last_modified = max((stamp for stamp in stamps if stamp is not None), default=None)
+    raw = '|'.join([str(value) for value in row] + [str(value) for value in extra])
+    return last_modified, f'W/"{hashlib.md5(raw.encode()).hexdigest()}"'
+
+
+def _variant(request):
+    """Request parts the page differs by besides the data (see page_cache.page_key)"""
+    from .page_cache import page_cache_settings
+    return (
+        request.COOKIES.get(settings.LANGUAGE_COOKIE_NAME) or settings.LANGUAGE_CODE,
+        request.COOKIES.get(page_cache_settings()['MOHOLLA_COOKIE'], ''),
+    )
+
+
+def conditional_response(request, dependencies, view, max_age, shared_max_age, stale_while_revalidate):
+    from .page_cache import tag_page
+    
+    dependencies = list(dependencies)
+    tag_page(request, *{queryset.model._meta.model_name for queryset in dependencies})
+    if request.method not in ('GET', 'HEAD') or settings.SESSION_COOKIE_NAME in request.COOKIES:
+        response = view()
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ['Cookie'])
+        return response
+    
+    last_modified, etag = page_state(dependencies + site_dependencies(), _variant(request))
+    # Whole seconds, like the Last-Modified header If-Modified-Since echoes
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = view()
+        if response.status_code != 200:
+            return response
+        tags = sorted(getattr(request, 'page_cache_tags', ()))
+        if tags:
+            response['Surrogate-Key'] = ' '.join(tags)
+    response['ETag'] = etag
+    if timestamp is not None:
+        response['Last-Modified'] = http_date(timestamp)
+    patch_cache_control(
+        response, public=True, max_age=max_age, s_maxage=shared_max_age,
+        stale_while_revalidate=stale_while_revalidate,
+    )
+    # Shared caches must not serve one moholla's or language's page to another
+    patch_vary_headers(response, ['Cookie'])
+    return response
+
+
+def conditional_page(dependencies, max_age=DEFAULT_MAX_AGE, shared_max_age=DEFAULT_SHARED_MAX_AGE,
+                     stale_while_revalidate=DEFAULT_STALE_WHILE_REVALIDATE):
+    """
+    View decorator; `dependencies(request, *args, **kwargs)` returns the
+    querysets the page renders, e.g.
+        
+        @conditional_page(lambda request, slug: [Shop.objects.filter(slug=slug),
+                                                 ShopProduct.objects.filter(shop__slug=slug)])
+        def shop_detail(request, slug): ...
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            return conditional_response(
+                request, dependencies(request, *args, **kwargs), lambda: view(request, *args, **kwargs),
+                max_age, shared_max_age, stale_while_revalidate,
+            )
+        return wrapper
+    return decorator
+
+
+class ConditionalPageMixin:
+    """Class-based view version of conditional_page(): override get_dependencies()"""
+    
+    cache_max_age = DEFAULT_MAX_AGE
+    cache_shared_max_age = DEFAULT_SHARED_MAX_AGE
+    cache_stale_while_revalidate = DEFAULT_STALE_WHILE_REVALIDATE
+    
+    def get_dependencies(self):
+        """Querysets the page renders; without any, only the site-wide models are checked"""
+        return []
+    
+    def dispatch(self, request, *args, **kwargs):
+        return conditional_response(
+            request, self.get_dependencies(), lambda: super(ConditionalPageMixin, self).dispatch(request, *args, **kwargs),
+            self.cache_max_age, self.cache_shared_max_age, self.cache_stale_while_revalidate,
+        )
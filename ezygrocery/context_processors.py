@@ -1,9 +1,15 @@
 """
 Context processors for ezygrocery app
 """
+import logging
+
+from .metrics import timed_processor
 from .models import StoreSettings, Category, Promotion, SpecialOffer, Coupon, SearchQuery, Order
 
+logger = logging.getLogger(__name__)
+
 
+@timed_processor
 def store_settings(request):
     """Add store settings to context"""
     try:
@@ -15,8 +21,8 @@ def store_settings(request):
             'STORE_PHONE': settings.contact_phone,
             'STORE_EMAIL': settings.contact_email,
         }
-    except Exception as e:
-        print(f"[SEO Context] Error: {e}")
+    except Exception:
+        logger.exception("Store settings could not be loaded")
         return {
             'store_settings': None,
             'STORE_NAME': 'আমার ফ্রেশ বিডি',
@@ -26,6 +32,7 @@ def store_settings(request):
         }
 
 
+@timed_processor
 def cart_items(request):
     """Add cart items count to context"""
     try:
@@ -39,6 +46,7 @@ def cart_items(request):
         return {'cart_items_count': 0}
 
 
+@timed_processor
 def categories_processor(request):
     """Add active categories to context"""
     try:
@@ -48,6 +56,7 @@ def categories_processor(request):
         return {'categories': []}
 
 
+@timed_processor
 def trending_searches(request):
     """Add trending searches to context"""
     try:
@@ -57,6 +66,7 @@ def trending_searches(request):
         return {'trending_searches': []}
 
 
+@timed_processor
 def promotions_processor(request):
     """Add active promotions to context"""
     try:
@@ -72,6 +82,7 @@ def promotions_processor(request):
         return {'promotions': []}
 
 
+@timed_processor
 def special_offers_processor(request):
     """Add active special offers to context"""
     try:
@@ -81,6 +92,7 @@ def special_offers_processor(request):
         return {'special_offers': []}
 
 
+@timed_processor
 def coupons_processor(request):
     """Add active coupons to context"""
     try:
@@ -96,6 +108,7 @@ def coupons_processor(request):
         return {'active_coupons': []}
 
 
+@timed_processor
 def get_new_orders_badge(request):
     """Add new orders count for admin"""
     try:
@@ -0,0 +1,84 @@
+"""
+Maintained unviewed-order counters for the admin new-orders badge
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F
+
+UNVIEWED_CACHE_KEY = 'ezygrocery:orders:unviewed'
+UNVIEWED_CACHE_TIMEOUT = 30
+
+
+def adjust_unviewed(deltas):
+    """Apply {shop_id: delta} changes to the per-shop counters"""
+    from .models import UnviewedOrderCounter
+
+    changed = False
+    for shop_id, delta in deltas.items():
+        if not delta:
+            continue
+        changed = True
+        updated = UnviewedOrderCounter.objects.filter(shop_id=shop_id).update(count=F('count') + delta)
+        # Decrements never create a row: the counter may already be gone with
+        # its shop (cascade delete), and a missing row counts as zero anyway
+        if not updated and delta > 0:
+            counter, created = UnviewedOrderCounter.objects.get_or_create(shop_id=shop_id, defaults={'count': delta})
+            if not created:
+                UnviewedOrderCounter.objects.filter(pk=counter.pk).update(count=F('count') + delta)
+    if changed:
+        transaction.on_commit(invalidate_unviewed_cache)
+
+
+def unviewed_deltas(old, new):
+    """Counter changes for an order moving from `old` to `new` tracked values (None = absent)"""
+    deltas = {}
+    for values, sign in ((old, -1), (new, 1)):
+        if values and not values['is_viewed']:
+            deltas[values['shop_id']] = deltas.get(values['shop_id'], 0) + sign
+    return deltas
+
+
+def invalidate_unviewed_cache():
+    cache.delete(UNVIEWED_CACHE_KEY)
+
+
+def get_unviewed_counts():
+    """Return {'total': n, 'shops': [{'shop_id', 'shop_name', 'count'}, ...]} from the counters"""
+    from .models import UnviewedOrderCounter
+
+    counts = cache.get(UNVIEWED_CACHE_KEY)
+    if counts is None:
+        shops = [
+            {'shop_id': shop_id, 'shop_name': name, 'count': count}
+            for shop_id, name, count in UnviewedOrderCounter.objects.filter(count__gt=0)
+            .order_by('-count')
+            .values_list('shop_id', 'shop__name', 'count')
+        ]
+        counts = {'total': sum(shop['count'] for shop in shops), 'shops': shops}
+        cache.set(UNVIEWED_CACHE_KEY, counts, UNVIEWED_CACHE_TIMEOUT)
+    return counts
+
+
+def rebuild_unviewed_counters():
+    """Recount unviewed orders per shop from the orders table (repairs drift)"""
+    from .models import Order, UnviewedOrderCounter
+
+    with transaction.atomic():
+        per_shop = dict(
+            Order.objects.filter(is_viewed=False).order_by().values_list('shop').annotate(n=Count('id'))
+        )
+        UnviewedOrderCounter.objects.exclude(shop_id__in=per_shop).update(count=0)
+        UnviewedOrderCounter.objects.bulk_create(
+            [UnviewedOrderCounter(shop_id=shop_id, count=count) for shop_id, count in per_shop.items()],
+            update_conflicts=True,
+            unique_fields=['shop'],
+            update_fields=['count'],
+        )
+        transaction.on_commit(invalidate_unviewed_cache)
+    return per_shop
+
+
+def new_orders_badge(request):
+    """Unfold sidebar badge callback for the orders menu item"""
+    total = get_unviewed_counts()['total']
+    return total or ""
@@ -0,0 +1,338 @@
+"""
+Multi-granularity sales cubes
+
+SalesCube cells hold delivered-order sales per period (hour, day, week, month)
+for each shop (with its moholla), with an empty category holding the shop's
+totals, plus one cell per shop, category and period from day granularity up.
+Hours have no category breakdown: hour x shop x category cells outnumber the
+orders themselves. Sales are item revenue (price x quantity) by order creation
+time, before refunds and delivery charges.
+
+Hour total cells and day category cells are aggregated from OrderItem; day
+total cells are rolled up from hour cells and week/month cells from day
+cells, so every level stays consistent. The backfill builds the hour and day
+cells of a chunk of days from one pass over its items, and each week/month
+level with one query. Queries cover a range with the coarsest whole periods
+that fit and fall back to finer cells only at the edges; category queries
+are widened to whole days.
+"""
+from datetime import datetime, time, timedelta
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+# Coarsest first, as used by the range planner
+GRANULARITIES = ('month', 'week', 'day', 'hour')
+# Category cells are not kept per hour
+CATEGORY_GRANULARITIES = ('month', 'week', 'day')
+
+DIMENSIONS = {
+    'shop': ('shop_id', 'shop__name'),
+    'moholla': ('moholla_id', 'moholla__name'),
+    'category': ('category_id', 'category__name'),
+}
+
+ITEM_REVENUE = ExpressionWrapper(F('price') * F('quantity'), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+def _aware(naive):
+    return timezone.make_aware(naive, timezone.get_current_timezone())
+
+
+def period_start(granularity, moment):
+    """Start of the local hour/day/week (Monday)/month containing `moment`"""
+    local = timezone.localtime(moment).replace(tzinfo=None)
+    if granularity == 'hour':
+        return _aware(local.replace(minute=0, second=0, microsecond=0))
+    day = datetime.combine(local.date(), time.min)
+    if granularity == 'day':
+        return _aware(day)
+    if granularity == 'week':
+        return _aware(day - timedelta(days=day.weekday()))
+    if granularity == 'month':
+        return _aware(day.replace(day=1))
+    raise ValueError(f"Unknown granularity: {granularity}")
+
+
+def next_period(granularity, start):
+    """Start of the period following the one beginning at `start`"""
+    local = timezone.localtime(start).replace(tzinfo=None)
+    if granularity == 'hour':
+        return period_start('hour', _aware(local + timedelta(hours=1)))
+    if granularity == 'day':
+        return _aware(local + timedelta(days=1))
+    if granularity == 'week':
+        return _aware(local + timedelta(days=7))
+    if granularity == 'month':
+        return _aware((local.replace(day=28) + timedelta(days=4)).replace(day=1))
+    raise ValueError(f"Unknown granularity: {granularity}")
+
+
+def _cells(granularity, rows):
+    from .models import SalesCube
+
+    return [
+        SalesCube(
+            granularity=granularity, period_start=period, shop_id=shop_id, moholla_id=moholla_id,
+            category_id=category_id, total_orders=orders, total_items_sold=items or 0, total_sales=sales or 0,
+        )
+        for period, shop_id, moholla_id, category_id, orders, items, sales in rows
+    ]
+
+
+def item_cells(granularity, start, end, shop_ids=None, by_category=False):
+    """Shop total cells, or per-category cells, for [start, end) aggregated from the items of delivered orders"""
+    from .models import OrderItem
+
+    items = OrderItem.objects.filter(order__status='delivered', order__created_at__gte=start, order__created_at__lt=end)
+    if shop_ids is not None:
+        items = items.filter(order__shop_id__in=shop_ids)
+    items = items.order_by().annotate(period=Trunc('order__created_at', granularity))
+    measures = dict(orders=Count('order_id', distinct=True), items=Sum('quantity'), sales=Sum(ITEM_REVENUE))
+
+    if by_category:
+        rows = items.values_list(
+            'period', 'order__shop_id', 'order__shop__moholla_id', 'shop_product__master_product__category_id'
+        ).annotate(**measures)
+    else:
+        rows = (
+            (period, shop_id, moholla_id, None, orders, quantity, sales)
+            for period, shop_id, moholla_id, orders, quantity, sales in (
+                items.values_list('period', 'order__shop_id', 'order__shop__moholla_id').annotate(**measures)
+            )
+        )
+    return _cells(granularity, rows)
+
+
+def hour_cells(start, end, shop_ids=None):
+    """Hour total cells for [start, end)"""
+    return item_cells('hour', start, end, shop_ids)
+
+
+def day_cells(start, end, shop_ids=None):
+    """Day total cells rolled up from the stored hour cells, plus the day category cells, for [start, end)"""
+    return rollup_cells('day', start, end, shop_ids) + item_cells('day', start, end, shop_ids, by_category=True)
+
+
+def rollup_cells(granularity, start, end, shop_ids=None):
+    """Day total cells from hour cells, or week/month cells from day cells, for [start, end)"""
+    from .models import SalesCube
+
+    source = 'hour' if granularity == 'day' else 'day'
+    cells = SalesCube.objects.filter(granularity=source, period_start__gte=start, period_start__lt=end)
+    if shop_ids is not None:
+        cells = cells.filter(shop_id__in=shop_ids)
+    rows = (
+        cells.order_by().annotate(period=Trunc('period_start', granularity))
+        .values_list('period', 'shop_id', 'moholla_id', 'category_id')
+        .annotate(orders=Sum('total_orders'), items=Sum('total_items_sold'), sales=Sum('total_sales'))
+    )
+    return _cells(granularity, rows)
+
+
+def replace_cells(granularity, start, end, cells, shop_ids=None):
+    """Swap the stored cells of one granularity in [start, end) for `cells`"""
+    from .models import SalesCube
+
+    existing = SalesCube.objects.filter(granularity=granularity, period_start__gte=start, period_start__lt=end)
+    if shop_ids is not None:
+        existing = existing.filter(shop_id__in=shop_ids)
+    existing.delete()
+    SalesCube.objects.bulk_create(cells, batch_size=1000)
+    return len(cells)
+
+
+def refresh_sales_cubes(slots):
+    """Recompute every cell containing the given (shop_id, created_at) order slots"""
+    from .reports import lock_shops
+
+    shops_by_hour = {}
+    for shop_id, created_at in slots:
+        shops_by_hour.setdefault(period_start('hour', created_at), set()).add(shop_id)
+    if not shops_by_hour:
+        return
+
+    with transaction.atomic():
+        lock_shops({shop_id for shop_id, created_at in slots})
+        for hour, shop_ids in shops_by_hour.items():
+            end = next_period('hour', hour)
+            replace_cells('hour', hour, end, hour_cells(hour, end, shop_ids), shop_ids)
+        for granularity in ('day', 'week', 'month'):
+            shops_by_period = {}
+            for hour, shop_ids in shops_by_hour.items():
+                shops_by_period.setdefault(period_start(granularity, hour), set()).update(shop_ids)
+            build = day_cells if granularity == 'day' else partial(rollup_cells, granularity)
+            for start, shop_ids in shops_by_period.items():
+                end = next_period(granularity, start)
+                replace_cells(granularity, start, end, build(start, end, shop_ids), shop_ids)
+
+
+def chunk_cells(start, end):
+    """Hour total cells and day total and category cells for [start, end), from one pass over the delivered items"""
+    from .models import OrderItem
+
+    # One row per order and category; periods are computed here, once per order
+    rows = (
+        OrderItem.objects.filter(order__status='delivered', order__created_at__gte=start, order__created_at__lt=end)
+        .order_by()
+        .values_list(
+            'order_id', 'order__shop_id', 'order__shop__moholla_id', 'order__created_at',
+            'shop_product__master_product__category_id',
+        )
+        .annotate(items=Sum('quantity'), sales=Sum(ITEM_REVENUE))
+    )
+    periods = {}
+    hours, categories = {}, {}
+    for order_id, shop_id, moholla_id, created_at, category_id, quantity, sales in rows:
+        if created_at not in periods:
+            hour = period_start('hour', created_at)
+            periods[created_at] = (hour, period_start('day', hour))
+        hour, day = periods[created_at]
+        for cells, key in ((hours, (hour, shop_id, moholla_id, None)), (categories, (day, shop_id, moholla_id, category_id))):
+            cell = cells.setdefault(key, [set(), 0, 0])
+            cell[0].add(order_id)
+            cell[1] += quantity or 0
+            cell[2] += sales or 0
+
+    hour_rows = [(*key, len(orders), quantity, sales) for key, (orders, quantity, sales) in hours.items()]
+    # Day totals are rolled up from the hour cells, as in day_cells()
+    day_of = dict(periods.values())
+    days = {}
+    for hour, shop_id, moholla_id, category_id, orders, quantity, sales in hour_rows:
+        cell = days.setdefault((day_of[hour], shop_id, moholla_id, None), [0, 0, 0])
+        cell[0] += orders
+        cell[1] += quantity
+        cell[2] += sales
+    day_rows = [(*key, *values) for key, values in days.items()]
+    day_rows += [(*key, len(orders), quantity, sales) for key, (orders, quantity, sales) in categories.items()]
+    return _cells('hour', hour_rows), _cells('day', day_rows)
+
+
+def rebuild_sales_cubes(start_date, end_date, chunk_days=7, progress=None):
+    """Backfill hour and day cells chunk by chunk, then the weeks and months overlapping the range; safe to rerun"""
+    from .reports import _day_bounds
+
+    total = 0
+    chunk_start = start_date
+    while chunk_start <= end_date:
+        chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), end_date)
+        start, end = _day_bounds(chunk_start, chunk_end)
+        hours, days = chunk_cells(start, end)
+        with transaction.atomic():
+            written = replace_cells('hour', start, end, hours)
+            written += replace_cells('day', start, end, days)
+        total += written
+        if progress:
+            progress('day', start, written)
+        chunk_start = chunk_end + timedelta(days=1)
+
+    range_start, range_end = _day_bounds(start_date, end_date)
+    for granularity in ('week', 'month'):
+        # Whole periods: from the one containing the first day to the one containing the last
+        start = period_start(granularity, range_start)
+        end = next_period(granularity, period_start(granularity, range_end - timedelta(microseconds=1)))
+        with transaction.atomic():
+            written = replace_cells(granularity, start, end, rollup_cells(granularity, start, end))
+        total += written
+        if progress:
+            progress(granularity, start, written)
+    return total
+
+
+def plan_periods(start, end, granularities=GRANULARITIES):
+    """Cover [start, end) with [(granularity, first, stop)] runs, coarsest whole periods first"""
+    if start >= end or not granularities:
+        return []
+    granularity, finer = granularities[0], granularities[1:]
+    first = period_start(granularity, start)
+    if first < start:
+        first = next_period(granularity, first)
+    stop = first
+    while next_period(granularity, stop) <= end:
+        stop = next_period(granularity, stop)
+    if stop == first:
+        return plan_periods(start, end, finer)
+    return plan_periods(start, first, finer) + [(granularity, first, stop)] + plan_periods(stop, end, finer)
+
+
+def _pk(value):
+    return getattr(value, 'pk', value)
+
+
+def cube_cells(start, end, shop=None, moholla=None, category=None, by_category=False):
+    """Cells covering [start, end) (widened to whole hours, or days for categories) with the given filters"""
+    from .models import SalesCube
+
+    by_category = by_category or category is not None
+    granularities = CATEGORY_GRANULARITIES if by_category else GRANULARITIES
+    finest = granularities[-1]
+    start = period_start(finest, start)
+    if period_start(finest, end) < end:
+        end = next_period(finest, end)
+    plan = plan_periods(start, end, granularities)
+    if not plan:
+        return SalesCube.objects.none()
+
+    covered = Q()
+    for granularity, first, stop in plan:
+        covered |= Q(granularity=granularity, period_start__gte=first, period_start__lt=stop)
+    cells = SalesCube.objects.filter(covered)
+    if category is not None:
+        cells = cells.filter(category_id=_pk(category))
+    else:
+        cells = cells.filter(category__isnull=not by_category)
+    if shop is not None:
+        cells = cells.filter(shop_id=_pk(shop))
+    if moholla is not None:
+        cells = cells.filter(moholla_id=_pk(moholla))
+    return cells
+
+
+def _measures():
+    return dict(total_orders=Sum('total_orders'), total_items_sold=Sum('total_items_sold'), total_sales=Sum('total_sales'))
+
+
+def query_sales(start, end, group_by=(), shop=None, moholla=None, category=None):
+    """
+    Sales for [start, end), optionally grouped by 'shop', 'moholla' and/or 'category'.
+
+    Without grouping returns {'total_orders', 'total_items_sold', 'total_sales'};
+    with grouping a list of those plus the dimension ids and names, best
+    selling first. Per-category order counts count orders containing the
+    category, so they do not add up to the shop totals. Category filters and
+    groupings have day resolution: the range is widened to whole days.
+    """
+    if isinstance(group_by, str):
+        group_by = (group_by,)
+    unknown = set(group_by) - set(DIMENSIONS)
+    if unknown:
+        raise ValueError(f"Unknown dimensions: {', '.join(sorted(unknown))}")
+
+    cells = cube_cells(start, end, shop, moholla, category, by_category='category' in group_by).order_by()
+    if not group_by:
+        return {name: value or 0 for name, value in cells.aggregate(**_measures()).items()}
+    fields = [field for dimension in group_by for field in DIMENSIONS[dimension]]
+    return list(cells.values(*fields).annotate(**_measures()).order_by('-total_sales'))
+
+
+def sales_series(start, end, granularity='day', shop=None, moholla=None, category=None):
+    """Per-period totals [{'period_start', ...}] of one granularity for the periods overlapping [start, end)"""
+    from .models import SalesCube
+
+    if category is not None and granularity not in CATEGORY_GRANULARITIES:
+        raise ValueError(f"Category sales are not kept per {granularity}")
+    cells = SalesCube.objects.filter(
+        granularity=granularity, period_start__gte=period_start(granularity, start), period_start__lt=end
+    )
+    if category is not None:
+        cells = cells.filter(category_id=_pk(category))
+    else:
+        cells = cells.filter(category__isnull=True)
+    if shop is not None:
+        cells = cells.filter(shop_id=_pk(shop))
+    if moholla is not None:
+        cells = cells.filter(moholla_id=_pk(moholla))
+    return list(cells.order_by('period_start').values('period_start').annotate(**_measures()))
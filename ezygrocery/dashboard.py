@@ -0,0 +1,162 @@
+"""
+Admin dashboard (Unfold DASHBOARD_CALLBACK)
+
+Every section is read from rollup tables (SalesCube, ShopSalesReport,
+ProductSalesReport, UnviewedOrderCounter and the Rider totals) or from the
+catalog, and cached for a short time, so rendering never scans orders.
+"""
+import json
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import F, Sum
+from django.urls import reverse
+from django.utils import timezone
+
+DASHBOARD_CACHE_PREFIX = 'ezygrocery:dashboard:'
+DASHBOARD_CACHE_TIMEOUT = 60
+LOW_STOCK_CACHE_TIMEOUT = 300
+TREND_DAYS = 14
+RANKING_DAYS = 30
+TOP_LIMIT = 10
+
+
+def _cached(name, build, timeout=DASHBOARD_CACHE_TIMEOUT):
+    from .routers import analytics
+    
+    key = DASHBOARD_CACHE_PREFIX + name
+    data = cache.get(key)
+    if data is None:
+        with analytics():
+            data = build()
+        cache.set(key, data, timeout)
+    return data
+
+
+def _money(value):
+    return f"৳{value or 0:,.2f}"
+
+
+def sales_kpis():
+    """GMV and delivered orders for today, the last 7 and the last 30 days"""
+    from .cubes import period_start, query_sales
+    
+    now = timezone.now()
+    today = period_start('day', now)
+    kpis = []
+    for title, start in (("আজ", today), ("৭ দিন", today - timedelta(days=6)), ("৩০ দিন", today - timedelta(days=29))):
+        totals = query_sales(start, now)
+        kpis.append({
+            'title': title,
+            'gmv': totals['total_sales'],
+            'orders': totals['total_orders'],
+            'items': totals['total_items_sold'],
+        })
+    return kpis
+
+
+def sales_trend():
+    """Daily GMV and orders of the last TREND_DAYS days as Chart.js data"""
+    from .cubes import next_period, period_start, sales_series
+    
+    now = timezone.now()
+    start = period_start('day', now) - timedelta(days=TREND_DAYS - 1)
+    series = {row['period_start']: row for row in sales_series(start, now, 'day')}
+    labels, gmv, orders = [], [], []
+    day = start
+    while day <= now:
+        row = series.get(day, {})
+        labels.append(timezone.localtime(day).strftime('%d %b'))
+        gmv.append(float(row.get('total_sales') or 0))
+        orders.append(row.get('total_orders') or 0)
+        day = next_period('day', day)
+    return {
+        'labels': labels,
+        'datasets': [
+            {'label': "GMV (৳)", 'data': gmv, 'yAxisID': 'y'},
+            {'label': "অর্ডার", 'data': orders, 'type': 'line', 'yAxisID': 'y1'},
+        ],
+    }
+
+
+def top_products():
+    from .models import ProductSalesReport
+    
+    since = timezone.localdate() - timedelta(days=RANKING_DAYS - 1)
+    return [
+        [row['master_product__name'], row['quantity'], _money(row['sales'])]
+        for row in ProductSalesReport.objects.filter(date__gte=since)
+        .values('master_product_id', 'master_product__name')
+        .annotate(quantity=Sum('quantity_sold'), sales=Sum('total_sales'))
+        .order_by('-sales')[:TOP_LIMIT]
+    ]
+
+
+def top_shops():
+    from .models import ShopSalesReport
+    
+    since = timezone.localdate() - timedelta(days=RANKING_DAYS - 1)
+    return [
+        [row['shop__name'], row['shop__moholla__name'], row['orders'], _money(row['sales'])]
+        for row in ShopSalesReport.objects.filter(date__gte=since)
+        .values('shop_id', 'shop__name', 'shop__moholla__name')
+        .annotate(orders=Sum('total_orders'), sales=Sum('total_sales'))
+        .order_by('-sales')[:TOP_LIMIT]
+    ]
+
+
+def rider_performance():
+    from .models import Rider
+    
+    return [
+        [rider.user.get_full_name() or rider.user.username, rider.total_deliveries, rider.rating, f"{rider.on_time_rate}%"]
+        for rider in Rider.objects.filter(is_active=True).select_related('user')
+        .only('total_deliveries', 'rating', 'on_time_rate', 'user__username', 'user__first_name', 'user__last_name')
+        .order_by('-total_deliveries', '-rating')[:TOP_LIMIT]
+    ]
+
+
+def low_stock():
+    from .models import ShopProduct
+    
+    products = ShopProduct.objects.filter(is_active=True, stock__lte=F('low_stock_alert'))
+    return {
+        'count': products.count(),
+        'rows': [
+            [row['master_product__name'], row['shop__name'], row['stock'], row['low_stock_alert']]
+            for row in products.order_by('stock')
+            .values('master_product__name', 'shop__name', 'stock', 'low_stock_alert')[:TOP_LIMIT]
+        ],
+    }
+
+
+def dashboard_callback(request, context):
+    """Add the dashboard sections to the admin index context"""
+    from .counters import get_unviewed_counts
+    
+    stock = _cached('low_stock', low_stock, LOW_STOCK_CACHE_TIMEOUT)
+    context.update({
+        'sales_kpis': _cached('sales_kpis', sales_kpis),
+        'sales_trend': json.dumps(_cached('sales_trend', sales_trend), ensure_ascii=False),
+        'sales_trend_options': json.dumps({'scales': {'y1': {'position': 'right', 'grid': {'display': False}}}}),
+        'new_orders': get_unviewed_counts()['total'],
+        'orders_url': reverse('admin:ezygrocery_order_changelist'),
+        'top_products': {
+            'headers': ["পণ্য", "পরিমাণ", "বিক্রয়"],
+            'rows': _cached('top_products', top_products),
+        },
+        'top_shops': {
+            'headers': ["দোকান", "মহল্লা", "অর্ডার", "বিক্রয়"],
+            'rows': _cached('top_shops', top_shops),
+        },
+        'rider_performance': {
+            'headers': ["রাইডার", "ডেলিভারি", "রেটিং", "সময়মতো"],
+            'rows': _cached('rider_performance', rider_performance),
+        },
+        'low_stock_count': stock['count'],
+        'low_stock': {
+            'headers': ["পণ্য", "দোকান", "স্টক", "সতর্কতা"],
+            'rows': stock['rows'],
+        },
+    })
+    return context
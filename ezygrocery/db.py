@@ -0,0 +1,13 @@
+"""
+Database connection setup
+"""
+
+
+def configure_connection(sender, connection, **kwargs):
+    """connection_created receiver: run the PRAGMAS of the alias's DATABASES entry (SQLite only)"""
+    pragmas = connection.settings_dict.get('PRAGMAS')
+    if connection.vendor != 'sqlite' or not pragmas:
+        return
+    # Straight on the sqlite3 connection, outside Django's cursor wrappers
+    for name, value in pragmas.items():
+        connection.connection.execute(f"PRAGMA {name} = {value}")
@@ -0,0 +1,462 @@
+"""
+Synthetic data generator for load testing
+
+Builds a deterministic dataset (same seed, same past --end date => same rows) of
+mohollas, shops, a master catalog, shop inventories, customers, riders,
+orders with items and refunds. Popularity of products and shops follows a
+Zipf distribution and order times follow daily/weekly curves. Reference
+data is written with bulk_create, orders, items and refunds with batched raw
+INSERTs; neither sends signals, so the unviewed-order counters and sales
+rollups are rebuilt at the end.
+"""
+import random
+import time as clock
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+
+DEMO_PREFIX = 'demo'
+BATCH_SIZE = 2000
+
+ZIPF_EXPONENT = 1.07
+
+# Relative order volume per local hour (midnight first): late-morning and evening peaks
+HOUR_WEIGHTS = [1.0, 0.5, 0.3, 0.2, 0.2, 0.4, 1.0, 2.0, 3.5, 5.0, 6.5, 7.0,
+                7.0, 6.0, 5.0, 4.5, 5.0, 6.5, 8.0, 9.0, 8.5, 6.0, 4.0, 2.0]
+
+# Relative order volume per weekday (Monday first); Friday/Saturday is the weekend
+WEEKDAY_WEIGHTS = [1.0, 1.0, 1.0, 1.05, 1.3, 1.2, 0.95]
+
+MOHOLLA_NAMES = [
+    "ধানমন্ডি", "মিরপুর", "উত্তরা", "গুলশান", "বনানী", "মোহাম্মদপুর", "বাড্ডা", "রামপুরা",
+    "খিলগাঁও", "মালিবাগ", "মগবাজার", "শ্যামলী", "আদাবর", "বসুন্ধরা", "যাত্রাবাড়ী", "লালবাগ",
+    "ওয়ারী", "তেজগাঁও", "কাফরুল", "পল্লবী",
+]
+
+SHOP_WORDS = ["রহিম", "করিম", "সোনালী", "নিউ", "মা", "বিসমিল্লাহ", "ভাই ভাই", "আল-আমিন", "মদিনা", "জননী"]
+SHOP_SUFFIXES = ["স্টোর", "জেনারেল স্টোর", "মুদি দোকান", "এন্টারপ্রাইজ", "সুপার শপ"]
+
+FIRST_NAMES = ["রহিম", "করিম", "আব্দুল", "ফাতেমা", "আয়েশা", "সাকিব", "তামিম", "নুসরাত", "মিম", "রাকিব",
+               "সুমাইয়া", "জান্নাত", "হাসান", "মেহেদী", "তানভীর", "শারমিন", "রুবিনা", "আরিফ", "সজীব", "নাদিয়া"]
+LAST_NAMES = ["আহমেদ", "হোসেন", "ইসলাম", "রহমান", "খান", "চৌধুরী", "সরকার", "মিয়া", "উদ্দিন", "আক্তার"]
+
+# (category slug, category name, [(item, sizes, base price)])
+CATALOG = [
+    ('rice', "চাল", [("মিনিকেট চাল", ["১ কেজি", "৫ কেজি"], 75), ("নাজিরশাইল চাল", ["১ কেজি", "৫ কেজি"], 85), ("পোলাও চাল", ["১ কেজি"], 130)]),
+    ('lentils', "ডাল", [("মসুর ডাল", ["৫০০ গ্রাম", "১ কেজি"], 120), ("মুগ ডাল", ["৫০০ গ্রাম", "১ কেজি"], 150)]),
+    ('oil', "তেল", [("সয়াবিন তেল", ["১ লিটার", "২ লিটার", "৫ লিটার"], 190), ("সরিষার তেল", ["৫০০ মিলি", "১ লিটার"], 160)]),
+    ('spices', "মসলা", [("হলুদ গুঁড়া", ["১০০ গ্রাম", "২০০ গ্রাম"], 60), ("মরিচ গুঁড়া", ["১০০ গ্রাম", "২০০ গ্রাম"], 70), ("জিরা", ["৫০ গ্রাম"], 90)]),
+    ('sugar-salt', "চিনি ও লবণ", [("চিনি", ["৫০০ গ্রাম", "১ কেজি"], 130), ("লবণ", ["৫০০ গ্রাম", "১ কেজি"], 40)]),
+    ('flour', "আটা ও ময়দা", [("লাল আটা", ["১ কেজি", "২ কেজি"], 65), ("ময়দা", ["১ কেজি"], 70)]),
+    ('dairy', "দুধ ও ডিম", [("তরল দুধ", ["৫০০ মিলি", "১ লিটার"], 90), ("গুঁড়া দুধ", ["৫০০ গ্রাম"], 420), ("ডিম", ["১২ পিস", "৩০ পিস"], 150)]),
+    ('beverages', "পানীয়", [("চা পাতা", ["২০০ গ্রাম", "৪০০ গ্রাম"], 140), ("কফি", ["৫০ গ্রাম"], 250), ("জুস", ["২৫০ মিলি", "১ লিটার"], 35)]),
+    ('snacks', "স্ন্যাকস", [("বিস্কুট", ["১ প্যাকেট"], 30), ("চানাচুর", ["১৫০ গ্রাম", "৩০০ গ্রাম"], 45), ("নুডলস", ["৮ প্যাক"], 160)]),
+    ('cleaning', "পরিষ্কার সামগ্রী", [("সাবান", ["১০০ গ্রাম"], 45), ("ডিটারজেন্ট", ["৫০০ গ্রাম", "১ কেজি"], 120), ("ডিশ ওয়াশ", ["৫০০ মিলি"], 110)]),
+]
+
+BRANDS = ["প্রাণ", "তীর", "রূপচাঁদা", "ফ্রেশ", "এসিআই", "বসুন্ধরা", "রাঁধুনী", "ইস্পাহানি", "স্কয়ার", "কাজী"]
+
+
+def zipf_cum_weights(count, exponent=ZIPF_EXPONENT):
+    """Cumulative weights for random.choices() where rank 1 is the most popular"""
+    return list(accumulate(1 / rank ** exponent for rank in range(1, count + 1)))
+
+
+class RowWriter:
+    """
+    Raw executemany() INSERTs with writer-assigned ids for the high-volume tables.
+    
+    bulk_create spends most of its time building model instances and
+    preparing every value; here rows are plain tuples, only datetimes are
+    adapted and omitted columns get the model default. Handing out the ids
+    lets order items reference an order before its batch is written.
+    """
+    
+    def __init__(self, model, fields):
+        from django.db.models import Max
+        
+        opts = model._meta
+        self.fields = [opts.get_field(name) for name in fields]
+        given = {field.attname for field in self.fields} | {opts.pk.attname}
+        defaults = [field for field in opts.concrete_fields if field.attname not in given]
+        self.defaults = tuple(field.get_db_prep_save(field.get_default(), connection) for field in defaults)
+        self.adapt = [
+            connection.ops.adapt_datetimefield_value if field.get_internal_type() == 'DateTimeField' else None
+            for field in self.fields
+        ]
+        columns = [opts.pk.column] + [field.column for field in self.fields + defaults]
+        self.sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            connection.ops.quote_name(opts.db_table),
+            ', '.join(connection.ops.quote_name(column) for column in columns),
+            ', '.join(['%s'] * len(columns)),
+        )
+        self.last_id = model.objects.aggregate(last=Max('pk'))['last'] or 0
+        self.rows = []
+    
+    def add(self, *values):
+        """Queue a row (values in `fields` order) and return its id"""
+        self.last_id += 1
+        self.rows.append((self.last_id, *(
+            adapt(value) if adapt else value for adapt, value in zip(self.adapt, values)
+        ), *self.defaults))
+        return self.last_id
+    
+    def flush(self):
+        if self.rows:
+            # One transaction per batch; in autocommit SQLite would commit every row
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(self.sql, self.rows)
+        count = len(self.rows)
+        self.rows = []
+        return count
+
+
+def demo_data_exists():
+    from .models import Shop
+    
+    return Shop.objects.filter(slug__startswith=f'{DEMO_PREFIX}-').exists()
+
+
+class DemoDataGenerator:
+    """Generate a deterministic load-testing dataset; see generate()"""
+    
+    def __init__(self, shops=50, products=5000, orders=100000, seed=42, days=365, end_date=None,
+                 products_per_shop=300, customers=None, riders=None, batch_size=BATCH_SIZE, progress=None):
+        self.shops = shops
+        self.products = products
+        self.orders = orders
+        self.days = days
+        self.end_date = min(end_date or timezone.localdate(), timezone.localdate())
+        self.products_per_shop = min(products_per_shop, products)
+        self.customers = customers or max(100, orders // 20)
+        self.riders = riders or max(5, shops // 5)
+        self.batch_size = batch_size
+        self.progress = progress or (lambda step, done, total: None)
+        self.rng = random.Random(seed)
+        self.tz = timezone.get_current_timezone()
+        self.end_of_day = timezone.make_aware(datetime.combine(self.end_date, time(23, 59, 59)), self.tz)
+        # No timestamp lies in the future: a run ending today stops at the current time
+        self.now = min(self.end_of_day, timezone.now())
+    
+    def clamp(self, moment):
+        return min(moment, self.now)
+    
+    def bulk(self, model, objects):
+        return model.objects.bulk_create(objects, batch_size=self.batch_size)
+    
+    def name(self):
+        return f"{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}"
+    
+    def phone(self):
+        return f"01{self.rng.choice('3456789')}{self.rng.randrange(10 ** 8):08d}"
+    
+    # ---------- reference data ----------
+    
+    def create_mohollas(self):
+        from .models import Moholla
+        
+        count = max(10, self.shops // 10)
+        mohollas = [
+            Moholla(
+                name=MOHOLLA_NAMES[i % len(MOHOLLA_NAMES)] + (f" {i // len(MOHOLLA_NAMES) + 1}" if i >= len(MOHOLLA_NAMES) else ""),
+                slug=f'{DEMO_PREFIX}-moholla-{i + 1}',
+                area_code=f'{DEMO_PREFIX.upper()}-{i + 1:04d}',
+                serial=i,
+            )
+            for i in range(count)
+        ]
+        return self.bulk(Moholla, mohollas)
+    
+    def create_users(self, kind, count):
+        # Unusable passwords: hashing a million passwords would dominate the run
+        users = [
+            User(
+                username=f'{DEMO_PREFIX}_{kind}_{i + 1:07d}',
+                email=f'{DEMO_PREFIX}.{kind}.{i + 1}@example.com',
+                first_name=self.rng.choice(FIRST_NAMES),
+                last_name=self.rng.choice(LAST_NAMES),
+                password='!',
+            )
+            for i in range(count)
+        ]
+        return self.bulk(User, users)
+    
+    def create_shops(self, mohollas):
+        from .models import Shop
+        
+        owners = self.create_users('owner', self.shops)
+        shops = [
+            Shop(
+                name=f"{self.rng.choice(SHOP_WORDS)} {self.rng.choice(SHOP_SUFFIXES)}",
+                slug=f'{DEMO_PREFIX}-shop-{i + 1}',
+                owner=owners[i],
+                moholla=self.rng.choice(mohollas),
+                address=f"বাড়ি {self.rng.randint(1, 200)}, রোড {self.rng.randint(1, 30)}",
+                phone=self.phone(),
+                is_verified=self.rng.random() < 0.8,
+                serial=i,
+            )
+            for i in range(self.shops)
+        ]
+        return self.bulk(Shop, shops)
+    
+    def create_catalog(self):
+        """Categories and master products; returns [(pk, mrp)] in popularity order (rank 1 first)"""
+        from .models import Category, MasterProduct
+        
+        categories = self.bulk(Category, [
+            Category(name=name, slug=f'{DEMO_PREFIX}-{slug}', serial=i)
+            for i, (slug, name, items) in enumerate(CATALOG)
+        ])
+        variants = [
+            (category.pk, item, size, price)
+            for category, (slug, name, items) in zip(categories, CATALOG)
+            for item, sizes, price in items
+            for size in sizes
+        ]
+        products = RowWriter(MasterProduct, [
+            'name', 'slug', 'sku', 'barcode', 'gtin', 'category', 'brand', 'weight', 'description', 'mrp',
+            'created_at', 'updated_at',
+        ])
+        ranked = []
+        for i in range(self.products):
+            category_id, item, size, price = variants[i % len(variants)]
+            brand = BRANDS[(i // len(variants)) % len(BRANDS)]
+            series = i // (len(variants) * len(BRANDS))
+            mrp = Decimal(price * self.rng.uniform(0.8, 1.3) * (1 + series * 0.01)).quantize(Decimal('1'))
+            pk = products.add(
+                f"{brand} {item} {size}" + (f" ({series + 1})" if series else ""),
+                f'{DEMO_PREFIX}-product-{i + 1}', f'{DEMO_PREFIX.upper()}-{i + 1:07d}',
+                f'2{i + 1:012d}', f'02{i + 1:012d}', category_id, brand, size, '', mrp, self.now, self.now,
+            )
+            ranked.append((pk, mrp))
+            if len(products.rows) >= self.batch_size:
+                products.flush()
+        products.flush()
+        # Popularity is shuffled so it is not tied to category
+        self.rng.shuffle(ranked)
+        return ranked
+    
+    def create_inventory(self, shops, ranked_products):
+        """
+        Each shop stocks products_per_shop products, popular products in more
+        shops; returns {shop_id: [(shop_product_id, price)]} in popularity order.
+        """
+        from .models import ShopProduct
+        
+        product_weights = zipf_cum_weights(len(ranked_products), exponent=0.6)
+        rank_of = {pk: rank for rank, (pk, mrp) in enumerate(ranked_products)}
+        rows = RowWriter(ShopProduct, [
+            'shop', 'master_product', 'shop_sku', 'cost_price', 'selling_price', 'discount_price', 'stock',
+            'created_at', 'updated_at',
+        ])
+        inventory = {}
+        for number, shop in enumerate(shops, 1):
+            chosen = {}
+            while len(chosen) < self.products_per_shop:
+                for pk, mrp in self.rng.choices(ranked_products, cum_weights=product_weights, k=self.products_per_shop):
+                    chosen.setdefault(pk, mrp)
+            stock = inventory[shop.pk] = []
+            for pk, mrp in sorted(list(chosen.items())[:self.products_per_shop], key=lambda item: rank_of[item[0]]):
+                selling = (mrp * Decimal(self.rng.uniform(0.9, 1.0))).quantize(Decimal('1'))
+                discount = (selling * Decimal('0.95')).quantize(Decimal('1')) if self.rng.random() < 0.1 else None
+                shop_product_id = rows.add(
+                    shop.pk, pk, f'S{shop.pk}-{pk}', (selling * Decimal('0.8')).quantize(Decimal('0.01')),
+                    selling, discount, self.rng.randint(0, 200), self.now, self.now,
+                )
+                stock.append((shop_product_id, discount if discount is not None and discount < selling else selling))
+            if len(rows.rows) >= self.batch_size:
+                rows.flush()
+            self.progress('inventory', number, len(shops))
+        rows.flush()
+        return inventory
+    
+    def create_customers(self, mohollas):
+        from .models import Customer
+        
+        users = self.create_users('customer', self.customers)
+        customers = [
+            Customer(user=user, moholla=self.rng.choice(mohollas), phone=self.phone(), address=f"বাড়ি {self.rng.randint(1, 300)}")
+            for user in users
+        ]
+        self.bulk(Customer, customers)
+        return [(user.pk, f"{user.first_name} {user.last_name}", user.email) for user in users]
+    
+    def create_riders(self):
+        from .models import Rider
+        
+        users = self.create_users('rider', self.riders)
+        riders = [
+            Rider(
+                user=user,
+                nid=f'{DEMO_PREFIX.upper()}{i + 1:012d}',
+                driving_license=f'DL-{i + 1:06d}',
+                bike_registration=f'DHAKA-{i + 1:06d}',
+                police_verification=True,
+                phone=self.phone(),
+                rating=Decimal(self.rng.uniform(3.5, 5.0)).quantize(Decimal('0.01')),
+                total_deliveries=0,
+                on_time_rate=Decimal(self.rng.uniform(75, 100)).quantize(Decimal('0.01')),
+            )
+            for i, user in enumerate(users)
+        ]
+        return [rider.pk for rider in self.bulk(Rider, riders)]
+    
+    # ---------- orders ----------
+    
+    def order_times(self, count):
+        """`count` sorted order timestamps over the last `days` days following the daily/weekly curves and growth"""
+        first_day = self.end_date - timedelta(days=self.days - 1)
+        days = [first_day + timedelta(days=offset) for offset in range(self.days)]
+        # Volume grows over the period (0.6x -> 1.4x)
+        day_weights = list(accumulate(
+            WEEKDAY_WEIGHTS[day.weekday()] * (0.6 + 0.8 * offset / max(1, self.days - 1))
+            for offset, day in enumerate(days)
+        ))
+        hour_weights = list(accumulate(HOUR_WEIGHTS))
+        picked_days = self.rng.choices(days, cum_weights=day_weights, k=count)
+        picked_hours = self.rng.choices(range(24), cum_weights=hour_weights, k=count)
+        stamps = sorted(
+            timezone.make_aware(datetime.combine(day, time(hour, self.rng.randrange(60), self.rng.randrange(60))), self.tz)
+            for day, hour in zip(picked_days, picked_hours)
+        )
+        if self.now == self.end_of_day:
+            return stamps
+        # The last day is not over yet: squeeze its orders into the hours already passed
+        day_start = timezone.make_aware(datetime.combine(self.end_date, time.min), self.tz)
+        elapsed = (self.now - day_start) / (self.end_of_day - day_start)
+        return [day_start + (stamp - day_start) * elapsed if stamp > day_start else stamp for stamp in stamps]
+    
+    def order_status(self, created_at):
+        age = self.now - created_at
+        roll = self.rng.random()
+        if age > timedelta(days=2):
+            return 'delivered' if roll < 0.9 else 'cancelled'
+        if roll < 0.35:
+            return 'pending'
+        if roll < 0.6:
+            return 'processing'
+        if roll < 0.75:
+            return 'shipped'
+        return 'delivered' if roll < 0.95 else 'cancelled'
+    
+    def create_orders(self, shops, inventory, customers, riders):
+        from .models import Order, OrderItem, RefundRequest
+        
+        shop_weights = zipf_cum_weights(len(shops), exponent=0.8)
+        shop_order = list(shops)
+        self.rng.shuffle(shop_order)
+        item_weights = zipf_cum_weights(self.products_per_shop)
+        item_counts, item_count_weights = [1, 2, 3, 4, 5, 6, 8, 10], list(accumulate([20, 22, 18, 13, 10, 7, 6, 4]))
+        reasons = [choice for choice, label in RefundRequest.REFUND_REASON_CHOICES]
+        charges = {'inside_dhaka': Decimal(60), 'outside_dhaka': Decimal(120)}
+        stamps = self.order_times(self.orders)
+        
+        orders = RowWriter(Order, [
+            'order_number', 'user', 'shop', 'status', 'total_amount', 'full_name', 'email', 'phone', 'address',
+            'delivery_location', 'delivery_charge', 'delivery_fee', 'rider', 'expected_delivery_time',
+            'actual_delivery_time', 'is_viewed', 'created_at', 'updated_at',
+        ])
+        items = RowWriter(OrderItem, ['order', 'shop_product', 'quantity', 'price'])
+        refunds = RowWriter(RefundRequest, [
+            'order', 'requested_by', 'reason', 'amount', 'is_approved', 'processed_at', 'created_at', 'updated_at',
+        ])
+        totals = {'orders': 0, 'items': 0, 'refunds': 0}
+        
+        for start in range(0, self.orders, self.batch_size):
+            batch_stamps = stamps[start:start + self.batch_size]
+            picked_shops = self.rng.choices(shop_order, cum_weights=shop_weights, k=len(batch_stamps))
+            for number, (created_at, shop) in enumerate(zip(batch_stamps, picked_shops), start + 1):
+                stock = inventory[shop.pk]
+                size = self.rng.choices(item_counts, cum_weights=item_count_weights)[0]
+                lines = {}
+                for pk, price in self.rng.choices(stock, cum_weights=item_weights[:len(stock)], k=size):
+                    quantity, price = lines.get(pk, (0, price))
+                    lines[pk] = (quantity + self.rng.choice((1, 1, 1, 2, 3)), price)
+                location = 'inside_dhaka' if self.rng.random() < 0.85 else 'outside_dhaka'
+                total = sum(quantity * price for quantity, price in lines.values()) + charges[location]
+                status = self.order_status(created_at)
+                user_id, full_name, email = self.rng.choice(customers)
+                delivered = status == 'delivered'
+                order_id = orders.add(
+                    f'{DEMO_PREFIX.upper()}{number:010d}', user_id, shop.pk, status, total, full_name, email,
+                    self.phone(), f"বাড়ি {self.rng.randint(1, 300)}, {shop.moholla.name}",
+                    location, charges[location], charges[location],
+                    self.rng.choice(riders) if status in ('shipped', 'delivered') else None,
+                    created_at + timedelta(hours=1),
+                    self.clamp(created_at + timedelta(minutes=self.rng.randint(25, 120))) if delivered else None,
+                    self.now - created_at > timedelta(hours=6) or self.rng.random() < 0.5,
+                    created_at, created_at,
+                )
+                for pk, (quantity, price) in lines.items():
+                    items.add(order_id, pk, quantity, price)
+                if delivered and self.rng.random() < 0.01:
+                    approved = self.rng.random() < 0.6
+                    requested_at = self.clamp(created_at + timedelta(hours=6))
+                    refunds.add(
+                        order_id, user_id, self.rng.choice(reasons),
+                        (total * Decimal(self.rng.uniform(0.05, 0.5))).quantize(Decimal('0.01')),
+                        approved, self.clamp(created_at + timedelta(days=1)) if approved else None, requested_at, requested_at,
+                    )
+            
+            with transaction.atomic():
+                totals['orders'] += orders.flush()
+                totals['items'] += items.flush()
+                totals['refunds'] += refunds.flush()
+            self.progress('orders', totals['orders'], self.orders)
+        return totals
+    
+    def reset_sequences(self):
+        """Move Postgres id sequences past the ids RowWriter assigned (SQLite's follow on their own)"""
+        from .models import MasterProduct, Order, OrderItem, RefundRequest, ShopProduct
+        
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [MasterProduct, ShopProduct, Order, OrderItem, RefundRequest]):
+                cursor.execute(sql)
+    
+    def update_rider_totals(self):
+        from django.db.models import Count
+        from .models import Order, Rider
+        
+        counts = Order.objects.filter(status='delivered', rider__isnull=False).order_by().values_list('rider').annotate(n=Count('id'))
+        riders = [Rider(pk=pk, total_deliveries=n) for pk, n in counts]
+        Rider.objects.bulk_update(riders, ['total_deliveries'], batch_size=500)
+    
+    def rebuild_rollups(self):
+        from .counters import rebuild_unviewed_counters
+        from .cubes import rebuild_sales_cubes
+        from .reports import rebuild_sales_reports
+        
+        start = self.end_date - timedelta(days=self.days - 1)
+        rebuild_unviewed_counters()
+        rebuild_sales_reports(start, self.end_date, chunk_days=31)
+        rebuild_sales_cubes(start, self.end_date)
+    
+    def generate(self, rollups=True):
+        """Create the dataset; returns {step: seconds} timings and row counts"""
+        timings = {}
+        
+        def step(name, function, *args):
+            started = clock.perf_counter()
+            result = function(*args)
+            timings[name] = clock.perf_counter() - started
+            self.progress(name, None, None)
+            return result
+        
+        mohollas = step('mohollas', self.create_mohollas)
+        shops = step('shops', self.create_shops, mohollas)
+        ranked = step('catalog', self.create_catalog)
+        inventory = step('inventory', self.create_inventory, shops, ranked)
+        customers = step('customers', self.create_customers, mohollas)
+        riders = step('riders', self.create_riders)
+        counts = step('orders', self.create_orders, shops, inventory, customers, riders)
+        self.reset_sequences()
+        step('rider totals', self.update_rider_totals)
+        if rollups:
+            step('rollups', self.rebuild_rollups)
+        return timings, counts
@@ -0,0 +1,70 @@
+"""
+Template fragment cache keyed on the rows a fragment shows
+
+A fragment's key is built from the model, pk and updated_at of every object
+it depends on (e.g. a product card: the ShopProduct and its MasterProduct),
+plus the active language. Editing any of them changes the key, so entries
+never need deleting and are kept without a timeout; superseded ones are left
+to the cache's eviction (LocMem MAX_ENTRIES, Redis maxmemory-policy).
+
+cached_fragments() renders a whole grid with one get_many() and one
+set_many() for the misses. Templates use the {% cachedfor %} and
+{% cachedfragment %} tags (templatetags/fragment_cache.py).
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import get_language
+
+FRAGMENT_CACHE_PREFIX = 'ezygrocery:fragment:'
+
+
+def fragment_timeout():
+    # None = no expiry; the keys change with the data
+    return getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', None)
+
+
+def _part(value):
+    meta = getattr(value, '_meta', None)
+    if meta is None:
+        return repr(value)
+    updated_at = getattr(value, 'updated_at', None)
+    stamp = updated_at.timestamp() if updated_at else ''
+    return f"{meta.label_lower}:{value.pk}:{stamp}"
+
+
+def fragment_key(name, *dependencies):
+    """Cache key of fragment `name` rendered from `dependencies` (model instances or plain values)"""
+    raw = '|'.join([get_language() or ''] + [_part(value) for value in dependencies])
+    return f"{FRAGMENT_CACHE_PREFIX}{name}:{hashlib.md5(raw.encode()).hexdigest()}"
+
+
+def cached_fragments(name, items, render, dependencies=None):
+    """
+    HTML of render(item) for every item, from the cache where possible.
+    
+    `dependencies(item)` lists what the fragment shows (default: the item
+    itself); related objects should be select_related() by the caller.
+    """
+    items = list(items)
+    dependencies = dependencies or (lambda item: (item,))
+    keys = [fragment_key(name, *dependencies(item)) for item in items]
+    found = cache.get_many(keys)
+    rendered = {}
+    for item, key in zip(items, keys):
+        if key not in found and key not in rendered:
+            rendered[key] = str(render(item))
+    if rendered:
+        cache.set_many(rendered, fragment_timeout())
+    return [found[key] if key in found else rendered[key] for key in keys]
+
+
+def cached_fragment(name, dependencies, render):
+    """HTML of render() for a single fragment depending on `dependencies`"""
+    key = fragment_key(name, *dependencies)
+    html = cache.get(key)
+    if html is None:
+        html = str(render())
+        cache.set(key, html, fragment_timeout())
+    return html
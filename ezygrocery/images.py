@@ -0,0 +1,307 @@
+"""
+Image derivatives: size presets in AVIF / WebP / JPEG (PNG for transparent images)
+
+Saving a model with an ImageField enqueues its files after commit; a
+background thread in the same process reads each original once, resizes it
+to every preset width (never upscaling) and encodes every format. Files are
+named after the original's content hash, the width and the settings version
+(derivatives/ab/ab12...-320-<version>.webp), so they are immutable, shared
+by identical uploads and safe to serve with a far-future expiry. The result
+is recorded in an ImageManifest row per original.
+
+Rendering never touches the storage: srcset(), picture_html() and the
+{% picture %} tag build URLs from the manifest, which is cached in-process
+(manifests never change for a name) and in the Django cache. Until an image
+has been processed they fall back to the original. Run
+`python manage.py generate_image_derivatives` to backfill existing uploads
+and after changing IMAGE_DERIVATIVES. Derivatives are not deleted with their
+originals; they may be shared.
+"""
+import hashlib
+import io
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.utils.html import format_html, format_html_join
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    # preset -> widths (1x, 2x) in pixels
+    'PRESETS': {
+        'thumb': (80, 160),
+        'card': (320, 640),
+        'detail': (800, 1600),
+        'banner': (1280, 1920),
+    },
+    # Modern formats, in order of preference; the <img> fallback is JPEG (PNG with transparency)
+    'FORMATS': ('avif', 'webp'),
+    'QUALITY': {'avif': 50, 'webp': 78, 'jpeg': 82, 'png': None},
+    'UPLOAD_TO': 'derivatives/',
+    # False: generate synchronously after commit instead of in a background thread
+    'BACKGROUND': True,
+}
+
+MIME_TYPES = {'avif': 'image/avif', 'webp': 'image/webp', 'jpeg': 'image/jpeg', 'png': 'image/png'}
+FALLBACK_FORMATS = ('jpeg', 'png')
+
+MANIFEST_CACHE_PREFIX = 'ezygrocery:imagemanifest:'
+MANIFEST_CACHE_TIMEOUT = 60 * 60 * 24
+# Cached "not generated yet"; re-checked after MISSING_TIMEOUT seconds
+MISSING = 0
+MISSING_TIMEOUT = 60
+MEMO_SIZE = 10000
+
+_memo = {}
+_queue = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def image_settings():
+    return {**DEFAULTS, **getattr(settings, 'IMAGE_DERIVATIVES', {})}
+
+
+def presets_version(config):
+    """Short hash of everything that changes the output files"""
+    raw = repr((sorted(config['PRESETS'].items()), tuple(config['FORMATS']), sorted(config['QUALITY'].items())))
+    return hashlib.md5(raw.encode()).hexdigest()[:8]
+
+
+def available_formats(config):
+    from PIL import features
+    return [image_format for image_format in config['FORMATS'] if features.check(image_format)]
+
+
+# ==================== GENERATION ====================
+
+def _prepare(image, image_format):
+    if image_format == 'jpeg' and image.mode != 'RGB':
+        from PIL import Image
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        rgba = image.convert('RGBA')
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        return background
+    if image.mode not in ('RGB', 'RGBA'):
+        return image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+    return image
+
+
+def _encode(image, width, image_format, quality):
+    from PIL import Image
+    
+    if width < image.width:
+        image = image.resize((width, round(image.height * width / image.width)), Image.Resampling.LANCZOS)
+    image = _prepare(image, image_format)
+    buffer = io.BytesIO()
+    options = {'optimize': True} if image_format in ('jpeg', 'png') else {}
+    if quality is not None:
+        options['quality'] = quality
+    if image_format == 'jpeg':
+        options['progressive'] = True
+    image.save(buffer, format=image_format.upper(), **options)
+    return buffer.getvalue(), image.size
+
+
+def generate_derivatives(name, storage=None, config=None):
+    """Create every preset/format of the stored image `name`; returns its ImageManifest"""
+    from PIL import Image, ImageOps
+    from .models import ImageManifest
+    
+    storage = storage or default_storage
+    config = config or image_settings()
+    version = presets_version(config)
+    with storage.open(name, 'rb') as handle:
+        content = handle.read()
+    content_hash = hashlib.sha256(content).hexdigest()
+    
+    image = ImageOps.exif_transpose(Image.open(io.BytesIO(content)))
+    image.load()
+    has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+    formats = available_formats(config) + ['png' if has_alpha else 'jpeg']
+    
+    encoded = {}
+    variants = {}
+    for preset, widths in config['PRESETS'].items():
+        # Never upscale: widths beyond the original collapse into the original width
+        widths = sorted({min(width, image.width) for width in widths})
+        variants[preset] = {}
+        for image_format in formats:
+            entries = []
+            for width in widths:
+                if (width, image_format) not in encoded:
+                    derivative = f"{config['UPLOAD_TO']}{content_hash[:2]}/{content_hash[:16]}-{width}-{version}.{image_format}"
+                    if storage.exists(derivative):
+                        height = round(image.height * width / image.width)
+                    else:
+                        data, (width, height) = _encode(image, width, image_format, config['QUALITY'].get(image_format))
+                        derivative = storage.save(derivative, ContentFile(data))
+                    encoded[(width, image_format)] = [derivative, width, height]
+                entries.append(encoded[(width, image_format)])
+            variants[preset][image_format] = entries
+    
+    defaults = {
+        'content_hash': content_hash, 'presets_version': version,
+        'width': image.width, 'height': image.height, 'variants': variants,
+    }
+    try:
+        manifest, created = ImageManifest.objects.update_or_create(source=name, defaults=defaults)
+    except IntegrityError:
+        # Another process recorded the same upload first
+        manifest = ImageManifest.objects.get(source=name)
+    cache.set(MANIFEST_CACHE_PREFIX + _key(name), manifest.variants, MANIFEST_CACHE_TIMEOUT)
+    return manifest
+
+
+def _process(names):
+    from .models import ImageManifest
+    
+    version = presets_version(image_settings())
+    done = set(ImageManifest.objects.filter(source__in=names, presets_version=version).values_list('source', flat=True))
+    for name in names:
+        if name in done:
+            continue
+        try:
+            generate_derivatives(name)
+        except Exception:
+            logger.exception("Image derivatives of %s could not be generated", name)
+
+
+def _work():
+    from django.db import connections
+    
+    while True:
+        names = [_queue.get()]
+        # Drain what arrived meanwhile so the manifest check is one query
+        while True:
+            try:
+                names.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            _process(list(dict.fromkeys(names)))
+        finally:
+            connections.close_all()
+
+
+def _start_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_work, name='image-derivatives', daemon=True)
+            _worker.start()
+
+
+def enqueue_files(files):
+    """Generate the derivatives of FieldFiles (or names) once the current transaction commits"""
+    config = image_settings()
+    if not config['ENABLED']:
+        return
+    names = [name for name in (getattr(file, 'name', file) for file in files) if name and name not in _memo]
+    if not names:
+        return
+    
+    def schedule():
+        if not config['BACKGROUND']:
+            _process(names)
+            return
+        for name in names:
+            _queue.put(name)
+        _start_worker()
+    
+    transaction.on_commit(schedule)
+
+
+# ==================== RENDERING ====================
+
+def _key(name):
+    return hashlib.md5(name.encode()).hexdigest()
+
+
+def load_manifests(names):
+    """{name: variants or None} from the in-process memo, then the cache, then one query"""
+    from .models import ImageManifest
+    
+    names = {name for name in names if name}
+    result = {name: _memo[name] for name in names if name in _memo}
+    keys = {MANIFEST_CACHE_PREFIX + _key(name): name for name in names - result.keys()}
+    for key, value in cache.get_many(keys).items():
+        result[keys[key]] = value or None
+    missing = names - result.keys()
+    if missing:
+        found = dict(ImageManifest.objects.filter(source__in=missing).values_list('source', 'variants'))
+        cache.set_many({MANIFEST_CACHE_PREFIX + _key(name): found[name] for name in found}, MANIFEST_CACHE_TIMEOUT)
+        cache.set_many({MANIFEST_CACHE_PREFIX + _key(name): MISSING for name in missing - found.keys()}, MISSING_TIMEOUT)
+        for name in missing:
+            result[name] = found.get(name)
+    if len(_memo) > MEMO_SIZE:
+        _memo.clear()
+    _memo.update({name: variants for name, variants in result.items() if variants})
+    return result
+
+
+def prefetch_derivatives(files):
+    """Load the manifests of many FieldFiles at once (changelists, product grids)"""
+    load_manifests(getattr(file, 'name', None) for file in files)
+
+
+def _variants(file):
+    name = getattr(file, 'name', None)
+    if not name:
+        return None
+    return load_manifests([name])[name]
+
+
+def _url(name):
+    from .seo import media_url
+    return media_url(name)
+
+
+def srcset(file, preset, image_format='webp'):
+    """'url 320w, url 640w' of a preset in one format; '' until generated"""
+    variants = (_variants(file) or {}).get(preset, {})
+    return ', '.join(f"{_url(name)} {width}w" for name, width, height in variants.get(image_format, []))
+
+
+def preset_url(file, preset):
+    """Smallest fallback-format (JPEG/PNG) file of a preset, or the original until generated"""
+    variants = (_variants(file) or {}).get(preset, {})
+    for image_format in FALLBACK_FORMATS:
+        if variants.get(image_format):
+            return _url(variants[image_format][0][0])
+    return _url(file.name) if file else ''
+
+
+def picture_html(file, preset, alt='', sizes=None, **attrs):
+    """<picture> with AVIF/WebP sources and a JPEG/PNG <img srcset>; a plain <img> until generated"""
+    if not file:
+        return ''
+    variants = (_variants(file) or {}).get(preset)
+    attributes = {'loading': 'lazy', 'decoding': 'async', **attrs}
+    if not variants:
+        return format_html(
+            '<img src="{}" alt="{}"{}>', _url(file.name), alt,
+            format_html_join('', ' {}="{}"', attributes.items()),
+        )
+    fallback = next(image_format for image_format in FALLBACK_FORMATS if variants.get(image_format))
+    name, width, height = variants[fallback][0]
+    sizes = sizes or f"{width}px"
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        (
+            (MIME_TYPES[image_format], srcset(file, preset, image_format), sizes)
+            for image_format in variants if image_format not in FALLBACK_FORMATS
+        ),
+    )
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" alt="{}"{}></picture>',
+        sources, _url(name), srcset(file, preset, fallback), sizes, width, height, alt,
+        format_html_join('', ' {}="{}"', attributes.items()),
+    )
@@ -0,0 +1,144 @@
+"""
+Non-blocking structured logging
+
+QueueLogHandler is the only handler the loggers write to. In the calling
+(request) thread it stamps the record with the current request id, applies
+INFO sampling and puts the record on a bounded in-memory queue without ever
+waiting; a QueueListener thread formats the records and does all file and
+console I/O. When the queue is full records are dropped and counted instead
+of blocking the worker.
+
+INFO-and-below records can be sampled with `info_sample_rate`; the decision
+is taken per request id, so a sampled request keeps all of its lines.
+
+Configure it in LOGGING with the '()' factory key, not 'class': from Python
+3.12 dictConfig treats a QueueHandler 'class' specially and rejects it.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import zlib
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from django.utils.module_loading import import_string
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+
+request_id = contextvars.ContextVar('request_id', default=None)
+
+# LogRecord attributes that are not user-supplied extras
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'request_id'}
+
+CONSOLE_FORMAT = '%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s'
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line"""
+    
+    def format(self, record):
+        data = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+            'pid': record.process,
+            'module': record.module,
+            'line': record.lineno,
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                data[key] = value if isinstance(value, (str, int, float, bool, type(None))) else str(value)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exception'] = record.exc_text
+        if record.stack_info:
+            data['stack'] = record.stack_info
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def _build_target(spec):
+    spec = dict(spec)
+    handler_class = spec.pop('class')
+    handler_class = import_string(handler_class) if isinstance(handler_class, str) else handler_class
+    level = spec.pop('level', logging.NOTSET)
+    log_format = spec.pop('format', 'json')
+    if spec.get('filename'):
+        os.makedirs(os.path.dirname(os.fspath(spec['filename'])), exist_ok=True)
+    handler = handler_class(**spec)
+    handler.setLevel(level)
+    handler.setFormatter(JSONFormatter() if log_format == 'json' else logging.Formatter(CONSOLE_FORMAT))
+    return handler
+
+
+class QueueLogHandler(QueueHandler):
+    """
+    Enqueue records for a background listener that writes them to `targets`.
+    
+    `targets` is a list of handler specs: {'class': ..., 'level': ...,
+    'format': 'json' | 'console', **handler kwargs}.
+    """
+    
+    def __init__(self, targets, queue_size=10000, info_sample_rate=1.0):
+        super().__init__(queue.Queue(queue_size))
+        self.targets = [_build_target(spec) for spec in targets]
+        self.info_sample_rate = float(info_sample_rate)
+        self.dropped = 0
+        self.addFilter(self._annotate)
+        self.listener = QueueListener(self.queue, *self.targets, respect_handler_level=True)
+        self.listener.start()
+        atexit.register(self.stop)
+        # A worker forked after logging was configured (gunicorn --preload) has no listener thread
+        os.register_at_fork(after_in_child=self._restart)
+    
+    def _annotate(self, record):
+        # django.request logs 4xx/5xx after the middleware chain has returned, with the request attached
+        current = request_id.get() or getattr(getattr(record, 'request', None), 'request_id', None)
+        record.request_id = current
+        if record.levelno > logging.INFO or self.info_sample_rate >= 1:
+            return True
+        if current:
+            return zlib.crc32(current.encode()) % 10000 < self.info_sample_rate * 10000
+        return random.random() < self.info_sample_rate
+    
+    def prepare(self, record):
+        # Merge args and render the traceback here; the record crosses a thread
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+    
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return
+        if self.dropped:
+            dropped, self.dropped = self.dropped, 0
+            notice = logging.makeLogRecord({
+                'name': __name__, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                'msg': f"{dropped} log records dropped (queue full)", 'request_id': None,
+            })
+            try:
+                self.queue.put_nowait(notice)
+            except queue.Full:
+                self.dropped += dropped
+    
+    def stop(self):
+        if self.listener._thread is not None:
+            self.listener.stop()
+    
+    def _restart(self):
+        self.queue = queue.Queue(self.queue.maxsize)
+        self.listener = QueueListener(self.queue, *self.targets, respect_handler_level=True)
+        self.listener.start()
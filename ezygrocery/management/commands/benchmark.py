@@ -0,0 +1,69 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+
+from ezygrocery.benchmarks import (
+    DEFAULT_MIN_DELTA_MS, DEFAULT_REPEAT, DEFAULT_THRESHOLD, compare_results, run_benchmarks, seed_dataset,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure queries and wall time of the admin changelists, context processors, cart summary and "
+        "aggregate model methods on seeded test databases; optionally compare with a baseline JSON file"
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help="Write the results as JSON to this file")
+        parser.add_argument('--compare', help="Baseline JSON file from an earlier run")
+        parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD * 100,
+                            help="Allowed median slowdown in percent (default %(default)s)")
+        parser.add_argument('--min-delta-ms', type=float, default=DEFAULT_MIN_DELTA_MS,
+                            help="Ignore slowdowns smaller than this (default %(default)s)")
+        parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help="Measured runs per case")
+        parser.add_argument('--only', help="Only run cases whose name contains this text")
+    
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError("--repeat must be at least 1")
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare'], encoding='utf-8') as handle:
+                    baseline = json.load(handle)
+            except (OSError, ValueError) as error:
+                raise CommandError(f"Cannot read baseline {options['compare']}: {error}")
+        
+        def progress(name, result):
+            if 'error' in result:
+                self.stdout.write(self.style.ERROR(f"{name:<55} {result['error']}"))
+            else:
+                self.stdout.write(f"{name:<55} {result['queries']:>5} q {result['median_ms']:>9.2f} ms")
+        
+        # Never touch the configured databases: seed and measure in throwaway test databases.
+        # Every alias gets one; replicas and the analytics database mirror the test 'default'
+        # (TEST MIRROR), as under manage.py test
+        setup_test_environment(debug=False)
+        old_config = setup_databases(verbosity=0, interactive=False, serialized_aliases=set())
+        try:
+            self.stdout.write("Seeding benchmark dataset...")
+            user = seed_dataset()
+            results = run_benchmarks(user, repeat=options['repeat'], only=options['only'], progress=progress)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+        
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as handle:
+                json.dump(results, handle, indent=2, ensure_ascii=False)
+            self.stdout.write(f"Results written to {options['output']}")
+        
+        if baseline is not None:
+            rows = compare_results(baseline, results, options['threshold'] / 100, options['min_delta_ms'])
+            failed = [(name, regressions) for name, before, now, regressions in rows if regressions]
+            for name, regressions in failed:
+                self.stdout.write(self.style.ERROR(f"REGRESSION {name}: {'; '.join(regressions)}"))
+            if failed:
+                raise CommandError(f"{len(failed)} of {len(rows)} benchmark cases regressed against {options['compare']}")
+            self.stdout.write(self.style.SUCCESS(f"✅ No regressions in {len(rows)} cases against {options['compare']}"))
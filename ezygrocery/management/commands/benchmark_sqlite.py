@@ -0,0 +1,36 @@
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ezygrocery.benchmarks import run_sqlite_concurrency, sqlite_profiles
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent readers and writers on a scratch SQLite file, once with the stock rollback-journal "
+        "setup and once with the configured DATABASES profile (WAL, pragmas, BEGIN IMMEDIATE)"
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=5, help="Duration of each run")
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--path', help="Scratch database file (default: a temporary directory)")
+    
+    def handle(self, *args, **options):
+        if options['readers'] < 1 or options['writers'] < 1:
+            raise CommandError("--readers and --writers must be at least 1")
+        with tempfile.TemporaryDirectory() as directory:
+            path = options['path'] or os.path.join(directory, 'concurrency.sqlite3')
+            for name, profile in sqlite_profiles().items():
+                self.stdout.write(f"{name}: {profile['PRAGMAS']} {profile['OPTIONS']}")
+                result = run_sqlite_concurrency(
+                    path, profile, options['seconds'], options['readers'], options['writers'],
+                )
+                for kind, row in result.items():
+                    line = (
+                        f"  {kind:<6} {row['count']:>8} ok {row['per_second']:>9.1f}/s {row['errors']:>6} locked   "
+                        f"p50 {row['p50_ms']:>8.2f} ms  p99 {row['p99_ms']:>8.2f} ms  max {row['max_ms']:>8.2f} ms"
+                    )
+                    self.stdout.write(self.style.ERROR(line) if row['errors'] else line)
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ezygrocery.sitemaps import SECTIONS, build_sitemaps, sitemap_settings
+
+
+class Command(BaseCommand):
+    help = "Write the gzipped sitemap shards and sitemap.xml (run after deploys and bulk imports)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('sections', nargs='*', help=f"Sections to rebuild (default: all): {', '.join(SECTIONS)}")
+
+    def handle(self, *args, **options):
+        unknown = set(options['sections']) - set(SECTIONS)
+        if unknown:
+            raise CommandError(f"Unknown sections: {', '.join(sorted(unknown))}")
+
+        def progress(name, count):
+            self.stdout.write(f"  {name}: {count} URLs")
+
+        counts = build_sitemaps(options['sections'] or None, progress=progress)
+        root = sitemap_settings()['ROOT']
+        self.stdout.write(self.style.SUCCESS(f"✅ {sum(counts.values())} URLs written to {root}"))
@@ -0,0 +1,63 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from ezygrocery.demo_data import BATCH_SIZE, DemoDataGenerator, demo_data_exists
+
+
+class Command(BaseCommand):
+    help = "Generate a deterministic synthetic dataset (shops, catalog, customers, orders) for load testing"
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--shops', type=int, default=50)
+        parser.add_argument('--products', type=int, default=5000, help="Master catalog size")
+        parser.add_argument('--orders', type=int, default=100000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--customers', type=int, help="Defaults to one customer per 20 orders")
+        parser.add_argument('--riders', type=int, help="Defaults to one rider per 5 shops")
+        parser.add_argument('--products-per-shop', type=int, default=300)
+        parser.add_argument('--days', type=int, default=365, help="Spread orders over this many days")
+        parser.add_argument('--end', type=date.fromisoformat, help="Last order day (YYYY-MM-DD); defaults to today")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--skip-rollups', action='store_true', help="Do not rebuild counters, reports and cubes (the slowest step; run the rebuild commands later)")
+    
+    def handle(self, *args, **options):
+        for name in ('shops', 'products', 'orders', 'days', 'products_per_shop', 'batch_size'):
+            if options[name] < 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be at least 1")
+        if options['end'] and options['end'] > timezone.localdate():
+            raise CommandError("--end cannot be in the future")
+        if demo_data_exists():
+            raise CommandError("Demo data already exists; run `manage.py flush` first for a reproducible dataset.")
+        
+        def progress(step, done, total):
+            if done is None:
+                self.stdout.write(f"  {step} ✓")
+            elif options['verbosity'] > 1 or (step == 'orders' and done % (options['batch_size'] * 50) < options['batch_size']):
+                self.stdout.write(f"  {step}: {done}/{total}")
+        
+        generator = DemoDataGenerator(
+            shops=options['shops'],
+            products=options['products'],
+            orders=options['orders'],
+            seed=options['seed'],
+            days=options['days'],
+            end_date=options['end'],
+            products_per_shop=options['products_per_shop'],
+            customers=options['customers'],
+            riders=options['riders'],
+            batch_size=options['batch_size'],
+            progress=progress,
+        )
+        started = time.perf_counter()
+        timings, counts = generator.generate(rollups=not options['skip_rollups'])
+        elapsed = time.perf_counter() - started
+        
+        for step, seconds in timings.items():
+            self.stdout.write(f"{step:>14}: {seconds:.1f}s")
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {counts['orders']} orders, {counts['items']} items, {counts['refunds']} refunds in {elapsed:.1f}s "
+            f"({counts['orders'] / timings['orders']:.0f} orders/s)"
+        ))
@@ -0,0 +1,34 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import models
+
+from ezygrocery.images import generate_derivatives, image_settings, presets_version
+from ezygrocery.models import ImageManifest
+
+
+class Command(BaseCommand):
+    help = "Generate the size presets and WebP/AVIF variants of uploaded images that have none (or outdated ones)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Regenerate images that are already up to date")
+
+    def handle(self, *args, **options):
+        names = set()
+        for model in apps.get_app_config('ezygrocery').get_models():
+            fields = [field.name for field in model._meta.fields if isinstance(field, models.ImageField)]
+            for field in fields:
+                names.update(model._base_manager.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True}).values_list(field, flat=True))
+
+        if not options['force']:
+            version = presets_version(image_settings())
+            names -= set(ImageManifest.objects.filter(presets_version=version).values_list('source', flat=True))
+
+        generated = failed = 0
+        for name in sorted(names):
+            try:
+                generate_derivatives(name)
+                generated += 1
+            except Exception as error:
+                failed += 1
+                self.stderr.write(f"  {name}: {error}")
+        self.stdout.write(self.style.SUCCESS(f"✅ {generated} images processed, {failed} failed"))
@@ -0,0 +1,66 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ezygrocery.catalog import (
+    IMPORT_BATCH_SIZE, REQUIRED_FIELDS, CatalogImporter, RejectsFile, detect_format, read_rows,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Import MasterProducts from a CSV or JSON-lines supplier file, upserting by SKU in batches. "
+        f"Required columns: {', '.join(REQUIRED_FIELDS)}. Rejected rows are written to a rejects file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or JSON-lines (.jsonl) file")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="File format; detected from the extension by default")
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE, help="Rows per bulk upsert")
+        parser.add_argument('--rejects', help="Where to write rejected rows; defaults to <path>.rejects.<ext>")
+        parser.add_argument('--no-create-categories', action='store_true', help="Reject rows with unknown categories instead of creating them")
+        parser.add_argument('--dry-run', action='store_true', help="Validate and count without writing products or categories")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f"File not found: {path}")
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1")
+        file_format = options['format'] or detect_format(path)
+        rejects_path = options['rejects'] or f"{path}.rejects.{file_format}"
+
+        rejects = RejectsFile(rejects_path, file_format)
+        started = time.perf_counter()
+
+        def on_batch(stats):
+            if options['verbosity'] > 1:
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f"{stats['read']} rows read, {stats['read'] / elapsed:,.0f} rows/s")
+
+        importer = CatalogImporter(
+            batch_size=options['batch_size'],
+            create_categories=not options['no_create_categories'],
+            dry_run=options['dry_run'],
+            on_reject=rejects.write,
+            on_batch=on_batch,
+        )
+        try:
+            with open(path, newline='', encoding='utf-8-sig') as handle:
+                for number, row in read_rows(handle, file_format):
+                    importer.feed(number, row)
+            stats = importer.finish()
+        finally:
+            rejects.close()
+
+        elapsed = time.perf_counter() - started
+        rate = stats['read'] / elapsed if elapsed else 0
+        prefix = "[dry run] " if options['dry_run'] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {prefix}{stats['read']} rows in {elapsed:.1f}s ({rate:,.0f} rows/s): "
+            f"{stats['created']} created, {stats['updated']} updated, {stats['rejected']} rejected, "
+            f"{stats['duplicates']} duplicate SKUs, {stats['categories_created']} new categories"
+        ))
+        if stats['rejected']:
+            self.stdout.write(self.style.WARNING(f"Rejected rows written to {rejects_path}"))
@@ -0,0 +1,104 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Sum
+
+from ezygrocery.models import Order
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Show query plans and timings for the Order changelist and report queries, "
+        "with the Order indexes (after) and optionally without them (before). "
+        "Run against a database populated with a realistic order volume."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--compare', action='store_true', help="Also measure with the Order indexes dropped (rolled back afterwards)")
+        parser.add_argument('--repeat', type=int, default=5, help="Executions per query; the best time is reported")
+        parser.add_argument('--analyze', action='store_true', help="Use EXPLAIN ANALYZE where the database supports it")
+
+    def get_queries(self):
+        sample = Order.objects.order_by().values('shop_id', 'user_id', 'created_at').first()
+        if sample is None:
+            return []
+        shop_id, user_id, created_at = sample['shop_id'], sample['user_id'], sample['created_at']
+        page = slice(0, 100)
+        return [
+            ("changelist: default page", Order.objects.select_related('shop')[page]),
+            ("changelist: count", Order.objects.all()),
+            ("changelist: shop + status", Order.objects.filter(shop_id=shop_id, status='pending')[page]),
+            ("changelist: status", Order.objects.filter(status='processing')[page]),
+            ("changelist: unviewed", Order.objects.filter(is_viewed=False)[page]),
+            ("changelist: created_at range", Order.objects.filter(created_at__date=created_at.date())[page]),
+            ("customer history", Order.objects.filter(user_id=user_id)[:20]),
+            ("report: Shop.total_sales", Order.objects.filter(shop_id=shop_id, status='delivered').order_by()),
+        ]
+
+    def run_query(self, label, queryset):
+        if label == "changelist: count":
+            return queryset.count()
+        if label.startswith("report:"):
+            return queryset.aggregate(total=Sum('total_amount'))['total']
+        return len(queryset)
+
+    def measure(self, title, options):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n=== {title} ({connection.vendor}) ==="))
+        results = {}
+        for label, queryset in self.get_queries():
+            if label == "changelist: count":
+                plan_qs = queryset.order_by()
+            elif label.startswith("report:"):
+                plan_qs = queryset.values('shop_id').annotate(total=Sum('total_amount'))
+            else:
+                plan_qs = queryset
+            explain_options = {'analyze': True} if options['analyze'] and connection.vendor == 'postgresql' else {}
+            plan = plan_qs.explain(**explain_options)
+
+            best = None
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                self.run_query(label, queryset.all())
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            results[label] = best
+
+            self.stdout.write(self.style.SUCCESS(f"\n{label}: {best * 1000:.2f} ms"))
+            for line in plan.splitlines():
+                self.stdout.write(f"    {line}")
+        return results
+
+    def handle(self, *args, **options):
+        total = Order.objects.count()
+        if not total:
+            self.stdout.write(self.style.WARNING("No orders found; populate the database first."))
+            return
+        self.stdout.write(f"Orders: {total}")
+
+        before = None
+        if options['compare']:
+            try:
+                with transaction.atomic():
+                    # Plain DROP INDEX: SQLite's schema editor refuses to run inside
+                    # an atomic block, and SQLite/PostgreSQL both roll DDL back.
+                    with connection.cursor() as cursor:
+                        for index in Order._meta.indexes:
+                            cursor.execute(f"DROP INDEX {connection.ops.quote_name(index.name)}")
+                    before = self.measure("without Order indexes (before)", options)
+                    raise Rollback
+            except Rollback:
+                pass
+
+        after = self.measure("with Order indexes (after)", options)
+
+        if before:
+            self.stdout.write(self.style.MIGRATE_HEADING("\n=== Summary ==="))
+            for label, after_time in after.items():
+                before_time = before[label]
+                speedup = before_time / after_time if after_time else float('inf')
+                self.stdout.write(f"{label:32} {before_time * 1000:9.2f} ms -> {after_time * 1000:9.2f} ms  ({speedup:.1f}x)")
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from ezygrocery.counters import rebuild_unviewed_counters
+
+
+class Command(BaseCommand):
+    help = "Recount unviewed orders per shop for the admin new-orders badge"
+
+    def handle(self, *args, **options):
+        per_shop = rebuild_unviewed_counters()
+        total = sum(per_shop.values())
+        self.stdout.write(self.style.SUCCESS(f"✅ {total} unviewed orders across {len(per_shop)} shops"))
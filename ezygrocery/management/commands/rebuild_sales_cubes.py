@@ -0,0 +1,40 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from ezygrocery.cubes import rebuild_sales_cubes
+from ezygrocery.models import Order
+
+
+class Command(BaseCommand):
+    help = "Rebuild SalesCube cells (hour, day, week, month) from delivered orders (idempotent)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, help="First day (YYYY-MM-DD); defaults to the oldest order")
+        parser.add_argument('--end', type=date.fromisoformat, help="Last day (YYYY-MM-DD); defaults to the newest order")
+        parser.add_argument('--chunk-days', type=int, default=7, help="Days of hour and day cells built per pass")
+
+    def handle(self, *args, **options):
+        if options['chunk_days'] < 1:
+            raise CommandError("--chunk-days must be at least 1")
+
+        bounds = Order.objects.filter(status='delivered').aggregate(first=Min('created_at'), last=Max('created_at'))
+        if bounds['first'] is None and not (options['start'] and options['end']):
+            self.stdout.write(self.style.WARNING("No delivered orders found."))
+            return
+        start = options['start'] or timezone.localdate(bounds['first'])
+        end = options['end'] or timezone.localdate(bounds['last'])
+        if start > end:
+            raise CommandError("--start must not be after --end")
+
+        def progress(granularity, period_start, written):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"{granularity} {timezone.localtime(period_start):%Y-%m-%d}: {written} cells")
+
+        started = time.perf_counter()
+        total = rebuild_sales_cubes(start, end, chunk_days=options['chunk_days'], progress=progress)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"✅ {total} cube cells for {start} - {end} in {elapsed:.1f}s"))
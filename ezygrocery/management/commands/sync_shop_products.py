@@ -0,0 +1,88 @@
+import csv
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from ezygrocery.catalog import SYNC_BATCH_SIZE, SYNC_FIELDS, SYNC_KEYS, RejectsFile, ShopProductSync, detect_format, read_rows
+from ezygrocery.models import Shop
+
+
+class Command(BaseCommand):
+    help = (
+        "Sync a shop's prices and stock from its POS export (CSV or JSON lines). Rows are matched by "
+        f"{', '.join(SYNC_KEYS)} and may carry any of {', '.join(SYNC_FIELDS)}; empty cells are left unchanged. "
+        "Only products whose values changed are written."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('shop', help="Shop id or slug")
+        parser.add_argument('path', help="CSV or JSON-lines (.jsonl) file")
+        parser.add_argument('--key', choices=['auto', *SYNC_KEYS], default='auto', help="Column used to match products; auto uses the first of shop_sku, sku, barcode that matches")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="File format; detected from the extension by default")
+        parser.add_argument('--batch-size', type=int, default=SYNC_BATCH_SIZE, help="Changed products per bulk_update")
+        parser.add_argument('--dry-run', action='store_true', help="Report the differences without writing them")
+        parser.add_argument('--report', help="Where to write the diff report; defaults to <path>.diff.csv")
+        parser.add_argument('--rejects', help="Where to write rejected rows; defaults to <path>.rejects.<ext>")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f"File not found: {path}")
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1")
+        lookup = Q(slug=options['shop'])
+        if options['shop'].isdigit():
+            lookup |= Q(pk=int(options['shop']))
+        shop = Shop.objects.filter(lookup).first()
+        if shop is None:
+            raise CommandError(f"Shop not found: {options['shop']}")
+
+        file_format = options['format'] or detect_format(path)
+        rejects = RejectsFile(options['rejects'] or f"{path}.rejects.{file_format}", file_format)
+        report_path = options['report'] or f"{path}.diff.csv"
+        report_file = open(report_path, 'w', newline='', encoding='utf-8')
+        report = csv.writer(report_file)
+        report.writerow(['line', 'key', 'product', 'field', 'old', 'new'])
+
+        def on_change(number, key, name, changes):
+            for field, (old, new) in changes.items():
+                report.writerow([number, key, name, field, '' if old is None else old, '' if new is None else new])
+
+        started = time.perf_counter()
+
+        def on_batch(stats):
+            if options['verbosity'] > 1:
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f"{stats['read']} rows read, {stats['updated']} products updated, {stats['read'] / elapsed:,.0f} rows/s")
+
+        sync = ShopProductSync(
+            shop,
+            key=options['key'],
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+            on_reject=rejects.write,
+            on_change=on_change,
+            on_batch=on_batch,
+        )
+        try:
+            with open(path, newline='', encoding='utf-8-sig') as handle:
+                for number, row in read_rows(handle, file_format):
+                    sync.feed(number, row)
+            stats = sync.finish()
+        finally:
+            rejects.close()
+            report_file.close()
+
+        elapsed = time.perf_counter() - started
+        rate = stats['read'] / elapsed if elapsed else 0
+        prefix = "[dry run] " if options['dry_run'] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {prefix}{shop.name}: {stats['read']} rows in {elapsed:.1f}s ({rate:,.0f} rows/s): "
+            f"{stats['matched']} matched, {stats['changed']} changed, {stats['unchanged']} unchanged, "
+            f"{stats['rejected']} rejected, {stats['updated']} products {'to update' if options['dry_run'] else 'updated'}"
+        ))
+        self.stdout.write(f"Differences written to {report_path}")
+        if stats['rejected']:
+            self.stdout.write(self.style.WARNING(f"Rejected rows written to {rejects.path}"))
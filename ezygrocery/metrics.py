@@ -0,0 +1,295 @@
+"""
+Prometheus-style application metrics
+
+Counters and histograms live in plain dicts in each process; recording one
+is a dict update under a lock. Every FLUSH_INTERVAL seconds (and before a
+scrape) the process writes its complete state to <DIR>/<pid>-<start>.json,
+and /metrics sums the files of all processes, so every gunicorn worker is
+covered whichever one answers the scrape. Like Prometheus' own multiprocess
+mode, the directory should be emptied when the service (re)starts.
+
+Request latency and counts come from MetricsMiddleware, DB queries from the
+SQL profiler's per-request profile, cache hits/misses from the instrumented
+cache backends (see instrument_caches()), and context processor timings
+from the @timed_processor decorator.
+"""
+import hmac
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from pathlib import Path
+
+from django.conf import settings
+
+DEFAULTS = {
+    'ENABLED': True,
+    # Shared directory for the per-process files; empty = this process only
+    'DIR': '',
+    # Scrapes need "Authorization: Bearer <TOKEN>"; with DEBUG on, these addresses
+    # are let in without it (behind a proxy every request comes from the proxy)
+    'ALLOWED_IPS': ['127.0.0.1', '::1'],
+    'TOKEN': '',
+    'FLUSH_INTERVAL': 5,
+}
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+
+_lock = threading.Lock()
+_started = time.time_ns()
+_flushed_at = time.monotonic()
+
+REGISTRY = {}
+
+
+def metrics_settings():
+    return {**DEFAULTS, **getattr(settings, 'METRICS', {})}
+
+
+class Counter:
+    kind = 'counter'
+    
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.values = {}
+        REGISTRY[name] = self
+    
+    def inc(self, *labels, amount=1):
+        with _lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+
+class Histogram:
+    kind = 'histogram'
+    
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        # labels -> per-bucket counts (the last one is +Inf), then sum
+        self.values = {}
+        REGISTRY[name] = self
+    
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with _lock:
+            state = self.values.get(labels)
+            if state is None:
+                state = self.values[labels] = [0] * (len(self.buckets) + 2)
+            state[index] += 1
+            state[-1] += value
+
+
+REQUEST_LATENCY = Histogram(
+    'ezygrocery_http_request_duration_seconds', "Request latency by URL name", ('view', 'method'),
+)
+REQUESTS = Counter('ezygrocery_http_requests_total', "Requests by URL name and status class", ('view', 'method', 'status'))
+DB_QUERIES = Counter('ezygrocery_db_queries_total', "Database queries by URL name", ('view',))
+DB_TIME = Counter('ezygrocery_db_query_seconds_total', "Time spent in database queries by URL name", ('view',))
+CACHE_REQUESTS = Counter('ezygrocery_cache_requests_total', "Cache lookups per cache alias and result", ('alias', 'result'))
+CONTEXT_PROCESSOR_LATENCY = Histogram(
+    'ezygrocery_context_processor_duration_seconds', "Context processor run time", ('processor',), FAST_BUCKETS,
+)
+ORDERS_PLACED = Counter('ezygrocery_orders_placed_total', "Orders created", ('delivery_location',))
+STOCK_FAILURES = Counter(
+    'ezygrocery_stock_adjustment_failures_total', "Stock changes that could not be applied in full", ('reason',),
+)
+
+
+# ---------- recording helpers ----------
+
+def record_request(request, response, duration):
+    match = getattr(request, 'resolver_match', None)
+    view = match.view_name if match else 'unresolved'
+    REQUEST_LATENCY.observe(duration, view, request.method)
+    REQUESTS.inc(view, request.method, f"{response.status_code // 100}xx")
+    profile = getattr(request, 'sql_profile', None)
+    if profile is not None:
+        DB_QUERIES.inc(view, amount=profile.count)
+        DB_TIME.inc(view, amount=profile.db_time)
+
+
+def timed_processor(processor):
+    """Context processor decorator recording its run time"""
+    @wraps(processor)
+    def wrapper(request):
+        started = time.perf_counter()
+        try:
+            return processor(request)
+        finally:
+            CONTEXT_PROCESSOR_LATENCY.observe(time.perf_counter() - started, processor.__name__)
+    return wrapper
+
+
+_MISSING = object()
+
+
+def instrument_caches():
+    """Count hits and misses of every configured cache alias (called from AppConfig.ready)"""
+    from django.core.cache import caches
+    from django.core.cache.backends.base import BaseCache
+    
+    if getattr(caches, 'metrics_instrumented', False):
+        return
+    create_connection = caches.create_connection
+    
+    def create_instrumented(alias):
+        backend = create_connection(alias)
+        backend.metrics_alias = alias
+        _instrument_backend(type(backend), BaseCache)
+        return backend
+    
+    caches.create_connection = create_instrumented
+    caches.metrics_instrumented = True
+
+
+def _instrument_backend(backend_class, base_class):
+    if backend_class.__dict__.get('metrics_instrumented'):
+        return
+    get = backend_class.get
+    
+    def instrumented_get(self, key, default=None, *args, **kwargs):
+        value = get(self, key, _MISSING, *args, **kwargs)
+        alias = getattr(self, 'metrics_alias', 'default')
+        if value is _MISSING:
+            CACHE_REQUESTS.inc(alias, 'miss')
+            return default
+        CACHE_REQUESTS.inc(alias, 'hit')
+        return value
+    
+    backend_class.get = instrumented_get
+    # BaseCache.get_many() goes through get() and is already counted there
+    if backend_class.get_many is not base_class.get_many:
+        get_many = backend_class.get_many
+        
+        def instrumented_get_many(self, keys, *args, **kwargs):
+            keys = list(keys)
+            found = get_many(self, keys, *args, **kwargs)
+            alias = getattr(self, 'metrics_alias', 'default')
+            CACHE_REQUESTS.inc(alias, 'hit', amount=len(found))
+            CACHE_REQUESTS.inc(alias, 'miss', amount=len(keys) - len(found))
+            return found
+        
+        backend_class.get_many = instrumented_get_many
+    backend_class.metrics_instrumented = True
+
+
+# ---------- multiprocess files ----------
+
+def snapshot():
+    """This process's values as JSON-ready data"""
+    with _lock:
+        return {
+            name: [[list(labels), list(value) if isinstance(value, list) else value] for labels, value in metric.values.items()]
+            for name, metric in REGISTRY.items()
+        }
+
+
+def _snapshot_path(directory):
+    return Path(directory) / f"{os.getpid()}-{_started}.json"
+
+
+def write_snapshot():
+    global _flushed_at
+    directory = metrics_settings()['DIR']
+    _flushed_at = time.monotonic()
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    path = _snapshot_path(directory)
+    temporary = path.with_suffix('.tmp')
+    temporary.write_text(json.dumps(snapshot()))
+    os.replace(temporary, path)
+
+
+def maybe_write_snapshot(interval):
+    if time.monotonic() - _flushed_at >= interval:
+        write_snapshot()
+
+
+def collect():
+    """{metric name: {labels: value}} summed over every process"""
+    directory = metrics_settings()['DIR']
+    write_snapshot()
+    if directory:
+        snapshots = []
+        for path in Path(directory).glob('*.json'):
+            try:
+                snapshots.append(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                continue
+    else:
+        snapshots = [snapshot()]
+    
+    totals = {name: {} for name in REGISTRY}
+    for data in snapshots:
+        for name, rows in data.items():
+            if name not in totals:
+                continue
+            values = totals[name]
+            for labels, value in rows:
+                labels = tuple(labels)
+                if isinstance(value, list):
+                    current = values.get(labels)
+                    values[labels] = value if current is None else [a + b for a, b in zip(current, value)]
+                else:
+                    values[labels] = values.get(labels, 0) + value
+    return totals
+
+
+# ---------- exposition ----------
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def render(totals):
+    """Prometheus text exposition format (version 0.0.4)"""
+    lines = []
+    for name, metric in REGISTRY.items():
+        lines.append(f"# HELP {name} {metric.documentation}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        for labels, value in sorted(totals.get(name, {}).items()):
+            if metric.kind == 'counter':
+                lines.append(f"{name}{_labels(metric.labels, labels)} {_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(metric.buckets + ('+Inf',), value[:-1]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(metric.labels, labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_sum{_labels(metric.labels, labels)} {_number(value[-1])}")
+            lines.append(f"{name}_count{_labels(metric.labels, labels)} {cumulative}")
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """GET /metrics for Prometheus; the bearer token only (or local addresses with DEBUG on)"""
+    from django.http import HttpResponse, HttpResponseForbidden
+    
+    config = metrics_settings()
+    token = request.headers.get('Authorization', '')
+    allowed = (settings.DEBUG and request.META.get('REMOTE_ADDR') in config['ALLOWED_IPS']) or (
+        config['TOKEN'] and hmac.compare_digest(token, f"Bearer {config['TOKEN']}")
+    )
+    if not allowed:
+        return HttpResponseForbidden("Forbidden")
+    return HttpResponse(render(collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,166 @@
+"""
+Middleware for ezygrocery app
+"""
+import re
+import time
+import uuid
+from contextlib import ExitStack
+
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+_REQUEST_ID = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+
+class RequestIDMiddleware:
+    """Tag every log record of a request with its X-Request-ID (taken from the proxy or generated)"""
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        from .log import REQUEST_ID_HEADER, request_id
+        
+        incoming = request.headers.get(REQUEST_ID_HEADER, '')
+        request.request_id = incoming if _REQUEST_ID.match(incoming) else uuid.uuid4().hex
+        token = request_id.set(request.request_id)
+        try:
+            response = self.get_response(request)
+        finally:
+            request_id.reset(token)
+        response.headers[REQUEST_ID_HEADER] = request.request_id
+        return response
+
+
+class DatabasePinningMiddleware:
+    """
+    Read-your-writes with read replicas (see ezygrocery.routers): unsafe
+    requests read from the primary, and a request that wrote pins the client
+    to the primary for DATABASE_PIN_SECONDS with a cookie, covering the
+    replication lag for the redirect and the pages after it.
+    """
+    
+    def __init__(self, get_response):
+        from django.conf import settings
+        
+        self.get_response = get_response
+        if not getattr(settings, 'DATABASE_REPLICAS', []):
+            raise MiddlewareNotUsed
+        self.pin_seconds = getattr(settings, 'DATABASE_PIN_SECONDS', 15)
+    
+    def __call__(self, request):
+        from .routers import PIN_COOKIE, pinned, wrote
+        
+        pin = request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE') or PIN_COOKIE in request.COOKIES
+        pinned_token, wrote_token = pinned.set(pin), wrote.set(False)
+        try:
+            response = self.get_response(request)
+            written = wrote.get()
+        finally:
+            pinned.reset(pinned_token)
+            wrote.reset(wrote_token)
+        if written:
+            response.set_cookie(PIN_COOKIE, '1', max_age=self.pin_seconds, httponly=True, samesite='Lax')
+        return response
+
+
+class PageCacheMiddleware:
+    """
+    Serve and store whole pages for anonymous visitors (see ezygrocery.page_cache).
+    Must come before SessionMiddleware and CsrfViewMiddleware so it sees their cookies.
+    """
+    
+    def __init__(self, get_response):
+        from .page_cache import page_cache_settings
+        
+        self.get_response = get_response
+        self.config = page_cache_settings()
+        if not self.config['ENABLED']:
+            raise MiddlewareNotUsed
+    
+    def __call__(self, request):
+        from .page_cache import cached_response, is_cacheable_request, is_cacheable_response, page_key, store_response
+        
+        if not is_cacheable_request(request, self.config):
+            return self.get_response(request)
+        key = page_key(request, self.config)
+        response = cached_response(request, key)
+        if response is not None:
+            return response
+        started = time.time_ns()
+        response = self.get_response(request)
+        if is_cacheable_response(request, response):
+            return store_response(request, response, key, started, self.config)
+        return response
+
+
+class SessionRefreshMiddleware:
+    """
+    Sliding session expiry without a write on every request: an unchanged
+    session is saved again only once SESSION_REFRESH_INTERVAL has passed since
+    its last save. Must come after SessionMiddleware.
+    """
+    
+    REFRESHED_KEY = '_refreshed_at'
+    
+    def __init__(self, get_response):
+        from django.conf import settings
+        
+        self.get_response = get_response
+        self.interval = getattr(settings, 'SESSION_REFRESH_INTERVAL', 86400)
+    
+    def __call__(self, request):
+        response = self.get_response(request)
+        session = getattr(request, 'session', None)
+        # Only sessions the view already loaded; never load one just to refresh it
+        if session is None or not session.accessed or session.is_empty():
+            return response
+        now = int(time.time())
+        if session.modified or now - session.get(self.REFRESHED_KEY, 0) >= self.interval:
+            # Marks the session modified, so SessionMiddleware saves it and renews the cookie
+            session[self.REFRESHED_KEY] = now
+        return response
+
+
+class MetricsMiddleware:
+    """Request latency/count metrics per URL name, plus the DB totals of the SQL profiler (see ezygrocery.metrics)"""
+    
+    def __init__(self, get_response):
+        from .metrics import metrics_settings
+        
+        self.get_response = get_response
+        self.config = metrics_settings()
+        if not self.config['ENABLED']:
+            raise MiddlewareNotUsed
+    
+    def __call__(self, request):
+        from .metrics import maybe_write_snapshot, record_request
+        
+        started = time.perf_counter()
+        response = self.get_response(request)
+        record_request(request, response, time.perf_counter() - started)
+        maybe_write_snapshot(self.config['FLUSH_INTERVAL'])
+        return response
+
+
+class SQLProfilerMiddleware:
+    """Count queries and DB time of every request and sample slow / N+1 requests (see ezygrocery.profiling)"""
+    
+    def __init__(self, get_response):
+        from .profiling import profiler_settings
+        
+        self.get_response = get_response
+        self.config = profiler_settings()
+        if not self.config['ENABLED']:
+            raise MiddlewareNotUsed
+    
+    def __call__(self, request):
+        from .profiling import RequestProfile, finish_request
+        
+        profile = request.sql_profile = RequestProfile(self.config['MAX_QUERIES'])
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(profile))
+            response = self.get_response(request)
+        finish_request(profile, request, response, self.config)
+        return response
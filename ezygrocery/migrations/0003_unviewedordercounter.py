@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-19 03:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_counters(apps, schema_editor):
+    Order = apps.get_model('ezygrocery', 'Order')
+    UnviewedOrderCounter = apps.get_model('ezygrocery', 'UnviewedOrderCounter')
+    per_shop = Order.objects.filter(is_viewed=False).order_by().values_list('shop').annotate(n=Count('id'))
+    UnviewedOrderCounter.objects.bulk_create([
+        UnviewedOrderCounter(shop_id=shop_id, count=count) for shop_id, count in per_shop
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ezygrocery', '0002_masterproduct_product_image_url_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnviewedOrderCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.IntegerField(default=0, verbose_name='নতুন অর্ডার')),
+                ('shop', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='unviewed_order_counter', to='ezygrocery.shop', verbose_name='দোকান')),
+            ],
+            options={
+                'verbose_name': 'নতুন অর্ডার কাউন্টার',
+                'verbose_name_plural': 'নতুন অর্ডার কাউন্টার সমূহ',
+            },
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
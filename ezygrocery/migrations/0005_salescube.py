@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-19 03:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ezygrocery', '0004_order_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesCube',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day'), ('week', 'Week'), ('month', 'Month')], max_length=10, verbose_name='সময়ের একক')),
+                ('period_start', models.DateTimeField(verbose_name='শুরুর সময়')),
+                ('total_orders', models.PositiveIntegerField(default=0, verbose_name='মোট অর্ডার')),
+                ('total_items_sold', models.PositiveIntegerField(default=0, verbose_name='মোট পণ্য বিক্রিত')),
+                ('total_sales', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='মোট বিক্রয়')),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sales_cubes', to='ezygrocery.category', verbose_name='ক্যাটাগরি')),
+                ('moholla', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_cubes', to='ezygrocery.moholla', verbose_name='মহল্লা')),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_cubes', to='ezygrocery.shop', verbose_name='দোকান')),
+            ],
+            options={
+                'verbose_name': 'বিক্রয় কিউব',
+                'verbose_name_plural': 'বিক্রয় কিউব সমূহ',
+                'ordering': ['-period_start'],
+                'indexes': [models.Index(fields=['granularity', 'period_start'], name='ezygrocery__granula_bd4e84_idx'), models.Index(fields=['shop', 'granularity', 'period_start'], name='ezygrocery__shop_id_2f86eb_idx'), models.Index(fields=['moholla', 'granularity', 'period_start'], name='ezygrocery__moholla_d05978_idx'), models.Index(fields=['category', 'granularity', 'period_start'], name='ezygrocery__categor_ceef78_idx')],
+            },
+        ),
+    ]
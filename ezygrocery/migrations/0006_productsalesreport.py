@@ -0,0 +1,50 @@
+# Generated by Django 5.2.6 on 2026-10-19 03:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ezygrocery', '0005_salescube'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSalesReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='তারিখ')),
+                ('quantity_sold', models.PositiveIntegerField(default=0, verbose_name='বিক্রিত পরিমাণ')),
+                ('total_sales', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='মোট বিক্রয়')),
+            ],
+            options={
+                'verbose_name': 'পণ্য বিক্রয় রিপোর্ট',
+                'verbose_name_plural': 'পণ্য বিক্রয় রিপোর্ট সমূহ',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='shopsalesreport',
+            index=models.Index(fields=['date'], name='ezygrocery__date_c9db5f_idx'),
+        ),
+        migrations.AddField(
+            model_name='productsalesreport',
+            name='master_product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_reports', to='ezygrocery.masterproduct', verbose_name='মূল পণ্য'),
+        ),
+        migrations.AddField(
+            model_name='productsalesreport',
+            name='shop',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='product_sales_reports', to='ezygrocery.shop', verbose_name='দোকান'),
+        ),
+        migrations.AddIndex(
+            model_name='productsalesreport',
+            index=models.Index(fields=['date'], name='ezygrocery__date_d5d178_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='productsalesreport',
+            unique_together={('shop', 'master_product', 'date')},
+        ),
+    ]
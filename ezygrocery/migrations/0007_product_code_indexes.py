@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-19 03:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ezygrocery', '0006_productsalesreport'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='masterproduct',
+            index=models.Index(fields=['gtin'], name='ezygrocery__gtin_ae60df_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shopproduct',
+            index=models.Index(fields=['shop', 'shop_sku'], name='ezygrocery__shop_id_5ee220_idx'),
+        ),
+    ]
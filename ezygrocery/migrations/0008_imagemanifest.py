@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ezygrocery', '0007_product_code_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageManifest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='তৈরির সময়')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='আপডেটের সময়')),
+                ('source', models.CharField(max_length=255, unique=True, verbose_name='মূল ফাইল')),
+                ('content_hash', models.CharField(db_index=True, max_length=64, verbose_name='কন্টেন্ট হ্যাশ')),
+                ('presets_version', models.CharField(max_length=32, verbose_name='প্রিসেট সংস্করণ')),
+                ('width', models.PositiveIntegerField(default=0, verbose_name='প্রস্থ')),
+                ('height', models.PositiveIntegerField(default=0, verbose_name='উচ্চতা')),
+                ('variants', models.JSONField(default=dict, verbose_name='ভ্যারিয়েন্ট')),
+            ],
+            options={
+                'verbose_name': 'ইমেজ ম্যানিফেস্ট',
+                'verbose_name_plural': 'ইমেজ ম্যানিফেস্ট সমূহ',
+            },
+        ),
+    ]
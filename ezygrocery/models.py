@@ -1,8 +1,8 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
 from django.utils import timezone
-from django.db.models.signals import pre_save
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
 from django.dispatch import receiver
 from decimal import Decimal
 
@@ -16,6 +16,11 @@ class TimeStampedModel(models.Model):
     
     class Meta:
         abstract = True
+    
+    def image_srcset(self, field_name, preset, image_format='webp'):
+        """srcset of a generated size preset of an image field (ezygrocery.images); '' until generated"""
+        from .images import srcset
+        return srcset(getattr(self, field_name), preset, image_format)
 
 
 class SEOModel(TimeStampedModel):
@@ -208,6 +213,7 @@ class MasterProduct(SEOModel):
         indexes = [
             models.Index(fields=['sku']),
             models.Index(fields=['barcode']),
+            models.Index(fields=['gtin']),
             models.Index(fields=['category']),
         ]
     
@@ -269,6 +275,7 @@ class ShopProduct(TimeStampedModel):
         indexes = [
             models.Index(fields=['shop', 'is_active']),
             models.Index(fields=['master_product', 'is_active']),
+            models.Index(fields=['shop', 'shop_sku']),
         ]
     
     def __str__(self):
@@ -418,6 +425,32 @@ class Rider(TimeStampedModel):
 
 # ==================== অর্ডার সিস্টেম ====================
 
+class OrderQuerySet(models.QuerySet):
+    def mark_viewed(self):
+        """Mark orders as viewed and keep the unviewed-order counters in sync"""
+        from django.db.models import Count
+        from .counters import adjust_unviewed
+        
+        with transaction.atomic():
+            pending = self.filter(is_viewed=False)
+            per_shop = dict(pending.order_by().values_list('shop').annotate(n=Count('id')))
+            updated = pending.update(is_viewed=True)
+            adjust_unviewed({shop_id: -n for shop_id, n in per_shop.items()})
+        return updated
+    
+    def set_status(self, status):
+        """Bulk status change that also refreshes the affected sales rollups"""
+        from .reports import schedule_rollup_refresh
+        
+        with transaction.atomic():
+            changing = self.exclude(status=status)
+            affected = changing if status == 'delivered' else changing.filter(status='delivered')
+            slots = set(affected.order_by().values_list('shop_id', 'created_at'))
+            updated = changing.update(status=status)
+            schedule_rollup_refresh(slots)
+        return updated
+
+
 class Order(TimeStampedModel):
     """অর্ডার"""
     STATUS_CHOICES = [
@@ -452,20 +485,68 @@ class Order(TimeStampedModel):
     cancellation_reason = models.CharField(max_length=200, blank=True)
     is_viewed = models.BooleanField(default=False, verbose_name='Admin Viewed')
     
+    objects = OrderQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
         verbose_name = "অর্ডার"
         verbose_name_plural = "অর্ডার সমূহ"
+        indexes = [
+            # Changelist default ordering and date filters
+            models.Index(fields=['-created_at']),
+            # Changelist shop/status filters and Shop.total_sales (status='delivered')
+            models.Index(fields=['shop', 'status', '-created_at']),
+            models.Index(fields=['status', '-created_at']),
+            # Customer order history
+            models.Index(fields=['user', '-created_at']),
+            # Only the few unviewed orders are indexed for the is_viewed filter
+            models.Index(fields=['-created_at'], condition=models.Q(is_viewed=False), name='order_unviewed_idx'),
+        ]
     
     def __str__(self):
         return f"{self.order_number} - {self.shop.name}"
     
+    # Fields whose changes drive the unviewed-order counters and sales reports
+    TRACKED_FIELDS = ('is_viewed', 'shop_id', 'status', 'total_amount', 'created_at')
+    TRACKED_FIELDS_SAVED = {'is_viewed', 'shop', 'shop_id', 'status', 'total_amount', 'created_at'}
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored values so signals can detect transitions without re-querying
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+    
+    def tracked_values(self):
+        return {field: getattr(self, field) for field in self.TRACKED_FIELDS}
+    
+    def stored_values(self):
+        """Tracked values as stored in the database (None if the order is not saved yet)"""
+        loaded = getattr(self, '_loaded_values', {})
+        if all(field in loaded for field in self.TRACKED_FIELDS):
+            return {field: loaded[field] for field in self.TRACKED_FIELDS}
+        return Order.objects.filter(pk=self.pk).values(*self.TRACKED_FIELDS).first()
+    
     @staticmethod
     def get_new_orders_count(request):
-        count = Order.objects.filter(is_viewed=False).count()
+        from .counters import get_unviewed_counts
+        count = get_unviewed_counts()['total']
         return count if count > 0 else None
 
 
+class UnviewedOrderCounter(models.Model):
+    """দোকান ভিত্তিক না দেখা অর্ডারের কাউন্টার (admin badge)"""
+    shop = models.OneToOneField(Shop, on_delete=models.CASCADE, related_name='unviewed_order_counter', verbose_name="দোকান")
+    count = models.IntegerField(default=0, verbose_name="নতুন অর্ডার")
+    
+    class Meta:
+        verbose_name = "নতুন অর্ডার কাউন্টার"
+        verbose_name_plural = "নতুন অর্ডার কাউন্টার সমূহ"
+    
+    def __str__(self):
+        return f"{self.shop.name} - {self.count}"
+
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     shop_product = models.ForeignKey(ShopProduct, on_delete=models.CASCADE, verbose_name="দোকানের পণ্য")
@@ -513,11 +594,69 @@ class ShopSalesReport(models.Model):
         verbose_name_plural = "বিক্রয় রিপোর্ট সমূহ"
         unique_together = ['shop', 'date']
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['date']),
+        ]
     
     def __str__(self):
         return f"{self.shop.name} - {self.date} - ৳{self.total_sales}"
 
 
+class ProductSalesReport(models.Model):
+    """পণ্য বিক্রয় রিপোর্ট (দৈনিক)"""
+    shop = models.ForeignKey(Shop, on_delete=models.CASCADE, related_name='product_sales_reports', verbose_name="দোকান")
+    master_product = models.ForeignKey(MasterProduct, on_delete=models.CASCADE, related_name='sales_reports', verbose_name="মূল পণ্য")
+    date = models.DateField(verbose_name="তারিখ")
+    quantity_sold = models.PositiveIntegerField(default=0, verbose_name="বিক্রিত পরিমাণ")
+    total_sales = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="মোট বিক্রয়")
+    
+    class Meta:
+        verbose_name = "পণ্য বিক্রয় রিপোর্ট"
+        verbose_name_plural = "পণ্য বিক্রয় রিপোর্ট সমূহ"
+        unique_together = ['shop', 'master_product', 'date']
+        ordering = ['-date']
+        indexes = [
+            models.Index(fields=['date']),
+        ]
+    
+    def __str__(self):
+        return f"{self.master_product.name} - {self.shop.name} - {self.date}"
+
+
+class SalesCube(models.Model):
+    """প্রি-অ্যাগ্রিগেটেড বিক্রয় কিউব (সময় × দোকান × মহল্লা × ক্যাটাগরি)"""
+    GRANULARITY_CHOICES = [
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+        ('week', 'Week'),
+        ('month', 'Month'),
+    ]
+    
+    granularity = models.CharField(max_length=10, choices=GRANULARITY_CHOICES, verbose_name="সময়ের একক")
+    period_start = models.DateTimeField(verbose_name="শুরুর সময়")
+    shop = models.ForeignKey(Shop, on_delete=models.CASCADE, related_name='sales_cubes', verbose_name="দোকান")
+    moholla = models.ForeignKey(Moholla, on_delete=models.CASCADE, related_name='sales_cubes', verbose_name="মহল্লা")
+    # Empty category = the shop's totals across all categories; hour cells only hold totals
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, blank=True, related_name='sales_cubes', verbose_name="ক্যাটাগরি")
+    total_orders = models.PositiveIntegerField(default=0, verbose_name="মোট অর্ডার")
+    total_items_sold = models.PositiveIntegerField(default=0, verbose_name="মোট পণ্য বিক্রিত")
+    total_sales = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="মোট বিক্রয়")
+    
+    class Meta:
+        verbose_name = "বিক্রয় কিউব"
+        verbose_name_plural = "বিক্রয় কিউব সমূহ"
+        ordering = ['-period_start']
+        indexes = [
+            models.Index(fields=['granularity', 'period_start']),
+            models.Index(fields=['shop', 'granularity', 'period_start']),
+            models.Index(fields=['moholla', 'granularity', 'period_start']),
+            models.Index(fields=['category', 'granularity', 'period_start']),
+        ]
+    
+    def __str__(self):
+        return f"{self.shop.name} - {self.granularity} {self.period_start:%Y-%m-%d %H:%M} - ৳{self.total_sales}"
+
+
 # ==================== রাইডার আর্নিং ====================
 
 class RiderCashDeposit(TimeStampedModel):
@@ -768,20 +907,19 @@ class FAQ(TimeStampedModel):
     
     @staticmethod
     def get_faq_schema():
-        faqs = FAQ.objects.filter(is_active=True)
-        if not faqs.exists():
-            return None
-        
-        faq_list = []
-        for faq in faqs:
-            faq_list.append({
+        faq_list = [
+            {
                 "@type": "Question",
-                "name": faq.question,
+                "name": question,
                 "acceptedAnswer": {
                     "@type": "Answer",
-                    "text": faq.answer
+                    "text": answer
                 }
-            })
+            }
+            for question, answer in FAQ.objects.filter(is_active=True).values_list('question', 'answer')
+        ]
+        if not faq_list:
+            return None
         
         return {
             "@context": "https://schema.org",
@@ -827,6 +965,26 @@ class SitemapConfig(models.Model):
 
 
 
+# ==================== IMAGE DERIVATIVES ====================
+
+class ImageManifest(TimeStampedModel):
+    """Generated sizes and formats of an uploaded image (see ezygrocery.images)"""
+    source = models.CharField(max_length=255, unique=True, verbose_name='মূল ফাইল')
+    content_hash = models.CharField(max_length=64, db_index=True, verbose_name='কন্টেন্ট হ্যাশ')
+    presets_version = models.CharField(max_length=32, verbose_name='প্রিসেট সংস্করণ')
+    width = models.PositiveIntegerField(default=0, verbose_name='প্রস্থ')
+    height = models.PositiveIntegerField(default=0, verbose_name='উচ্চতা')
+    # {preset: {format: [[name, width, height], ...]}}
+    variants = models.JSONField(default=dict, verbose_name='ভ্যারিয়েন্ট')
+    
+    class Meta:
+        verbose_name = 'ইমেজ ম্যানিফেস্ট'
+        verbose_name_plural = 'ইমেজ ম্যানিফেস্ট সমূহ'
+    
+    def __str__(self):
+        return self.source
+
+
 # ==================== STORE SETTINGS ====================
 
 class StoreSettings(TimeStampedModel):
@@ -953,7 +1111,10 @@ class StoreSettings(TimeStampedModel):
     
     @classmethod
     def get_settings(cls):
-        obj, created = cls.objects.get_or_create(pk=1)
+        # Plain read first: get_or_create() always uses the primary (see ezygrocery.routers)
+        obj = cls.objects.filter(pk=1).first()
+        if obj is None:
+            obj, created = cls.objects.get_or_create(pk=1)
         return obj
     
     def get_meta_title(self):
@@ -1048,3 +1209,157 @@ def set_order_as_unviewed(sender, instance, **kwargs):
     """Ensure new orders are marked as unviewed"""
     if not instance.pk:
         instance.is_viewed = False
+        instance._previous_values = None
+        return
+    
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and not Order.TRACKED_FIELDS_SAVED & set(update_fields):
+        instance._previous_values = instance.tracked_values()
+        return
+    
+    instance._previous_values = instance.stored_values()
+
+
+@receiver(post_save, sender=Order)
+def apply_order_changes(sender, instance, **kwargs):
+    """Keep the unviewed-order counters and sales rollups in step with the saved order"""
+    from .counters import adjust_unviewed, unviewed_deltas
+    from .metrics import ORDERS_PLACED
+    from .reports import order_rollup_slots, schedule_rollup_refresh
+    old = instance.__dict__.pop('_previous_values', None)
+    new = instance.tracked_values()
+    adjust_unviewed(unviewed_deltas(old, new))
+    schedule_rollup_refresh(order_rollup_slots(old, new))
+    instance.__dict__.setdefault('_loaded_values', {}).update(new)
+    if kwargs.get('created'):
+        ORDERS_PLACED.inc(instance.delivery_location)
+
+
+@receiver(post_delete, sender=Order)
+def release_deleted_order(sender, instance, **kwargs):
+    """Deleted orders leave the new-orders badge and the sales reports"""
+    from .counters import adjust_unviewed, unviewed_deltas
+    from .reports import order_rollup_slots, schedule_rollup_refresh
+    old = {**instance.tracked_values(), **getattr(instance, '_loaded_values', {})}
+    old = {field: old[field] for field in Order.TRACKED_FIELDS}
+    adjust_unviewed(unviewed_deltas(old, None))
+    schedule_rollup_refresh(order_rollup_slots(old, None))
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+@receiver(post_save, sender=RefundRequest)
+@receiver(post_delete, sender=RefundRequest)
+def refresh_delivered_order_report(sender, instance, **kwargs):
+    """Item and refund changes on a delivered order update its sales rollups"""
+    from .reports import schedule_order_rollup_refresh
+    schedule_order_rollup_refresh(instance.order_id)
+
+
+# Fields that decide which (shop, code) pairs resolve to a product (ezygrocery.barcodes)
+PRODUCT_CODE_FIELDS = {'barcode', 'gtin', 'shop_sku', 'shop', 'shop_id', 'master_product', 'master_product_id'}
+
+
+@receiver(pre_save, sender=MasterProduct)
+@receiver(pre_save, sender=ShopProduct)
+@receiver(pre_delete, sender=MasterProduct)
+@receiver(pre_delete, sender=ShopProduct)
+def remember_product_codes(sender, instance, update_fields=None, **kwargs):
+    """Codes the product resolves under before the change"""
+    from .barcodes import product_codes
+    if instance._state.adding or update_fields is not None and not PRODUCT_CODE_FIELDS & set(update_fields):
+        instance._stored_codes = None
+        return
+    instance._stored_codes = product_codes(sender._meta.model_name, [instance.pk])
+
+
+@receiver(post_save, sender=MasterProduct)
+@receiver(post_delete, sender=MasterProduct)
+@receiver(post_save, sender=ShopProduct)
+@receiver(post_delete, sender=ShopProduct)
+def invalidate_product_codes(sender, instance, update_fields=None, **kwargs):
+    """Drop the cached resolutions of the codes whose product changed"""
+    from .barcodes import forget_codes, product_codes
+    old = instance.__dict__.pop('_stored_codes', None)
+    if update_fields is not None and not PRODUCT_CODE_FIELDS & set(update_fields):
+        return
+    new = set() if kwargs.get('signal') is post_delete else product_codes(sender._meta.model_name, [instance.pk])
+    if old != new:
+        forget_codes((old or set()) | new)
+
+
+@receiver(post_save, sender=MasterProductReview)
+@receiver(post_delete, sender=MasterProductReview)
+def touch_reviewed_product(sender, instance, **kwargs):
+    """The product's rating changed: move its updated_at so fragment cache keys change (ezygrocery.fragments)"""
+    MasterProduct.objects.filter(pk=instance.master_product_id).update(updated_at=timezone.now())
+
+
+def invalidate_cached_pages(sender, instance, **kwargs):
+    """Cached storefront pages showing the saved or deleted object are stale"""
+    from .page_cache import changed_tags, invalidate_tags
+    tags = changed_tags(instance)
+    transaction.on_commit(lambda: invalidate_tags(tags))
+
+
+for model in (
+    Moholla, Shop, Category, MasterProduct, ShopProduct, MasterProductReview, BlogPost,
+    StoreSettings, Promotion, SpecialOffer, Coupon, HeroSlider, FAQ,
+):
+    post_save.connect(invalidate_cached_pages, sender=model, dispatch_uid=f'page_cache_{model.__name__}_save')
+    post_delete.connect(invalidate_cached_pages, sender=model, dispatch_uid=f'page_cache_{model.__name__}_delete')
+
+
+def rebuild_sitemap_sections(sender, instance, **kwargs):
+    """The saved or deleted object may be listed in (or gone from) the sitemaps"""
+    from .sitemaps import MODEL_SECTIONS, schedule_rebuild
+    schedule_rebuild(MODEL_SECTIONS[sender._meta.model_name])
+
+
+for model in (MasterProduct, ShopProduct, Shop, Category, Moholla, BlogPost, SitemapConfig):
+    post_save.connect(rebuild_sitemap_sections, sender=model, dispatch_uid=f'sitemap_{model.__name__}_save')
+    post_delete.connect(rebuild_sitemap_sections, sender=model, dispatch_uid=f'sitemap_{model.__name__}_delete')
+
+
+@receiver(post_save, sender=FAQ)
+@receiver(post_delete, sender=FAQ)
+@receiver(post_save, sender=MasterProduct)
+@receiver(post_delete, sender=MasterProduct)
+@receiver(post_save, sender=ShopProduct)
+@receiver(post_delete, sender=ShopProduct)
+@receiver(post_save, sender=MasterProductReview)
+@receiver(post_delete, sender=MasterProductReview)
+@receiver(post_save, sender=Shop)
+def invalidate_json_ld_blobs(sender, instance, update_fields=None, **kwargs):
+    """Cached JSON-LD showing the saved or deleted object is stale (ezygrocery.structured_data)"""
+    from .structured_data import invalidate_json_ld
+    if sender is FAQ:
+        invalidate_json_ld('faq')
+    elif sender is Shop:
+        # Offers only count active shops; deleted shops take their shop products (and receivers) along
+        if update_fields is None or 'is_active' in update_fields:
+            master_ids = instance.shop_products.values_list('master_product_id', flat=True)
+            invalidate_json_ld(*(f"product:{pk}" for pk in master_ids))
+    elif sender is MasterProduct:
+        invalidate_json_ld(f"product:{instance.pk}")
+    else:
+        invalidate_json_ld(f"product:{instance.master_product_id}")
+
+
+@receiver(post_save, sender=StoreSettings)
+def invalidate_all_json_ld(sender, instance, **kwargs):
+    """Organization and website data, and whether schema markup is enabled at all"""
+    from .structured_data import invalidate_structured_data
+    transaction.on_commit(invalidate_structured_data)
+
+
+def generate_image_derivatives(sender, instance, **kwargs):
+    """Uploaded images get their size presets and WebP/AVIF variants in the background"""
+    from .images import enqueue_files
+    enqueue_files(
+        getattr(instance, field.attname) for field in sender._meta.fields if isinstance(field, models.ImageField)
+    )
+
+
+for model in (Moholla, Shop, Category, MasterProduct, Customer, Promotion, HeroSlider, BlogPost, StoreSettings):
+    post_save.connect(generate_image_derivatives, sender=model, dispatch_uid=f'images_{model.__name__}_save')
@@ -0,0 +1,180 @@
+"""
+Full-page cache for anonymous storefront requests
+
+PageCacheMiddleware stores complete GET responses of visitors without a
+session, keyed by path + query string, the selected moholla (cookie) and the
+language. Each entry remembers the versions of its tags: a view tags its
+page with the objects it shows (tag_page(request, shop, *products)),
+conditional pages (ezygrocery.conditional) with the models they depend on,
+and every page carries SITE_TAG for what the context processors render on
+all pages. A page nobody tagged gets UNTAGGED_TAG instead, which any change
+invalidates. Saving or deleting a model bumps the versions of its tags (see
+the receivers in models.py), so entries showing it stop matching; there is
+no key scan or delete-by-pattern. Entries also expire after TIMEOUT.
+
+Responses carry an ETag of their content and If-None-Match is answered with
+304, for hits and for freshly stored pages alike.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import cc_delim_re
+
+PAGE_CACHE_PREFIX = 'ezygrocery:page:'
+TAG_VERSION_PREFIX = 'ezygrocery:pagetag:'
+SITE_TAG = 'site'
+# Pages with no tags of their own may show anything
+UNTAGGED_TAG = 'untagged'
+
+DEFAULTS = {
+    'ENABLED': True,
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 300,
+    'MOHOLLA_COOKIE': 'moholla',
+    'EXCLUDE_PATHS': ('/admin/', '/metrics'),
+}
+
+# Foreign keys whose pages also show the object: model name -> fields
+RELATED_TAGS = {
+    'shop': ('moholla',),
+    'masterproduct': ('category',),
+    'shopproduct': ('shop', 'master_product'),
+    'masterproductreview': ('master_product', 'shop'),
+}
+
+# Models the context processors and the base template render on every page
+SITE_WIDE_MODELS = {'storesettings', 'category', 'promotion', 'specialoffer', 'coupon', 'heroslider'}
+
+# Response headers that are never stored
+SKIPPED_HEADERS = {'set-cookie', 'x-request-id'}
+
+
+def page_cache_settings():
+    return {**DEFAULTS, **getattr(settings, 'PAGE_CACHE', {})}
+
+
+def _cache():
+    return caches[page_cache_settings()['CACHE_ALIAS']]
+
+
+def instance_tags(instance):
+    """Tags of the pages showing `instance`: its own and those of its parents"""
+    name = instance._meta.model_name
+    tags = [f"{name}:{instance.pk}"]
+    for field_name in RELATED_TAGS.get(name, ()):
+        field = instance._meta.get_field(field_name)
+        value = getattr(instance, field.attname)
+        if value is not None:
+            tags.append(f"{field.related_model._meta.model_name}:{value}")
+    if name in SITE_WIDE_MODELS:
+        tags.append(SITE_TAG)
+    return tags
+
+
+def changed_tags(instance):
+    """Tags to invalidate when `instance` is saved or deleted: its instance_tags(), its model's and UNTAGGED_TAG"""
+    return instance_tags(instance) + [instance._meta.model_name, UNTAGGED_TAG]
+
+
+def tag_page(request, *objects):
+    """Tag the page being rendered with model instances or tag strings (a model name covers all its rows)"""
+    tags = request.__dict__.setdefault('page_cache_tags', set())
+    for item in objects:
+        if isinstance(item, str):
+            tags.add(item)
+        else:
+            tags.update(instance_tags(item))
+
+
+def invalidate_tags(tags):
+    """Bump the versions of `tags`; cached pages carrying any of them become misses"""
+    version = time.time_ns()
+    _cache().set_many({TAG_VERSION_PREFIX + tag: version for tag in tags}, None)
+
+
+def tag_versions(tags):
+    """
+    Current ({tag: version}, created tags). Tags never seen (or evicted) get
+    a new version now, so entries stored before the eviction stop matching.
+    """
+    cache = _cache()
+    keys = {TAG_VERSION_PREFIX + tag: tag for tag in tags}
+    versions = {keys[key]: version for key, version in cache.get_many(keys).items()}
+    created = set()
+    for key, tag in keys.items():
+        if tag not in versions:
+            version = time.time_ns()
+            if not cache.add(key, version, None):
+                version = cache.get(key, version)
+            versions[tag] = version
+            created.add(tag)
+    return versions, created
+
+
+def page_key(request, config):
+    language = request.COOKIES.get(settings.LANGUAGE_COOKIE_NAME) or settings.LANGUAGE_CODE
+    moholla = request.COOKIES.get(config['MOHOLLA_COOKIE'], '')
+    raw = f"{request.get_host()}|{request.get_full_path()}|{moholla}|{language}"
+    return PAGE_CACHE_PREFIX + hashlib.md5(raw.encode()).hexdigest()
+
+
+def is_cacheable_request(request, config):
+    if request.method not in ('GET', 'HEAD') or settings.SESSION_COOKIE_NAME in request.COOKIES:
+        return False
+    return not request.path.startswith(tuple(config['EXCLUDE_PATHS']))
+
+
+def is_cacheable_response(request, response):
+    if request.method != 'GET' or response.status_code != 200 or response.streaming or response.cookies:
+        return False
+    # The page has a CSRF token tied to this visitor's cookie
+    if request.META.get('CSRF_COOKIE_NEEDS_UPDATE'):
+        return False
+    directives = {value.strip().lower() for value in cc_delim_re.split(response.get('Cache-Control', ''))}
+    return not directives & {'private', 'no-store', 'no-cache'}
+
+
+def _etag_matches(request, etag):
+    header = request.headers.get('If-None-Match', '')
+    return header.strip() == '*' or etag in [value.strip() for value in header.split(',')]
+
+
+def cached_response(request, key):
+    """The stored response if all its tag versions are current, else None"""
+    entry = _cache().get(key)
+    if entry is None:
+        return None
+    if tag_versions(entry['tags'])[0] != entry['tags']:
+        return None
+    if _etag_matches(request, entry['etag']):
+        return HttpResponseNotModified(headers={'ETag': entry['etag']})
+    response = HttpResponse(entry['content'], status=entry['status'])
+    for header, value in entry['headers']:
+        response[header] = value
+    response['X-Page-Cache'] = 'HIT'
+    return response
+
+
+def store_response(request, response, key, started, config):
+    """Cache a rendered response, unless one of its tags was invalidated while rendering"""
+    tags = {SITE_TAG} | (getattr(request, 'page_cache_tags', None) or {UNTAGGED_TAG})
+    versions, created = tag_versions(tags)
+    if any(version > started for tag, version in versions.items() if tag not in created):
+        return response
+    # Keep the validator of a conditional view (ezygrocery.conditional)
+    etag = response.get('ETag') or f'"{hashlib.md5(response.content).hexdigest()}"'
+    response['ETag'] = etag
+    _cache().set(key, {
+        'content': response.content,
+        'status': response.status_code,
+        'headers': [(header, value) for header, value in response.items() if header.lower() not in SKIPPED_HEADERS],
+        'etag': etag,
+        'tags': versions,
+    }, config['TIMEOUT'])
+    response['X-Page-Cache'] = 'MISS'
+    if _etag_matches(request, etag):
+        return HttpResponseNotModified(headers={'ETag': etag})
+    return response
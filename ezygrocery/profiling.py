@@ -0,0 +1,228 @@
+"""
+Always-on per-request SQL profiling
+
+RequestProfile is installed as a connection.execute_wrapper for the length of
+a request (see middleware.SQLProfilerMiddleware). It counts queries and DB
+time and groups them by their parameterized SQL, so the same statement run
+many times in one request (the N+1 pattern) shows up as a duplicate.
+
+Per-view totals are kept in process memory and added to the cache every
+FLUSH_INTERVAL seconds; slow requests (and, at most once per view per flush
+interval, requests with duplicates) are written with their query list into
+a fixed-size ring buffer of cache slots. With a shared cache (Redis) the
+admin page therefore sees every worker process. Resetting starts a new
+cache generation.
+"""
+import os
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+PROFILE_CACHE_PREFIX = 'ezygrocery:sqlprofile:'
+PROFILE_VERSION_KEY = 'ezygrocery:sqlprofile:version'
+PROFILE_CACHE_TIMEOUT = 7 * 24 * 60 * 60
+
+DEFAULTS = {
+    'ENABLED': True,
+    # Requests slower than this, or with a query slower than SLOW_QUERY_MS, are sampled
+    'SLOW_REQUEST_MS': 500,
+    'SLOW_QUERY_MS': 100,
+    # The same statement this many times in one request is reported as N+1
+    'DUPLICATE_THRESHOLD': 5,
+    'BUFFER_SIZE': 100,
+    # Queries kept per sampled request (all are counted)
+    'MAX_QUERIES': 300,
+    'FLUSH_INTERVAL': 10,
+}
+
+# Per-view counters, in this order
+METRICS = ('requests', 'queries', 'db_us', 'duration_us', 'slow', 'duplicates')
+
+
+def profiler_settings():
+    return {**DEFAULTS, **getattr(settings, 'SQL_PROFILER', {})}
+
+
+class RequestProfile:
+    """execute_wrapper collecting the queries of one request"""
+    
+    def __init__(self, max_queries):
+        self.max_queries = max_queries
+        self.count = 0
+        self.db_time = 0.0
+        self.slowest = 0.0
+        self.signatures = Counter()
+        self.queries = []
+        self.started = time.perf_counter()
+    
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.db_time += elapsed
+            if elapsed > self.slowest:
+                self.slowest = elapsed
+            # Django passes parameterized SQL, so the text itself is the query signature
+            self.signatures[sql] += 1
+            if len(self.queries) < self.max_queries:
+                self.queries.append((sql, elapsed, context['connection'].alias, many))
+    
+    def duplicates(self, threshold):
+        return [(sql, count) for sql, count in self.signatures.most_common() if count >= threshold]
+
+
+class _Stats:
+    """Per-process per-view counters, added to the cache in batches"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+        self.flushed_at = time.monotonic()
+        self.duplicates_sampled = set()
+    
+    def add(self, view, values):
+        with self.lock:
+            totals = self.views.setdefault(view, [0] * len(METRICS))
+            for index, value in enumerate(values):
+                totals[index] += value
+    
+    def sample_duplicates(self, view):
+        """True once per view and flush interval"""
+        with self.lock:
+            if view in self.duplicates_sampled:
+                return False
+            self.duplicates_sampled.add(view)
+            return True
+    
+    def due(self, interval):
+        return time.monotonic() - self.flushed_at >= interval
+    
+    def take(self):
+        with self.lock:
+            views, self.views = self.views, {}
+            self.duplicates_sampled = set()
+            self.flushed_at = time.monotonic()
+        return views
+
+
+_stats = _Stats()
+
+
+def _version():
+    version = cache.get(PROFILE_VERSION_KEY)
+    if version is None:
+        cache.add(PROFILE_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(PROFILE_VERSION_KEY)
+    return version
+
+
+def _prefix():
+    return f"{PROFILE_CACHE_PREFIX}{_version()}:"
+
+
+def _incr(key, delta):
+    """Atomic add on the cache backend; returns the new value"""
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        if cache.add(key, delta, PROFILE_CACHE_TIMEOUT):
+            return delta
+        return cache.incr(key, delta)
+
+
+def flush_stats():
+    """Add this process's pending per-view counters to the cache"""
+    views = _stats.take()
+    if not views:
+        return
+    prefix = _prefix()
+    known = set(cache.get(prefix + 'views') or ())
+    if not views.keys() <= known:
+        cache.set(prefix + 'views', sorted(known | views.keys()), PROFILE_CACHE_TIMEOUT)
+    for view, totals in views.items():
+        for metric, value in zip(METRICS, totals):
+            if value:
+                _incr(f"{prefix}view:{view}:{metric}", value)
+
+
+def record_sample(sample):
+    """Store a sampled request in the next ring buffer slot"""
+    prefix = _prefix()
+    size = profiler_settings()['BUFFER_SIZE']
+    sequence = _incr(prefix + 'sequence', 1)
+    sample['sequence'] = sequence
+    cache.set(f"{prefix}sample:{sequence % size}", sample, PROFILE_CACHE_TIMEOUT)
+
+
+def finish_request(profile, request, response, config):
+    """Account a finished request; samples it if it was slow or ran duplicate queries"""
+    duration = time.perf_counter() - profile.started
+    match = getattr(request, 'resolver_match', None)
+    view = match.view_name if match else 'unresolved'
+    slow = duration * 1000 >= config['SLOW_REQUEST_MS'] or profile.slowest * 1000 >= config['SLOW_QUERY_MS']
+    duplicates = profile.duplicates(config['DUPLICATE_THRESHOLD']) if profile.count >= config['DUPLICATE_THRESHOLD'] else []
+    _stats.add(view, (1, profile.count, int(profile.db_time * 1e6), int(duration * 1e6), int(slow), int(bool(duplicates))))
+    
+    if slow or (duplicates and _stats.sample_duplicates(view)):
+        record_sample({
+            'at': timezone.now(),
+            'pid': os.getpid(),
+            'method': request.method,
+            'path': request.get_full_path()[:500],
+            'view': view,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 2),
+            'db_ms': round(profile.db_time * 1000, 2),
+            'query_count': profile.count,
+            'slow': slow,
+            'duplicates': [(sql, count) for sql, count in duplicates[:10]],
+            'queries': [(sql, round(elapsed * 1000, 3), alias, many) for sql, elapsed, alias, many in profile.queries],
+        })
+    if _stats.due(config['FLUSH_INTERVAL']):
+        flush_stats()
+
+
+def view_stats():
+    """Per-view totals across processes, slowest average first"""
+    flush_stats()
+    prefix = _prefix()
+    views = cache.get(prefix + 'views') or []
+    keys = [f"{prefix}view:{view}:{metric}" for view in views for metric in METRICS]
+    values = cache.get_many(keys)
+    rows = []
+    for view in views:
+        totals = {metric: values.get(f"{prefix}view:{view}:{metric}", 0) for metric in METRICS}
+        requests = totals['requests']
+        if not requests:
+            continue
+        rows.append({
+            'view': view,
+            'requests': requests,
+            'avg_queries': totals['queries'] / requests,
+            'avg_db_ms': totals['db_us'] / requests / 1000,
+            'avg_ms': totals['duration_us'] / requests / 1000,
+            'slow': totals['slow'],
+            'duplicates': totals['duplicates'],
+        })
+    return sorted(rows, key=lambda row: row['avg_ms'], reverse=True)
+
+
+def recent_samples():
+    """Sampled requests in the ring buffer, newest first"""
+    prefix = _prefix()
+    size = profiler_settings()['BUFFER_SIZE']
+    samples = cache.get_many([f"{prefix}sample:{slot}" for slot in range(size)]).values()
+    return sorted(samples, key=lambda sample: sample['sequence'], reverse=True)
+
+
+def reset_profile():
+    """Start a new cache generation; the old keys expire on their own"""
+    _stats.take()
+    cache.set(PROFILE_VERSION_KEY, time.time_ns(), None)
@@ -0,0 +1,216 @@
+"""
+ShopSalesReport materializer and sales rollup dispatch
+
+A report row holds the delivered orders of one shop for one local calendar day
+(by order creation date): order count, sales net of approved refunds and items
+sold. ProductSalesReport rows break the same shop-days down by master product
+(quantity and item revenue). Rows are always recomputed from the source tables with GROUP BY queries,
+so the incremental refresh and the backfill produce identical results and can
+be rerun safely.
+
+Order, item and refund changes are reduced to (shop_id, created_at) slots of
+delivered orders; after commit every rollup (these reports and the sales
+cubes) refreshes the rows covering those slots.
+"""
+import logging
+import threading
+from datetime import datetime, time, timedelta
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_pending = threading.local()
+
+
+def report_date(created_at):
+    """The report day an order belongs to (local calendar date)"""
+    return timezone.localdate(created_at)
+
+
+def _day_bounds(start_date, end_date):
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(start_date, time.min), tz)
+    end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min), tz)
+    return start, end
+
+
+def aggregate_sales(start_date, end_date, shop_ids=None):
+    """Return {(shop_id, date): {'total_orders', 'total_sales', 'total_items_sold'}} for the day range"""
+    from .models import Order, OrderItem, RefundRequest
+
+    start, end = _day_bounds(start_date, end_date)
+    orders = Order.objects.filter(status='delivered', created_at__gte=start, created_at__lt=end)
+    items = OrderItem.objects.filter(order__status='delivered', order__created_at__gte=start, order__created_at__lt=end)
+    refunds = RefundRequest.objects.filter(
+        is_approved=True, order__status='delivered', order__created_at__gte=start, order__created_at__lt=end
+    )
+    if shop_ids is not None:
+        orders = orders.filter(shop_id__in=shop_ids)
+        items = items.filter(order__shop_id__in=shop_ids)
+        refunds = refunds.filter(order__shop_id__in=shop_ids)
+
+    rows = {}
+    for shop_id, day, count, sales in (
+        orders.order_by().annotate(day=TruncDate('created_at'))
+        .values_list('shop_id', 'day').annotate(count=Count('id'), sales=Sum('total_amount'))
+    ):
+        rows[(shop_id, day)] = {'total_orders': count, 'total_sales': sales or 0, 'total_items_sold': 0}
+
+    for shop_id, day, quantity in (
+        items.order_by().annotate(day=TruncDate('order__created_at'))
+        .values_list('order__shop_id', 'day').annotate(quantity=Sum('quantity'))
+    ):
+        if (shop_id, day) in rows:
+            rows[(shop_id, day)]['total_items_sold'] = quantity or 0
+
+    for shop_id, day, amount in (
+        refunds.order_by().annotate(day=TruncDate('order__created_at'))
+        .values_list('order__shop_id', 'day').annotate(amount=Sum('amount'))
+    ):
+        if (shop_id, day) in rows:
+            rows[(shop_id, day)]['total_sales'] -= amount or 0
+
+    return rows
+
+
+def aggregate_product_sales(start_date, end_date, shop_ids=None):
+    """Return {(shop_id, date, master_product_id): {'quantity_sold', 'total_sales'}} for the day range"""
+    from .cubes import ITEM_REVENUE
+    from .models import OrderItem
+    
+    start, end = _day_bounds(start_date, end_date)
+    items = OrderItem.objects.filter(order__status='delivered', order__created_at__gte=start, order__created_at__lt=end)
+    if shop_ids is not None:
+        items = items.filter(order__shop_id__in=shop_ids)
+    return {
+        (shop_id, day, product_id): {'quantity_sold': sold or 0, 'total_sales': sales or 0}
+        for shop_id, day, product_id, sold, sales in (
+            items.order_by().annotate(day=TruncDate('order__created_at'))
+            .values_list('order__shop_id', 'day', 'shop_product__master_product_id')
+            .annotate(sold=Sum('quantity'), sales=Sum(ITEM_REVENUE))
+        )
+    }
+
+
+def lock_shops(shop_ids):
+    """Serialize concurrent rollup refreshes of the same shops (no-op on SQLite)"""
+    from .models import Shop
+    
+    list(Shop.objects.select_for_update().filter(pk__in=shop_ids).order_by('pk').values_list('pk', flat=True))
+
+
+def materialize(start_date, end_date, shop_ids=None):
+    """Replace the shop and product report rows of the day range (optionally limited to shops) with fresh aggregates"""
+    from .models import ProductSalesReport, ShopSalesReport
+
+    with transaction.atomic():
+        if shop_ids is not None:
+            lock_shops(shop_ids)
+        rows = aggregate_sales(start_date, end_date, shop_ids)
+        product_rows = aggregate_product_sales(start_date, end_date, shop_ids)
+        for model in (ShopSalesReport, ProductSalesReport):
+            existing = model.objects.filter(date__gte=start_date, date__lte=end_date)
+            if shop_ids is not None:
+                existing = existing.filter(shop_id__in=shop_ids)
+            existing.delete()
+        ShopSalesReport.objects.bulk_create(
+            [ShopSalesReport(shop_id=shop_id, date=day, **values) for (shop_id, day), values in rows.items()],
+            batch_size=1000,
+        )
+        ProductSalesReport.objects.bulk_create(
+            [
+                ProductSalesReport(shop_id=shop_id, date=day, master_product_id=product_id, **values)
+                for (shop_id, day, product_id), values in product_rows.items()
+            ],
+            batch_size=1000,
+        )
+    return len(rows)
+
+
+def refresh_sales_reports(pairs):
+    """Recompute the given (shop_id, date) report rows"""
+    shops_by_date = {}
+    for shop_id, day in pairs:
+        shops_by_date.setdefault(day, set()).add(shop_id)
+    for day, shop_ids in shops_by_date.items():
+        materialize(day, day, shop_ids)
+
+
+def order_rollup_slots(old, new):
+    """(shop_id, created_at) slots of delivered orders touched by a change from `old` to `new` tracked values"""
+    if old == new:
+        return set()
+    return {
+        (values['shop_id'], values['created_at'])
+        for values in (old, new)
+        if values and values.get('status') == 'delivered' and values.get('created_at')
+    }
+
+
+def refresh_rollups(slots):
+    """Refresh the sales reports and sales cubes covering the given order slots"""
+    from .cubes import refresh_sales_cubes
+    
+    try:
+        refresh_sales_reports({(shop_id, report_date(created_at)) for shop_id, created_at in slots})
+        refresh_sales_cubes(slots)
+    except Exception:
+        # The order change itself is committed; rebuild_sales_reports/rebuild_sales_cubes repair the rollups
+        logger.exception("Sales rollup refresh failed for %d order slots", len(slots))
+
+
+def schedule_rollup_refresh(slots):
+    """Refresh the rollups of the given (shop_id, created_at) slots once the current transaction commits"""
+    slots = {(shop_id, created_at) for shop_id, created_at in slots if shop_id is not None and created_at is not None}
+    if slots:
+        transaction.on_commit(partial(refresh_rollups, slots))
+
+
+class _OrderBatch:
+    """on_commit callback refreshing the rollups of the orders changed in one transaction"""
+    def __init__(self):
+        self.order_ids = set()
+        self.done = False
+
+    def __call__(self):
+        from .models import Order
+
+        self.done = True
+        slots = set(
+            Order.objects.filter(pk__in=self.order_ids, status='delivered').values_list('shop_id', 'created_at')
+        )
+        if slots:
+            refresh_rollups(slots)
+
+
+def schedule_order_rollup_refresh(order_id):
+    """Refresh the rollups of an order (if delivered) after commit, once per transaction"""
+    connection = transaction.get_connection()
+    batch = getattr(_pending, 'batch', None)
+    # A batch is reused only while its transaction's on_commit list still holds
+    # it; a rollback discards it together with its order ids
+    if batch is None or batch.done or not any(callback is batch for sids, callback, robust in connection.run_on_commit):
+        batch = _pending.batch = _OrderBatch()
+        batch.order_ids.add(order_id)
+        transaction.on_commit(batch)
+    else:
+        batch.order_ids.add(order_id)
+
+
+def rebuild_sales_reports(start_date, end_date, chunk_days=1, progress=None):
+    """Backfill report rows day chunk by day chunk; safe to rerun"""
+    total = 0
+    chunk_start = start_date
+    while chunk_start <= end_date:
+        chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), end_date)
+        written = materialize(chunk_start, chunk_end)
+        total += written
+        if progress:
+            progress(chunk_start, chunk_end, written)
+        chunk_start = chunk_end + timedelta(days=1)
+    return total
@@ -0,0 +1,72 @@
+"""
+Database routing: primary, read replicas and the analytics database
+
+Writes always go to 'default'. Reads go to a random alias of
+settings.DATABASE_REPLICAS unless the current request or thread is pinned to
+the primary: after it has written anything, for unsafe (POST, ...) requests,
+inside a transaction on the primary, and for DATABASE_PIN_SECONDS after a
+request that wrote (see middleware.DatabasePinningMiddleware), so users
+always read their own writes. Code run under analytics() - the dashboard,
+report changelists and exports - reads from settings.DATABASE_ANALYTICS.
+
+Without replicas or an analytics alias every query uses 'default'.
+"""
+import contextvars
+import random
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = 'db_primary'
+
+pinned = contextvars.ContextVar('db_pinned', default=False)
+wrote = contextvars.ContextVar('db_wrote', default=False)
+_analytics = contextvars.ContextVar('db_analytics', default=False)
+
+
+def read_database():
+    """Alias for a read that is not pinned to the primary"""
+    replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+    return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+
+def analytics_database():
+    """Alias for reporting reads: the analytics database, else a replica, else the primary"""
+    return getattr(settings, 'DATABASE_ANALYTICS', None) or read_database()
+
+
+@contextmanager
+def analytics():
+    """Route the reads in this block to the analytics database"""
+    token = _analytics.set(True)
+    try:
+        yield
+    finally:
+        _analytics.reset(token)
+
+
+class PrimaryReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            # Related objects come from where the instance was loaded
+            return instance._state.db
+        if _analytics.get():
+            return analytics_database()
+        if pinned.get() or wrote.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return read_database()
+    
+    def db_for_write(self, model, **hints):
+        wrote.set(True)
+        return DEFAULT_DB_ALIAS
+    
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every alias holds the same data
+        return True
+    
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas and the analytics database get the schema through replication
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,156 @@
+"""
+Batched SEO meta for listing pages and sitemaps
+
+The get_meta_title() / get_og_image_url() family on the models works on one
+instance: it follows foreign keys (shop.moholla) and asks the storage for
+each image URL. resolve_meta(queryset) computes the same fields for a whole
+queryset of SEOModel rows from a single values() query: related names come
+in through the join, long texts are cut in SQL (Substr) and image URLs are
+joined onto MEDIA_URL from the stored file names, without touching the
+storage. iter_meta() streams the rows for sitemap-sized querysets.
+
+The fallbacks mirror the model methods; edit both together.
+"""
+from urllib.parse import urljoin
+
+from django.conf import settings
+from django.db.models.functions import Substr
+from django.utils.encoding import filepath_to_uri
+
+SITE_NAME = 'আমার ফ্রেশ বিডি'
+
+SEO_FIELDS = (
+    'pk', 'meta_title', 'meta_description', 'meta_keywords', 'og_title', 'og_description', 'og_image',
+    'og_type', 'twitter_card', 'twitter_title', 'twitter_description', 'twitter_image', 'canonical_url',
+    'robots_index', 'robots_follow',
+)
+
+# model name -> URL path, extra values() fields, SQL-cut texts, title and
+# description fallbacks, and the fallback images after og_image (file
+# fields, or 'url:<field>' for plain URL fields)
+MODEL_META = {
+    'moholla': {
+        'path': '/area/{slug}/',
+        'fields': ('slug', 'name', 'image'),
+        'title': lambda row: f"{row['name']} - স্থানীয় দোকান | {SITE_NAME}",
+        'description': lambda row: f"{row['name']} এলাকার সেরা দোকান থেকে কিনুন। তাজা পণ্য, দ্রুত ডেলিভারি।",
+        'images': ('image',),
+    },
+    'shop': {
+        'path': '/shop/{slug}/',
+        'fields': ('slug', 'name', 'moholla__name', 'banner', 'logo'),
+        'texts': {'_description': ('description', 100)},
+        'title': lambda row: f"{row['name']} - {row['moholla__name']} | {SITE_NAME}",
+        'description': lambda row: ' '.join(
+            part for part in (f"{row['name']} থেকে কিনুন {row['moholla__name']} এ।", row['_description']) if part
+        ),
+        'images': ('banner', 'logo'),
+    },
+    'category': {
+        'path': '/category/{slug}/',
+        'fields': ('slug', 'name', 'image'),
+        'title': lambda row: f"{row['name']} - {SITE_NAME}",
+        'description': lambda row: f"{row['name']} ক্যাটাগরির সেরা পণ্য কিনুন।",
+        'images': ('image',),
+    },
+    'masterproduct': {
+        'path': '/product/{slug}/',
+        'fields': ('slug', 'name', 'short_description', 'image', 'product_image_url'),
+        'texts': {'_description': ('description', 160)},
+        'title': lambda row: f"{row['name']} - {SITE_NAME}",
+        'description': lambda row: row['short_description'] or row['_description'],
+        'images': ('image', 'url:product_image_url'),
+    },
+    'blogpost': {
+        'path': '/blog/{slug}/',
+        'fields': ('slug', 'title', 'excerpt', 'featured_image'),
+        'texts': {'_description': ('content', 160)},
+        'title': lambda row: f"{row['title']} | {SITE_NAME} ব্লগ",
+        'description': lambda row: row['excerpt'] or row['_description'],
+        'images': ('featured_image',),
+    },
+    'promotion': {
+        'path': None,
+        'fields': ('title', 'link_url', 'image'),
+        'texts': {'_description': ('description', 160)},
+        'title': lambda row: row['title'],
+        'description': lambda row: row['_description'],
+        'images': ('image',),
+    },
+}
+
+
+def media_url(name):
+    """URL of a stored file from its name, as FileSystemStorage.url() builds it"""
+    if not name:
+        return ''
+    return urljoin(settings.MEDIA_URL, filepath_to_uri(name).lstrip('/'))
+
+
+def _absolute(url, base_url):
+    if not url or url.startswith(('http://', 'https://', '//')):
+        return url or ''
+    return base_url + url
+
+
+def _image(row, names, base_url):
+    for name in names:
+        if name.startswith('url:'):
+            url = row[name[4:]]
+        else:
+            url = media_url(row[name])
+        if url:
+            return _absolute(url, base_url)
+    return ''
+
+
+def meta_values(queryset):
+    """The values() queryset resolve_meta() reads"""
+    spec = MODEL_META[queryset.model._meta.model_name]
+    texts = {alias: Substr(field, 1, length) for alias, (field, length) in spec.get('texts', {}).items()}
+    return queryset.values(*SEO_FIELDS, *spec['fields'], **texts)
+
+
+def build_meta(row, spec, base_url):
+    """All meta / Open Graph / Twitter values of one values() row"""
+    path = spec['path'].format(**row) if spec['path'] else row.get('link_url', '')
+    title = row['meta_title'] or spec['title'](row)
+    description = row['meta_description'] or spec['description'](row)
+    og_title = row['og_title'] or title
+    og_description = row['og_description'] or description
+    og_image = _image(row, ('og_image',) + spec['images'], base_url)
+    return {
+        'pk': row['pk'],
+        'url': path,
+        'title': title,
+        'description': description,
+        'keywords': row['meta_keywords'],
+        'canonical_url': row['canonical_url'] or _absolute(path, base_url),
+        'robots': ', '.join((
+            'index' if row['robots_index'] else 'noindex',
+            'follow' if row['robots_follow'] else 'nofollow',
+        )),
+        'og_title': og_title,
+        'og_description': og_description,
+        'og_image': og_image,
+        'og_type': row['og_type'] or 'website',
+        'twitter_card': row['twitter_card'] or 'summary_large_image',
+        'twitter_title': row['twitter_title'] or og_title,
+        'twitter_description': row['twitter_description'] or og_description,
+        'twitter_image': _image(row, ('twitter_image',), base_url) or og_image,
+    }
+
+
+def iter_meta(queryset, chunk_size=2000):
+    """Stream the meta dicts of `queryset` (sitemaps, feeds)"""
+    from .sitemaps import sitemap_settings
+
+    spec = MODEL_META[queryset.model._meta.model_name]
+    base_url = sitemap_settings()['BASE_URL'].rstrip('/')
+    for row in meta_values(queryset).iterator(chunk_size=chunk_size):
+        yield build_meta(row, spec, base_url)
+
+
+def resolve_meta(queryset):
+    """{pk: meta dict} for every row of a Moholla/Shop/Category/MasterProduct/BlogPost/Promotion queryset, in one query"""
+    return {meta['pk']: meta for meta in iter_meta(queryset)}
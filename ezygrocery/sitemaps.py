@@ -0,0 +1,318 @@
+"""
+Pre-generated, sharded XML sitemaps
+
+build_sitemaps() writes one gzipped shard per SHARD_SIZE URLs and section
+(sitemap-products-1.xml.gz, ...) plus the index sitemap.xml into ROOT. Rows
+are streamed with values_list().iterator() straight into the gzip file; no
+model instance is created, so a 100k-product catalog stays flat in memory.
+Sections follow SitemapConfig (include_* flags, priority, changefreq) and
+leave out rows that are inactive, unpublished or have robots_index off.
+
+Each shard's mtime is set to the newest updated_at in it; the index reads it
+back as <lastmod>, and a static file server sends it as Last-Modified.
+Files are written to a temporary name and renamed, so readers never see a
+half-written shard. Saving or deleting a listed model schedules a rebuild of
+its sections REBUILD_DELAY seconds after commit (see the receivers in
+models.py); serve ROOT as static files, e.g. nginx `location ~ ^/sitemap`.
+"""
+import gzip
+import os
+import threading
+import time
+from datetime import timezone as dt_timezone
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db import transaction
+from django.http import FileResponse, Http404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+DEFAULTS = {
+    # Default: <BASE_DIR>/sitemaps
+    'ROOT': None,
+    'BASE_URL': 'http://localhost:8000',
+    # The protocol allows up to 50,000 URLs (and 50 MB uncompressed) per file
+    'SHARD_SIZE': 50000,
+    # Seconds to wait after a change before rebuilding; changes in between are batched
+    'REBUILD_DELAY': 30,
+    'AUTO_REBUILD': True,
+}
+
+INDEX_FILENAME = 'sitemap.xml'
+SHARD_PREFIX = 'sitemap-'
+SHARD_SUFFIX = '.xml.gz'
+
+URLSET_OPEN = '<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+URLSET_CLOSE = '</urlset>\n'
+INDEX_OPEN = '<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+INDEX_CLOSE = '</sitemapindex>\n'
+
+# section -> model, URL path (formatted with the values_list fields), filters,
+# SitemapConfig include flag, priority and changefreq fields
+SECTIONS = {
+    'products': {
+        'model': 'MasterProduct',
+        'path': '/product/{slug}/',
+        'fields': ('slug',),
+        'filter': {'is_active': True, 'robots_index': True},
+        'include': 'include_products',
+        'priority': 'products_priority',
+        'changefreq': 'products_changefreq',
+    },
+    'shop-products': {
+        'model': 'ShopProduct',
+        'path': '/shop/{shop__slug}/product/{master_product__slug}/',
+        'fields': ('shop__slug', 'master_product__slug'),
+        'filter': {
+            'is_active': True,
+            'shop__is_active': True, 'shop__robots_index': True,
+            'master_product__is_active': True, 'master_product__robots_index': True,
+        },
+        'include': 'include_products',
+        'priority': 'products_priority',
+        'changefreq': 'products_changefreq',
+    },
+    'shops': {
+        'model': 'Shop',
+        'path': '/shop/{slug}/',
+        'fields': ('slug',),
+        'filter': {'is_active': True, 'robots_index': True},
+        'include': 'include_shops',
+        'priority': 'shops_priority',
+    },
+    'categories': {
+        'model': 'Category',
+        'path': '/category/{slug}/',
+        'fields': ('slug',),
+        'filter': {'is_active': True, 'robots_index': True},
+        'include': 'include_categories',
+        'priority': 'categories_priority',
+    },
+    'areas': {
+        'model': 'Moholla',
+        'path': '/area/{slug}/',
+        'fields': ('slug',),
+        'filter': {'is_active': True, 'robots_index': True},
+        'include': 'include_mohollas',
+    },
+    'blog': {
+        'model': 'BlogPost',
+        'path': '/blog/{slug}/',
+        'fields': ('slug',),
+        'filter': {'is_published': True, 'robots_index': True},
+        'include': 'include_blog_posts',
+    },
+}
+
+# model name -> sections whose URLs or filters use it
+MODEL_SECTIONS = {
+    'masterproduct': ('products', 'shop-products'),
+    'shopproduct': ('shop-products',),
+    'shop': ('shops', 'shop-products'),
+    'category': ('categories',),
+    'moholla': ('areas',),
+    'blogpost': ('blog',),
+    'sitemapconfig': tuple(SECTIONS),
+}
+
+_pending = set()
+_pending_lock = threading.Lock()
+_timer = None
+
+
+def sitemap_settings():
+    config = {**DEFAULTS, **getattr(settings, 'SITEMAP', {})}
+    config['ROOT'] = Path(config['ROOT'] or Path(settings.BASE_DIR) / 'sitemaps')
+    return config
+
+
+def _section_fields(section):
+    fields = list(section['fields']) + ['updated_at']
+    # SEO models may point search engines at another URL
+    if section['model'] != 'ShopProduct':
+        fields.append('canonical_url')
+    return fields
+
+
+def _rows(section):
+    """(path or canonical URL, updated_at) of every listed row, streamed"""
+    from django.apps import apps
+    
+    model = apps.get_model('ezygrocery', section['model'])
+    fields = _section_fields(section)
+    queryset = model._base_manager.filter(**section['filter']).order_by('pk').values_list(*fields)
+    keys = section['fields']
+    for row in queryset.iterator(chunk_size=2000):
+        values = dict(zip(fields, row))
+        if values.get('canonical_url'):
+            yield values['canonical_url'], values['updated_at']
+        elif all(values[key] for key in keys):
+            yield section['path'].format(**{key: values[key] for key in keys}), values['updated_at']
+
+
+def _url_entry(location, lastmod, priority, changefreq):
+    parts = [f"<url><loc>{escape(location)}</loc>"]
+    if lastmod is not None:
+        parts.append(f"<lastmod>{lastmod.astimezone(dt_timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')}</lastmod>")
+    if changefreq:
+        parts.append(f"<changefreq>{changefreq}</changefreq>")
+    if priority is not None:
+        parts.append(f"<priority>{priority}</priority>")
+    parts.append("</url>\n")
+    return ''.join(parts)
+
+
+def _shard_name(name, number):
+    return f"{SHARD_PREFIX}{name}-{number}{SHARD_SUFFIX}"
+
+
+def _finish_shard(handle, temp_path, path, lastmod):
+    handle.write(URLSET_CLOSE.encode())
+    handle.close()
+    os.replace(temp_path, path)
+    if lastmod is not None:
+        os.utime(path, (lastmod.timestamp(), lastmod.timestamp()))
+
+
+def build_section(name, sitemap_config=None, config=None):
+    """Rewrite the shards of one section; returns the number of URLs"""
+    from .models import SitemapConfig
+    
+    config = config or sitemap_settings()
+    sitemap_config = sitemap_config or SitemapConfig.objects.first() or SitemapConfig()
+    section = SECTIONS[name]
+    root = config['ROOT']
+    root.mkdir(parents=True, exist_ok=True)
+    base_url = config['BASE_URL'].rstrip('/')
+    priority = getattr(sitemap_config, section['priority']) if section.get('priority') else None
+    changefreq = getattr(sitemap_config, section['changefreq']) if section.get('changefreq') else None
+    
+    count = shards = 0
+    handle = temp_path = lastmod = None
+    if getattr(sitemap_config, section['include']):
+        for location, updated_at in _rows(section):
+            if count % config['SHARD_SIZE'] == 0:
+                if handle is not None:
+                    _finish_shard(handle, temp_path, root / _shard_name(name, shards), lastmod)
+                shards += 1
+                temp_path = root / f".{_shard_name(name, shards)}.{os.getpid()}.tmp"
+                handle = gzip.open(temp_path, 'wb', compresslevel=6)
+                handle.write(URLSET_OPEN.encode())
+                lastmod = None
+            if location.startswith('/'):
+                location = base_url + location
+            handle.write(_url_entry(location, updated_at, priority, changefreq).encode())
+            if updated_at is not None and (lastmod is None or updated_at > lastmod):
+                lastmod = updated_at
+            count += 1
+    if handle is not None:
+        _finish_shard(handle, temp_path, root / _shard_name(name, shards), lastmod)
+    
+    # Shards beyond the new count (the section shrank or was switched off)
+    prefix = f"{SHARD_PREFIX}{name}-"
+    for path in root.glob(f"{prefix}*{SHARD_SUFFIX}"):
+        number = path.name[len(prefix):-len(SHARD_SUFFIX)]
+        if number.isdigit() and int(number) > shards:
+            path.unlink(missing_ok=True)
+    return count
+
+
+def build_index(config=None):
+    """Rewrite sitemap.xml from the shards on disk"""
+    config = config or sitemap_settings()
+    root = config['ROOT']
+    root.mkdir(parents=True, exist_ok=True)
+    base_url = config['BASE_URL'].rstrip('/')
+    temp_path = root / f".{INDEX_FILENAME}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as handle:
+        handle.write(INDEX_OPEN)
+        for name in SECTIONS:
+            prefix = f"{SHARD_PREFIX}{name}-"
+            shards = [
+                path for path in root.glob(f"{prefix}*{SHARD_SUFFIX}")
+                if path.name[len(prefix):-len(SHARD_SUFFIX)].isdigit()
+            ]
+            for path in sorted(shards, key=lambda path: int(path.name[len(prefix):-len(SHARD_SUFFIX)])):
+                lastmod = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(path.stat().st_mtime))
+                handle.write(
+                    f"<sitemap><loc>{escape(base_url + '/' + path.name)}</loc><lastmod>{lastmod}</lastmod></sitemap>\n"
+                )
+        handle.write(INDEX_CLOSE)
+    os.replace(temp_path, root / INDEX_FILENAME)
+
+
+def build_sitemaps(sections=None, progress=None):
+    """Rebuild the given sections (default all) and the index; returns {section: URL count}"""
+    from .models import SitemapConfig
+    
+    config = sitemap_settings()
+    sitemap_config = SitemapConfig.objects.first() or SitemapConfig()
+    counts = {}
+    for name in sections or SECTIONS:
+        counts[name] = build_section(name, sitemap_config, config)
+        if progress:
+            progress(name, counts[name])
+    build_index(config)
+    return counts
+
+
+def _rebuild_pending():
+    global _timer
+    from django.db import connections
+    
+    with _pending_lock:
+        sections, _timer = set(_pending), None
+        _pending.clear()
+    try:
+        build_sitemaps([name for name in SECTIONS if name in sections])
+    except Exception:
+        import logging
+        logging.getLogger(__name__).exception("Sitemap rebuild failed")
+    finally:
+        connections.close_all()
+
+
+def schedule_rebuild(sections):
+    """Rebuild `sections` in a background thread REBUILD_DELAY seconds after the current transaction commits"""
+    config = sitemap_settings()
+    if not config['AUTO_REBUILD'] or not sections:
+        return
+    
+    def schedule():
+        global _timer
+        with _pending_lock:
+            _pending.update(sections)
+            if _timer is None:
+                _timer = threading.Timer(config['REBUILD_DELAY'], _rebuild_pending)
+                _timer.daemon = True
+                _timer.start()
+    
+    transaction.on_commit(schedule)
+
+
+def sitemap_file(filename):
+    """Path of a generated sitemap file, building everything on first use; None if unknown"""
+    config = sitemap_settings()
+    if filename != INDEX_FILENAME and not (filename.startswith(SHARD_PREFIX) and filename.endswith(SHARD_SUFFIX)):
+        return None
+    path = config['ROOT'] / filename
+    if not (config['ROOT'] / INDEX_FILENAME).exists():
+        build_sitemaps()
+    return path if path.exists() else None
+
+
+def sitemap_view(request, filename=INDEX_FILENAME):
+    """Serve a generated file when no static file server sits in front of ROOT"""
+    path = sitemap_file(filename)
+    if path is None:
+        raise Http404
+    modified = path.stat().st_mtime
+    response = get_conditional_response(request, last_modified=int(modified))
+    if response is not None:
+        return response
+    content_type = 'application/xml' if filename == INDEX_FILENAME else 'application/gzip'
+    response = FileResponse(open(path, 'rb'), content_type=content_type)
+    response['Last-Modified'] = http_date(modified)
+    return response
@@ -0,0 +1,41 @@
+// Live new-orders badge: polls the unviewed-order counters while the tab is visible
+document.addEventListener('DOMContentLoaded', function() {
+    const POLL_INTERVAL = 15000;
+    const orderLinks = Array.from(document.querySelectorAll('a[href$="/ezygrocery/order/"]')).filter(function(link) {
+        return link.querySelector('span.bg-red-600');
+    });
+    if (!orderLinks.length || !window.fetch) {
+        return;
+    }
+    const url = orderLinks[0].getAttribute('href') + 'new-orders/counts/';
+    
+    function update(counts) {
+        orderLinks.forEach(function(link) {
+            const badge = link.querySelector('span.bg-red-600');
+            badge.textContent = counts.total || '';
+            badge.style.display = counts.total ? '' : 'none';
+            badge.title = counts.shops.map(function(shop) {
+                return shop.shop_name + ': ' + shop.count;
+            }).join('\n');
+        });
+    }
+    
+    function poll() {
+        if (document.hidden) {
+            return;
+        }
+        fetch(url, {credentials: 'same-origin', headers: {'Accept': 'application/json'}})
+            .then(function(response) {
+                return response.ok ? response.json() : null;
+            })
+            .then(function(counts) {
+                if (counts) {
+                    update(counts);
+                }
+            })
+            .catch(function() {});
+    }
+    
+    setInterval(poll, POLL_INTERVAL);
+    document.addEventListener('visibilitychange', poll);
+});
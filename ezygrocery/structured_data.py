@@ -0,0 +1,202 @@
+"""
+Precomputed JSON-LD structured data
+
+Blobs are built once, serialized into ready-to-embed
+<script type="application/ld+json"> tags and cached:
+
+    'organization', 'website'   StoreSettings
+    'faq'                       active FAQs (FAQPage)
+    'product:<pk>'              MasterProduct with an AggregateOffer over the
+                                active shop products and its approved reviews'
+                                AggregateRating
+
+json_ld('organization', 'website', product) fetches them with one get_many()
+(plus the generation key). Saving or deleting a FAQ, product, shop product or
+review, or saving a shop, deletes the affected entries after commit (see the
+receivers in models.py); StoreSettings changes and bulk imports start a new generation,
+as the barcode cache does. With schema markup disabled in the store settings
+every blob is empty.
+"""
+import json
+import logging
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Case, Count, DecimalField, F, Max, Min, Q, When
+
+logger = logging.getLogger(__name__)
+
+STRUCTURED_DATA_PREFIX = 'ezygrocery:jsonld:'
+STRUCTURED_DATA_VERSION_KEY = 'ezygrocery:jsonld:version'
+STRUCTURED_DATA_TIMEOUT = 60 * 60 * 24
+
+PRICE_CURRENCY = 'BDT'
+
+# Same escapes as django.utils.html.json_script: the JSON cannot close the <script>
+_JSON_SCRIPT_ESCAPES = {ord('>'): '\\u003E', ord('<'): '\\u003C', ord('&'): '\\u0026'}
+
+
+def _version():
+    version = cache.get(STRUCTURED_DATA_VERSION_KEY)
+    if version is None:
+        cache.add(STRUCTURED_DATA_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(STRUCTURED_DATA_VERSION_KEY)
+    return version
+
+
+def invalidate_structured_data():
+    """Start a new generation: every cached blob is rebuilt on next use"""
+    cache.set(STRUCTURED_DATA_VERSION_KEY, time.time_ns(), None)
+
+
+def invalidate_json_ld(*names):
+    """Drop the cached blobs `names` once the current transaction commits"""
+    def delete():
+        prefix = f"{STRUCTURED_DATA_PREFIX}{_version()}:"
+        cache.delete_many([prefix + name for name in names])
+    transaction.on_commit(delete)
+
+
+def script_tag(data):
+    if not data:
+        return ''
+    payload = json.dumps(data, ensure_ascii=False, separators=(',', ':'), default=str).translate(_JSON_SCRIPT_ESCAPES)
+    return f'<script type="application/ld+json">{payload}</script>'
+
+
+def _custom(value, name):
+    """StoreSettings keeps hand-written structured data as JSON text"""
+    if not isinstance(value, str):
+        return value
+    try:
+        return json.loads(value)
+    except ValueError:
+        logger.warning("Invalid custom %s structured data in the store settings; not embedded", name)
+        return None
+
+
+def _absolute(url, base_url):
+    if not url or url.startswith(('http://', 'https://', '//')):
+        return url or ''
+    return base_url + url
+
+
+def build_organization(store_settings):
+    return _custom(store_settings.get_organization_schema(), 'organization')
+
+
+def build_website(store_settings):
+    return _custom(store_settings.get_website_schema(), 'website')
+
+
+def build_faq(store_settings):
+    from .models import FAQ
+    return FAQ.get_faq_schema()
+
+
+def build_product(store_settings, pk):
+    """Product + AggregateOffer + AggregateRating of a MasterProduct, or None if it is not listed"""
+    from .models import MasterProduct
+    from .sitemaps import sitemap_settings
+    
+    product = (
+        MasterProduct.objects.filter(pk=pk, is_active=True)
+        .only('name', 'slug', 'sku', 'gtin', 'mpn', 'brand', 'description', 'short_description',
+              'image', 'product_image_url', 'og_image')
+        .first()
+    )
+    if product is None:
+        return None
+    base_url = sitemap_settings()['BASE_URL'].rstrip('/')
+    final_price = Case(
+        When(discount_price__lt=F('selling_price'), then=F('discount_price')),
+        default=F('selling_price'),
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+    offers = product.shop_products.filter(is_active=True, shop__is_active=True).aggregate(
+        low=Min(final_price), high=Max(final_price), count=Count('pk'), in_stock=Count('pk', filter=Q(stock__gt=0)),
+    )
+    rating = product.master_reviews.filter(is_approved=True).aggregate(value=Avg('rating'), count=Count('pk'))
+    
+    image = product.og_image or product.image
+    data = {
+        "@context": "https://schema.org",
+        "@type": "Product",
+        "name": product.name,
+        "url": base_url + product.get_absolute_url(),
+        "sku": product.sku,
+        "description": product.short_description or product.description[:500],
+    }
+    image_url = _absolute(image.url if image else product.product_image_url, base_url)
+    if image_url:
+        data["image"] = image_url
+    if product.brand:
+        data["brand"] = {"@type": "Brand", "name": product.brand}
+    if product.gtin:
+        data["gtin"] = product.gtin
+    if product.mpn:
+        data["mpn"] = product.mpn
+    if offers['count']:
+        data["offers"] = {
+            "@type": "AggregateOffer",
+            "priceCurrency": PRICE_CURRENCY,
+            "lowPrice": str(offers['low']),
+            "highPrice": str(offers['high']),
+            "offerCount": offers['count'],
+            "availability": "https://schema.org/InStock" if offers['in_stock'] else "https://schema.org/OutOfStock",
+        }
+    if rating['count']:
+        data["aggregateRating"] = {
+            "@type": "AggregateRating",
+            "ratingValue": round(rating['value'], 1),
+            "reviewCount": rating['count'],
+        }
+    return data
+
+
+BUILDERS = {
+    'organization': build_organization,
+    'website': build_website,
+    'faq': build_faq,
+    'product': build_product,
+}
+
+
+def _name(item):
+    """'organization' / 'product:12' for a blob name or a MasterProduct / ShopProduct"""
+    meta = getattr(item, '_meta', None)
+    if meta is None:
+        return str(item)
+    if meta.model_name == 'shopproduct':
+        return f"product:{item.master_product_id}"
+    return f"product:{item.pk}"
+
+
+def _build(name, store_settings):
+    if not store_settings.enable_schema_markup:
+        return ''
+    kind, _, pk = name.partition(':')
+    args = (int(pk),) if pk else ()
+    return script_tag(BUILDERS[kind](store_settings, *args))
+
+
+def json_ld(*items):
+    """
+    Ready-to-embed script tags for blob names ('organization', 'website',
+    'faq', 'product:<pk>') and MasterProduct/ShopProduct instances
+    """
+    names = list(dict.fromkeys(_name(item) for item in items))
+    for name in names:
+        if name.partition(':')[0] not in BUILDERS:
+            raise ValueError(f"Unknown structured data {name!r}")
+    prefix = f"{STRUCTURED_DATA_PREFIX}{_version()}:"
+    found = {key[len(prefix):]: value for key, value in cache.get_many([prefix + name for name in names]).items()}
+    built = {}
+    missing = [name for name in names if name not in found]
+    if missing:
+        from .models import StoreSettings
+        store_settings = StoreSettings.get_settings()
+        built = {name: _build(name, store_settings) for name in missing}
+        cache.set_many({prefix + name: value for name, value in built.items()}, STRUCTURED_DATA_TIMEOUT)
+    return '\n'.join(value for value in (found.get(name, built.get(name)) for name in names) if value)
@@ -0,0 +1,83 @@
+"""
+Fragment cache tags (see ezygrocery.fragments)
+
+    {% load fragment_cache %}
+    {% cachedfor "product_card" product in shop_products depends product product.master_product %}
+        ...card markup using product...
+    {% endcachedfor %}
+    
+    {% cachedfragment "shop_header" shop shop.moholla %}...{% endcachedfragment %}
+
+`depends` defaults to the loop item itself.
+"""
+from django import template
+from django.utils.safestring import mark_safe
+
+from ezygrocery.fragments import cached_fragment, cached_fragments
+
+register = template.Library()
+
+
+class CachedForNode(template.Node):
+
+    def __init__(self, name, loopvar, sequence, dependencies, nodelist):
+        self.name = name
+        self.loopvar = loopvar
+        self.sequence = sequence
+        self.dependencies = dependencies
+        self.nodelist = nodelist
+    
+    def render(self, context):
+        name = self.name.resolve(context)
+        items = self.sequence.resolve(context, ignore_failures=True) or []
+        
+        def resolve_dependencies(item):
+            if not self.dependencies:
+                return (item,)
+            with context.push(**{self.loopvar: item}):
+                return [dependency.resolve(context) for dependency in self.dependencies]
+        
+        def render_item(item):
+            with context.push(**{self.loopvar: item}):
+                return self.nodelist.render(context)
+        
+        return mark_safe(''.join(cached_fragments(name, items, render_item, resolve_dependencies)))
+
+
+class CachedFragmentNode(template.Node):
+
+    def __init__(self, name, dependencies, nodelist):
+        self.name = name
+        self.dependencies = dependencies
+        self.nodelist = nodelist
+    
+    def render(self, context):
+        dependencies = [dependency.resolve(context) for dependency in self.dependencies]
+        return mark_safe(cached_fragment(self.name.resolve(context), dependencies, lambda: self.nodelist.render(context)))
+
+
+@register.tag
+def cachedfor(parser, token):
+    """{% cachedfor "name" item in items [depends expr ...] %}...{% endcachedfor %}"""
+    bits = token.split_contents()
+    if len(bits) < 5 or bits[3] != 'in' or (len(bits) > 5 and bits[5] != 'depends'):
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' usage: {{% {bits[0]} \"name\" item in items [depends expr ...] %}}"
+        )
+    nodelist = parser.parse(('endcachedfor',))
+    parser.delete_first_token()
+    return CachedForNode(
+        parser.compile_filter(bits[1]), bits[2], parser.compile_filter(bits[4]),
+        [parser.compile_filter(bit) for bit in bits[6:]], nodelist,
+    )
+
+
+@register.tag
+def cachedfragment(parser, token):
+    """{% cachedfragment "name" obj ... %}...{% endcachedfragment %}"""
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' needs a name and at least one object")
+    nodelist = parser.parse(('endcachedfragment',))
+    parser.delete_first_token()
+    return CachedFragmentNode(parser.compile_filter(bits[1]), [parser.compile_filter(bit) for bit in bits[2:]], nodelist)
@@ -0,0 +1,27 @@
+"""
+Responsive image tags (see ezygrocery.images)
+
+    {% load images %}
+    {% picture product.image "card" alt=product.name sizes="(max-width: 600px) 50vw, 320px" class="card-img" %}
+    <img src="{{ shop.logo|preset_url:'thumb' }}" srcset="{% srcset shop.logo 'thumb' %}">
+"""
+from django import template
+
+from ezygrocery import images
+
+register = template.Library()
+
+
+@register.simple_tag
+def picture(file, preset, alt='', sizes=None, **attrs):
+    return images.picture_html(file, preset, alt=alt, sizes=sizes, **attrs)
+
+
+@register.simple_tag
+def srcset(file, preset, image_format='webp'):
+    return images.srcset(file, preset, image_format)
+
+
+@register.filter
+def preset_url(file, preset):
+    return images.preset_url(file, preset)
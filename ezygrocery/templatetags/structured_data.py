@@ -0,0 +1,18 @@
+"""
+JSON-LD tags (see ezygrocery.structured_data)
+
+    {% load structured_data %}
+    {% json_ld "organization" "website" %}
+    {% json_ld product %}
+"""
+from django import template
+from django.utils.safestring import mark_safe
+
+from ezygrocery.structured_data import json_ld as cached_json_ld
+
+register = template.Library()
+
+
+@register.simple_tag
+def json_ld(*items):
+    return mark_safe(cached_json_ld(*items))
@@ -0,0 +1,10 @@
+from django.urls import path, re_path
+
+from .metrics import metrics_view
+from .sitemaps import sitemap_view
+
+urlpatterns = [
+    path('metrics', metrics_view, name='metrics'),
+    path('sitemap.xml', sitemap_view, name='sitemap'),
+    re_path(r'^(?P<filename>sitemap-[a-z-]+-\d+\.xml\.gz)$', sitemap_view, name='sitemap_shard'),
+]